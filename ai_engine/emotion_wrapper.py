@@ -22,7 +22,7 @@
 #
 # ---------------------------------------------------------
 
-from ai_engine.kluebert_emotion import kluebert_emotion
+from ai_engine.kluebert_emotion import kluebert_emotion, kluebert_emotion_batch
 from ai_engine.style_palette import color_from_emotion
 
 
@@ -39,3 +39,14 @@ def analyze_emotion(text: str, palette_level: int = 2):
     color_hex = color_from_emotion(emotion, palette_level)
 
     return emotion, conf, color_hex
+
+
+def analyze_emotion_batch(texts, palette_level: int = 2):
+    """
+    texts -> [(emotion, conf, color_hex), ...]
+    여러 문장을 한 번에 추론 (오프라인 분석용)
+    """
+    return [
+        (emotion, conf, color_from_emotion(emotion, palette_level))
+        for emotion, conf in kluebert_emotion_batch(texts)
+    ]
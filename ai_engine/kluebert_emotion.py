@@ -1,3 +1,5 @@
+import logging
+
 import torch
 from transformers import AutoTokenizer, AutoModelForSequenceClassification
 
@@ -8,6 +10,9 @@ from transformers import AutoTokenizer, AutoModelForSequenceClassification
 # ---------------------------------------------------------
 MODEL_NAME = "dlckdfuf141/korean-emotion-kluebert-v2"
 
+# 추론마다 남기는 디버그 로그 (서버에서는 LOG_LEVELS=ai_engine.kluebert_emotion=DEBUG 로 켬, 초당 개수 제한)
+logger = logging.getLogger(__name__)
+
 # 문장을 토큰 ID로 변환하는 tokenizer
 tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
 
@@ -68,8 +73,32 @@ def kluebert_emotion(text: str):
     # 숫자 ID → 감정명 변환
     emotion = ID2EMOTION.get(pred_id, "neutral")
 
-    # 디버깅용 로그 출력
-    print(f"[EMO_DEBUG] pred_id={pred_id}, emotion={emotion}, conf={confidence:.3f}")
+    # 디버깅용 로그 출력 (DEBUG 레벨이 꺼져 있으면 포맷도 하지 않음)
+    logger.debug("[EMO_DEBUG] pred_id=%s, emotion=%s, conf=%.3f", pred_id, emotion, confidence, extra={"category": "emotion"})
 
     # 최종 결과 반환
     return emotion, confidence
+
+
+# ---------------------------------------------------------
+# 4) 배치 함수: 여러 문장을 한 번에 추론 (오프라인 분석용)
+#    - 문장들을 batch_size 개씩 padding 해서 한 번에 모델에 넣음
+#    - 빈 문장은 kluebert_emotion 과 같이 중립 반환
+# ---------------------------------------------------------
+def kluebert_emotion_batch(texts, batch_size: int = 16):
+    """문장 리스트 → [(감정이름, confidence), ...] (입력 순서 유지)"""
+    results = [("neutral", 0.0)] * len(texts)
+    idx = [i for i, t in enumerate(texts) if t.strip()]
+
+    for b in range(0, len(idx), batch_size):
+        chunk = idx[b:b + batch_size]
+        inputs = tokenizer([texts[i] for i in chunk], return_tensors="pt", truncation=True, padding=True)
+
+        with torch.no_grad():
+            probs = torch.softmax(model(**inputs).logits, dim=1)  # (N, 7)
+            confs, pred_ids = torch.max(probs, dim=1)
+
+        for i, pred_id, conf in zip(chunk, pred_ids.tolist(), confs.tolist()):
+            results[i] = (ID2EMOTION.get(pred_id, "neutral"), float(conf))
+
+    return results
@@ -18,6 +18,7 @@ PANNs 기반 BGM / 효과음 분석 모듈 (DRAMA / DOCUMENTARY / ENTERTAINMENT
 - BGM 은 다큐보다 쉽게 잡고, ON/OFF 반응도 더 빠르게
 """
 
+import logging
 import os
 import sys
 import ssl
@@ -30,15 +31,29 @@ import numpy as np
 import torch
 import librosa
 
+logger = logging.getLogger(__name__)
+
 # ==========================================
 # 0) 모드 설정 (DRAMA / DOCUMENTARY / ENTERTAINMENT)
 # ==========================================
 #   - dacu2 (다큐멘터리): "DOCUMENTARY"
 #   - drama (드라마): "DRAMA"
 #   - enter_web (예능): "ENTERTAINMENT"
-MODE = os.getenv("CAPTION_CONTENT_MODE", "DOCUMENTARY").upper()
-if MODE not in ("DRAMA", "DOCUMENTARY", "ENTERTAINMENT"):
-    MODE = "DOCUMENTARY"  # 기본값을 DOCUMENTARY로 설정 (dacu 채널이 기본)
+#   - 분석기마다 BgmAnalyzer(mode=...) 로 지정, 지정하지 않으면 CAPTION_CONTENT_MODE 환경변수 값
+MODES = ("DRAMA", "DOCUMENTARY", "ENTERTAINMENT")
+
+
+def normalize_mode(mode: str = None) -> str:
+    """모드 문자열 정리 (없거나 모르는 값이면 DOCUMENTARY - dacu 채널이 기본)"""
+    mode = (mode or "").upper()
+    return mode if mode in MODES else "DOCUMENTARY"
+
+
+MODE = normalize_mode(os.getenv("CAPTION_CONTENT_MODE", "DOCUMENTARY"))
+
+# 예측마다 PANNs 원본 TOP-5 점수를 DEBUG 로그로 남김 (기본 꺼짐, PANNS_DEBUG_RAW=1 로 켬)
+# → 로거(큐 기반)로 보내므로 분석 경로에서 파일을 직접 쓰지 않음
+DEBUG_PANNS_RAW = os.getenv("PANNS_DEBUG_RAW", "0") == "1"
 
 
 # ==========================================
@@ -120,16 +135,13 @@ VOLUME_BOOST = 4.0            # 분석용 볼륨 보정 (너무 크면 clip됨)
 ANALYSIS_INTERVAL = 0.25      # 최소 분석 간격(초) - 초당 4회 정도만 분석
 BGM_HOLD_TIME = 1.0           # BGM 감지 끊겨도 최소 유지 시간(초)
 
-# "화면 표시"를 위한 BGM 게이트
-if MODE == "DOCUMENTARY":
-    MUSIC_ON_MIN = 2.0        # 연속 2초 이상 음악이 있을 때만 켜기
-    MUSIC_OFF_MIN = 1.2       # 연속 1.2초 이상 음악이 없으면 끄기
-elif MODE == "ENTERTAINMENT":
-    MUSIC_ON_MIN = 1.0        # 예능: BGM 자주 바뀌니까 조금 더 빠르게 ON
-    MUSIC_OFF_MIN = 0.8       # 너무 오래 남지 않게 OFF도 살짝 빠르게
-else:  # DRAMA
-    MUSIC_ON_MIN = 1.2
-    MUSIC_OFF_MIN = 1.0
+# "화면 표시"를 위한 BGM 게이트 (모드별 (켜기, 끄기) 최소 연속 시간, 초)
+MUSIC_GATE = {
+    "DOCUMENTARY": (2.0, 1.2),    # 연속 2초 이상 음악이 있을 때만 켜기, 1.2초 이상 없으면 끄기
+    "ENTERTAINMENT": (1.0, 0.8),  # 예능: BGM 자주 바뀌니까 조금 더 빠르게 ON, 너무 오래 남지 않게 OFF도 살짝 빠르게
+    "DRAMA": (1.2, 1.0),
+}
+MUSIC_ON_MIN, MUSIC_OFF_MIN = MUSIC_GATE[MODE]
 
 
 # BGM 안정화: 같은 문구가 몇 번 연속 나왔을 때만 최종 확정
@@ -346,383 +358,463 @@ _labels = _model.labels  # index → label string
 
 
 # ==========================================
-# 7) 상태 (실시간용)
+# 7) 상태 (세션/작업마다 1개)
 # ==========================================
-_audio_buffer = np.zeros(0, dtype=np.float32)
-_prev_rms = 0.0
-_last_pred_time = 0.0
-_bgm_last_detected_time = 0.0
-_last_detected_bgm_text = ""
+# ★ 모드별 효과음 유지시간 (초)
+SFX_HOLD_TIME = {
+    "DRAMA": 1.0,          # 드라마는 살짝 짧게 툭툭
+    "ENTERTAINMENT": 1.6,  # 예능은 리액션/효과음 조금 더 길게
+    "DOCUMENTARY": 1.2,
+}
+_SFX_HOLD_TIME = SFX_HOLD_TIME[MODE]
 
-_start_time = time.time()
 
-# 외부에서 읽어갈 현재 표시용 텍스트
-current_bgm_text: str = ""
-current_sfx_text: str = ""
+def _tile_window(waveform_seg: np.ndarray) -> np.ndarray:
+    """PANNs 입력 준비 (1초 길이로 타일링)"""
+    target_len = SAMPLE_RATE  # 1초
+    repeats = (target_len // waveform_seg.shape[0]) + 1
+    return np.tile(waveform_seg, repeats)[:target_len]
 
-# 게이트용 상태
-_display_bgm_text: str = ""
-_music_started_at = None
-_music_stopped_at = None
 
-# 이벤트/안정화용 상태
-_last_event_bgm = ""
-_last_event_sfx = ""
-_bgm_recent: list[str] = []    # 최근 BGM 후보 히스토리
+class BgmAnalyzer:
+    """BGM/SFX 분석 상태 (버퍼, 안정화/HOLD, ON/OFF 게이트)
 
-_sfx_last_time = 0.0
-_SFX_HOLD_TIME = 1.2  # ★ 효과음 유지시간 (초)
+    실시간 세션 / 오프라인 작업마다 따로 만들어 쓴다.
+    → 한 시청자의 seek 이나 오프라인 작업이 다른 세션의 BGM/SFX 상태를 초기화하지 않음
+    mode: DRAMA / DOCUMENTARY / ENTERTAINMENT (None 이면 모듈 MODE = 환경변수 값)
+    """
 
-# 모드별 SFX 유지 시간 튜닝
-if MODE == "DRAMA":
-    _SFX_HOLD_TIME = 1.0        # 드라마는 살짝 짧게 툭툭
-elif MODE == "ENTERTAINMENT":
-    _SFX_HOLD_TIME = 1.6        # 예능은 리액션/효과음 조금 더 길게
-# DOCUMENTARY 는 1.2 그대로 사용
+    def __init__(self, mode: str = None):
+        self.mode = normalize_mode(mode) if mode is not None else MODE
+        self.music_on_min, self.music_off_min = MUSIC_GATE[self.mode]
+        self.sfx_hold_time = SFX_HOLD_TIME[self.mode]
+        self.reset()
+
+    def reset(self):
+        """분석 상태 초기화 (새 에셋을 처음부터 분석할 때 / seek)"""
+        self._audio_buffer = np.zeros(0, dtype=np.float32)
+        self._prev_rms = 0.0
+        self._last_pred_time = 0.0
+        self._bgm_last_detected_time = 0.0
+        self._last_detected_bgm_text = ""
+        self._start_time = time.time()
+
+        # 외부에서 읽어갈 현재 표시용 텍스트
+        self.current_bgm_text = ""
+        self.current_sfx_text = ""
+
+        # 게이트용 상태
+        self._display_bgm_text = ""
+        self._music_started_at = None
+        self._music_stopped_at = None
+
+        # 이벤트/안정화용 상태
+        self._last_event_bgm = ""
+        self._last_event_sfx = ""
+        self._bgm_recent: list[str] = []    # 최근 BGM 후보 히스토리
+        self._sfx_last_time = 0.0
+
+    def _impact(self, waveform_seg: np.ndarray):
+        """0.3초 구간 RMS 및 임팩트(효과음 후보) 여부 계산 (_prev_rms 갱신)"""
+        rms = float(np.sqrt(np.mean(waveform_seg ** 2)))
+
+        # 기본 임팩트 기준
+        is_impact = (rms > self._prev_rms * 1.5) or (rms > 0.05)
+
+        # DRAMA 모드는 임팩트 기준을 조금 더 까다롭게
+        if self.mode == "DRAMA":
+            is_impact = (rms > self._prev_rms * 2.0) or (rms > 0.08)
+
+        self._prev_rms = rms
+        return rms, is_impact
+
+    def analyze_chunk(self, chunk: bytes, in_sr: int = 16000, now: float = None):
+        """
+        16kHz mono PCM bytes(chunk) → 내부 버퍼에 쌓고
+        일정 주기(ANALYSIS_INTERVAL)마다 PANNs로 BGM / SFX 추정.
+
+        now: 기준 시각(초). 지정하지 않으면 벽시계 기준 (실시간 스트리밍용)
+
+        반환값:
+            - 변경 사항이 있을 때만 dict 리턴 (bgm_text / sfx_text 키 포함)
+            - 아무 변화 없으면 None
+        """
+        if _model is None:
+            return None
+        if not chunk:
+            return None
+
+        # 1) bytes -> float32 (-1 ~ 1 근사)
+        samples16 = np.frombuffer(chunk, dtype=np.int16).astype(np.float32)
+        if samples16.size == 0:
+            return None
+        samples16 /= 32768.0
+
+        # 2) 16k -> 32k resample
+        samples32 = librosa.resample(samples16, orig_sr=in_sr, target_sr=SAMPLE_RATE)
+        samples32 *= VOLUME_BOOST
+
+        # 3) 내부 버퍼에 이어 붙이고, 너무 길어지면 최근 2초만 유지
+        self._audio_buffer = np.concatenate([self._audio_buffer, samples32])
+        max_len = int(SAMPLE_RATE * 2.0)
+        if self._audio_buffer.size > max_len:
+            self._audio_buffer = self._audio_buffer[-max_len:]
+
+        elapsed = now if now is not None else time.time() - self._start_time
+
+        # 너무 자주 분석하지 않도록 인터벌 체크
+        if elapsed - self._last_pred_time < ANALYSIS_INTERVAL:
+            return None
+
+        short_window = int(SAMPLE_RATE * 0.3)  # 0.3초 구간
+        if self._audio_buffer.size < short_window:
+            return None
+
+        waveform_seg = self._audio_buffer[-short_window:]
+
+        # ==========================================
+        # 1) RMS 및 임팩트(효과음 후보) 계산
+        # ==========================================
+        rms, is_impact = self._impact(waveform_seg)
+
+        # ==========================================
+        # 2) PANNs 입력 준비 (1초 길이로 타일링)
+        # ==========================================
+        tiled_seg = _tile_window(waveform_seg)
+
+        with torch.no_grad():
+            output, _ = _model.inference(tiled_seg[None, :])
+
+        return self._update_from_scores(output[0], rms, is_impact, elapsed)
+
+    def _update_from_scores(self, scores: np.ndarray, rms: float, is_impact: bool, elapsed: float):
+        """PANNs 점수 1개 구간 → BGM/SFX 상태 갱신 (변경 있을 때만 이벤트 dict 반환)"""
 
+        top_idx = np.argsort(scores)[::-1]
 
-# ==========================================
-# 8) 메인 분석 함수 (chunk 단위)
-# ==========================================
-def analyze_bgm_chunk(chunk: bytes, in_sr: int = 16000):
-    """
-    16kHz mono PCM bytes(chunk) → 내부 버퍼에 쌓고
-    일정 주기(ANALYSIS_INTERVAL)마다 PANNs로 BGM / SFX 추정.
+        best_bgm_label = None
+        best_bgm_score = 0.0
+        best_sfx_label = None
+        best_sfx_score = 0.0
 
-    반환값:
-        - 변경 사항이 있을 때만 dict 리턴 (bgm_text / sfx_text 키 포함)
-        - 아무 변화 없으면 None
-    """
-    global _audio_buffer, _prev_rms, _last_pred_time
-    global _bgm_last_detected_time, _last_detected_bgm_text
-    global current_bgm_text, current_sfx_text
-    global _music_started_at, _music_stopped_at, _display_bgm_text
-    global _last_event_bgm, _last_event_sfx, _bgm_recent
-    global _sfx_last_time, _SFX_HOLD_TIME
+        music_cands = []           # 자막용 BGM 후보 (label, score)
+        max_music_score = 0.0      # Music 포함 전체 음악 중 최대 점수
 
-    if _model is None:
-        return None
-    if not chunk:
-        return None
+        # 상위 몇 개만 살펴본다
+        for i in top_idx[:10]:
+            label = _labels[i]
+            score = float(scores[i])
 
-    # 1) bytes -> float32 (-1 ~ 1 근사)
-    samples16 = np.frombuffer(chunk, dtype=np.int16).astype(np.float32)
-    if samples16.size == 0:
-        return None
-    samples16 /= 32768.0
+            if label in IGNORE_LABELS:
+                continue
 
-    # 2) 16k -> 32k resample
-    samples32 = librosa.resample(samples16, orig_sr=in_sr, target_sr=SAMPLE_RATE)
-    samples32 *= VOLUME_BOOST
+            # DRAMA / ENTERTAINMENT 모드에서는 자연/동물 계열 라벨은 아예 후보에서 제외
+            if self.mode in ("DRAMA", "ENTERTAINMENT") and label in NATURAL_LABELS:
+                continue
 
-    # 3) 내부 버퍼에 이어 붙이고, 너무 길어지면 최근 2초만 유지
-    _audio_buffer = np.concatenate([_audio_buffer, samples32])
-    max_len = int(SAMPLE_RATE * 2.0)
-    if _audio_buffer.size > max_len:
-        _audio_buffer = _audio_buffer[-max_len:]
+            # BGM 후보 → 리스트에 모으고, 최대 음악 점수 갱신
+            if label in BGM_LABELS:
+                music_cands.append((label, score))
+                if score > max_music_score:
+                    max_music_score = score
 
-    now = time.time()
-    elapsed = now - _start_time
+            # SFX 후보
+            if label in SFX_LABELS:
 
-    # 너무 자주 분석하지 않도록 인터벌 체크
-    if elapsed - _last_pred_time < ANALYSIS_INTERVAL:
-        return None
+                # DRAMA: 자연/동물 소리 제외
+                if self.mode == "DRAMA" and label in IGNORE_SFX_DRAMA:
+                    continue
 
-    short_window = int(SAMPLE_RATE * 0.3)  # 0.3초 구간
-    if _audio_buffer.size < short_window:
-        return None
+                # DOCUMENTARY: (현재는 별도 exclude 없음)
+                if self.mode == "DOCUMENTARY" and label in IGNORE_SFX_DOCUMENTARY:
+                    continue
 
-    waveform_seg = _audio_buffer[-short_window:]
+                # ENTERTAINMENT: 화이트리스트만 허용 (+ 추가적으로 막을 라벨)
+                if self.mode == "ENTERTAINMENT":
+                    if label not in ENTERTAINMENT_SFX_WHITELIST:
+                        continue
+                    if label in IGNORE_SFX_ENTER:
+                        continue
+
+                # 여기까지 통과했다면 진짜 후보
+                if score > best_sfx_score:
+                    best_sfx_score = score
+                    best_sfx_label = label
+
+        # 🎯 "표시용 BGM 라벨" 결정 (Music 제외 로직)
+        caption_label = None
+        if music_cands:
+            labels_only = [lab for lab, _ in music_cands]
+
+            if "Music" in labels_only and len(music_cands) > 1:
+                music_cands_no_music = [(lab, sc) for lab, sc in music_cands if lab != "Music"]
+                if music_cands_no_music:
+                    caption_label, _ = max(music_cands_no_music, key=lambda x: x[1])
+                else:
+                    caption_label, _ = max(music_cands, key=lambda x: x[1])
+            else:
+                caption_label, _ = max(music_cands, key=lambda x: x[1])
 
-    # ==========================================
-    # 1) RMS 및 임팩트(효과음 후보) 계산
-    # ==========================================
-    rms = float(np.sqrt(np.mean(waveform_seg ** 2)))
+        best_bgm_label = caption_label
+        best_bgm_score = max_music_score
+
+        # 최상위 라벨 (자연음 우선 판단용 - 주로 다큐에서 사용)
+        top1_label = _labels[top_idx[0]]
+        top1_score = float(scores[top_idx[0]])
+
+        # ==========================================
+        # 🔍 디버그 로그 (PANNS_DEBUG_RAW=1 + DEBUG 레벨일 때만)
+        # ==========================================
+        if DEBUG_PANNS_RAW and logger.isEnabledFor(logging.DEBUG):
+            top5 = ", ".join(f"{_labels[i]}={float(scores[i]):.3f}" for i in top_idx[:5])
+            logger.debug(
+                "PANNs raw: mode=%s elapsed=%.2f rms=%.4f top5=[%s] best_sfx=%s(%.3f) is_impact=%s",
+                self.mode, elapsed, rms, top5, best_sfx_label, best_sfx_score, is_impact,
+                extra={"category": "panns"},
+            )
+
+        # ==========================================
+        # 모드별 threshold 설정
+        # ==========================================
+        if self.mode == "DRAMA":
+            MUSIC_MIN_SCORE = 0.12
+            SFX_MIN_SCORE = 0.22
+            STRONG_SFX_SCORE = 0.35
+            ENV_SFX_MIN_SCORE = 0.30
+            SUPPRESS_BGM_BY_SFX = False
+
+        elif self.mode == "ENTERTAINMENT":
+            MUSIC_MIN_SCORE = 0.20
+            SFX_MIN_SCORE = 0.18
+            STRONG_SFX_SCORE = 0.30
+            ENV_SFX_MIN_SCORE = 0.28
+            SUPPRESS_BGM_BY_SFX = False
+
+        else:  # DOCUMENTARY
+            MUSIC_MIN_SCORE = 0.45
+            SFX_MIN_SCORE = 0.18
+            STRONG_SFX_SCORE = 0.40
+            ENV_SFX_MIN_SCORE = 0.22
+            SUPPRESS_BGM_BY_SFX = True
+
+        # ==========================================
+        # 🎯 DOCUMENTARY 모드용 BGM 필터링
+        # ==========================================
+        if self.mode == "DOCUMENTARY":
+            # 자연/환경음이 top1 이고 점수가 꽤 높으면 → BGM 강제 OFF
+            if top1_label in ENV_SFX_LABELS and top1_score >= 0.30:
+                best_bgm_label = None
+                best_bgm_score = 0.0
 
-    # 기본 임팩트 기준
-    is_impact = (rms > _prev_rms * 1.5) or (rms > 0.05)
+            # 자연 SFX 가 BGM 보다 훨씬 강하면 BGM OFF
+            if SUPPRESS_BGM_BY_SFX:
+                if best_sfx_label in ENV_SFX_LABELS and best_sfx_score >= best_bgm_score * 0.8:
+                    best_bgm_label = None
+                    best_bgm_score = 0.0
 
-    # DRAMA 모드는 임팩트 기준을 조금 더 까다롭게
-    if MODE == "DRAMA":
-        is_impact = (rms > _prev_rms * 2.0) or (rms > 0.08)
+        # Music 계열 자체가 약하면 BGM OFF
+        if best_bgm_score < MUSIC_MIN_SCORE:
+            best_bgm_label = None
+            best_bgm_score = 0.0
 
-    _prev_rms = rms
+        # ==========================================
+        # 9) BGM 문구 안정화 로직
+        # ==========================================
+        temp_bgm_raw = ""
 
-    # ==========================================
-    # 2) PANNs 입력 준비 (1초 길이로 타일링)
-    # ==========================================
-    target_len = SAMPLE_RATE  # 1초
-    repeats = (target_len // waveform_seg.shape[0]) + 1
-    tiled_seg = np.tile(waveform_seg, repeats)[:target_len]
+        if best_bgm_label and best_bgm_score >= MUSIC_MIN_SCORE:
+            temp_bgm_raw = BGM_LABEL_TEXT.get(best_bgm_label, "")
+            if temp_bgm_raw:
+                self._bgm_last_detected_time = elapsed
+                self._last_detected_bgm_text = temp_bgm_raw
 
-    with torch.no_grad():
-        output, _ = _model.inference(tiled_seg[None, :])
+        # 최근 히스토리 업데이트
+        if temp_bgm_raw:
+            self._bgm_recent.append(temp_bgm_raw)
+            if len(self._bgm_recent) > _BGM_STABLE_COUNT:
+                self._bgm_recent.pop(0)
+        else:
+            self._bgm_recent.clear()
+
+        # N번 연속 같은 값일 때만 안정된 BGM 으로 사용
+        temp_bgm = ""
+        if self._bgm_recent:
+            if len(self._bgm_recent) == _BGM_STABLE_COUNT and len(set(self._bgm_recent)) == 1:
+                temp_bgm = self._bgm_recent[0]
+
+        # 감지가 끊겨도 BGM_HOLD_TIME 만큼은 유지
+        if not temp_bgm:
+            if elapsed - self._bgm_last_detected_time < BGM_HOLD_TIME:
+                temp_bgm = self._last_detected_bgm_text
+            else:
+                temp_bgm = ""
+
+        # ==========================================
+        # 10) 화면 표시용 BGM 게이트 (ON / OFF 딜레이)
+        # ==========================================
+        if temp_bgm:
+            self._music_stopped_at = None
+            if self._music_started_at is None:
+                self._music_started_at = elapsed
+
+            if elapsed - self._music_started_at >= self.music_on_min:
+                self._display_bgm_text = temp_bgm
+        else:
+            self._music_started_at = None
+            if self._music_stopped_at is None:
+                self._music_stopped_at = elapsed
+
+            if elapsed - self._music_stopped_at >= self.music_off_min:
+                self._display_bgm_text = ""
+
+        self.current_bgm_text = self._display_bgm_text
+
+        # ==========================================
+        # 11) 효과음(SFX) 최종 선택 (자연/환경음은 모드에 따라 처리)
+        # ==========================================
+        new_sfx = ""  # 이번 프레임에서 새로 감지된 효과음 문구
+
+        if best_sfx_label:
+            is_env_sfx = best_sfx_label in ENV_SFX_LABELS
+
+            # ------------------------
+            # DOCUMENTARY 모드
+            # ------------------------
+            if self.mode == "DOCUMENTARY":
+                if is_env_sfx:
+                    # 자연/환경 소리: 임팩트 없어도 점수만 되면 표시
+                    if best_sfx_score >= ENV_SFX_MIN_SCORE:
+                        new_sfx = SFX_LABEL_TEXT.get(best_sfx_label, "")
+                else:
+                    # 일반 효과음: 임팩트 or 높은 점수
+                    if best_sfx_score >= SFX_MIN_SCORE:
+                        if is_impact or best_sfx_score >= STRONG_SFX_SCORE:
+                            new_sfx = SFX_LABEL_TEXT.get(best_sfx_label, "")
+
+            # ------------------------
+            # ENTERTAINMENT (예능) 모드
+            # ------------------------
+            elif self.mode == "ENTERTAINMENT":
+
+                # 1) 자연음/환경음 절대 금지
+                if is_env_sfx:
+                    new_sfx = ""
+
+                # 2) 엔터용 별도 ignore 리스트도 절대 금지
+                elif best_sfx_label in IGNORE_SFX_ENTER:
+                    new_sfx = ""
+
+                # 3) 그 외 라벨만 점수 기반으로 허용
+                else:
+                    if best_sfx_score >= SFX_MIN_SCORE:
+                        if is_impact or best_sfx_score >= STRONG_SFX_SCORE:
+                            new_sfx = SFX_LABEL_TEXT.get(best_sfx_label, "")
+
+            # ------------------------
+            # DRAMA 모드
+            # ------------------------
+            else:  # self.mode == "DRAMA"
+                # DRAMA 모드는 대부분 자연음이 앞단에서 컷됨
+                if best_sfx_score >= SFX_MIN_SCORE:
+                    if is_impact or best_sfx_score >= STRONG_SFX_SCORE:
+                        new_sfx = SFX_LABEL_TEXT.get(best_sfx_label, "")
 
-    scores = output[0]
-    top_idx = np.argsort(scores)[::-1]
+        # ==========================================
+        # 12) SFX 표시 + HOLD TIME 적용
+        # ==========================================
+        if new_sfx:
+            self.current_sfx_text = new_sfx
+            self._sfx_last_time = elapsed
+        else:
+            if elapsed - self._sfx_last_time >= self.sfx_hold_time:
+                self.current_sfx_text = ""
 
-    best_bgm_label = None
-    best_bgm_score = 0.0
-    best_sfx_label = None
-    best_sfx_score = 0.0
+        # ==========================================
+        # 13) 이벤트 딕셔너리 생성 (변경 있을 때만)
+        # ==========================================
+        event = {}
 
-    music_cands = []           # 자막용 BGM 후보 (label, score)
-    max_music_score = 0.0      # Music 포함 전체 음악 중 최대 점수
+        if self.current_bgm_text != self._last_event_bgm:
+            event["bgm_text"] = self.current_bgm_text
+            self._last_event_bgm = self.current_bgm_text
 
-    # 상위 몇 개만 살펴본다
-    for i in top_idx[:10]:
-        label = _labels[i]
-        score = float(scores[i])
+        if self.current_sfx_text != self._last_event_sfx:
+            event["sfx_text"] = self.current_sfx_text
+            self._last_event_sfx = self.current_sfx_text
 
-        if label in IGNORE_LABELS:
-            continue
+        self._last_pred_time = elapsed
 
-        # DRAMA / ENTERTAINMENT 모드에서는 자연/동물 계열 라벨은 아예 후보에서 제외
-        if MODE in ("DRAMA", "ENTERTAINMENT") and label in NATURAL_LABELS:
-            continue
+        return event or None
 
-        # BGM 후보 → 리스트에 모으고, 최대 음악 점수 갱신
-        if label in BGM_LABELS:
-            music_cands.append((label, score))
-            if score > max_music_score:
-                max_music_score = score
+    def analyze_track(self, samples: np.ndarray, in_sr: int = 16000, batch_size: int = 32):
+        """
+        에셋 전체 int16 샘플 → [(시각(초), bgm_text, sfx_text), ...]
 
-        # SFX 후보
-        if label in SFX_LABELS:
+        실시간 분석과 같은 규칙(ANALYSIS_INTERVAL 주기, 0.3초 구간, 안정화/HOLD)을
+        오디오 시간 기준으로 적용하고, PANNs 추론은 batch_size 구간씩 묶어서 실행한다.
+        """
+        self.reset()
+        if _model is None or samples.size == 0:
+            return []
 
-            # DRAMA: 자연/동물 소리 제외
-            if MODE == "DRAMA" and label in IGNORE_SFX_DRAMA:
-                continue
+        # 전체를 한 번에 resample (청크 단위 resample 보다 훨씬 빠름)
+        audio = samples.astype(np.float32) / 32768.0
+        audio32 = librosa.resample(audio, orig_sr=in_sr, target_sr=SAMPLE_RATE) * VOLUME_BOOST
 
-            # DOCUMENTARY: (현재는 별도 exclude 없음)
-            if MODE == "DOCUMENTARY" and label in IGNORE_SFX_DOCUMENTARY:
-                continue
+        short_window = int(SAMPLE_RATE * 0.3)  # 0.3초 구간
+        hop = int(SAMPLE_RATE * ANALYSIS_INTERVAL)
+        ends = list(range(short_window, audio32.size + 1, hop))
 
-            # ENTERTAINMENT: 화이트리스트만 허용 (+ 추가적으로 막을 라벨)
-            if MODE == "ENTERTAINMENT":
-                if label not in ENTERTAINMENT_SFX_WHITELIST:
-                    continue
-                if label in IGNORE_SFX_ENTER:
-                    continue
+        points = []
+        for b in range(0, len(ends), batch_size):
+            batch_ends = ends[b:b + batch_size]
+            segs = [audio32[e - short_window:e] for e in batch_ends]
+            impacts = [self._impact(seg) for seg in segs]
 
-            # 여기까지 통과했다면 진짜 후보
-            if score > best_sfx_score:
-                best_sfx_score = score
-                best_sfx_label = label
+            with torch.no_grad():
+                output, _ = _model.inference(np.stack([_tile_window(seg) for seg in segs]))
 
-    # 🎯 "표시용 BGM 라벨" 결정 (Music 제외 로직)
-    caption_label = None
-    if music_cands:
-        labels_only = [lab for lab, _ in music_cands]
+            for end, scores, (rms, is_impact) in zip(batch_ends, output, impacts):
+                t = end / SAMPLE_RATE
+                self._update_from_scores(scores, rms, is_impact, t)
+                points.append((t, self.current_bgm_text, self.current_sfx_text))
 
-        if "Music" in labels_only and len(music_cands) > 1:
-            music_cands_no_music = [(lab, sc) for lab, sc in music_cands if lab != "Music"]
-            if music_cands_no_music:
-                caption_label, _ = max(music_cands_no_music, key=lambda x: x[1])
-            else:
-                caption_label, _ = max(music_cands, key=lambda x: x[1])
-        else:
-            caption_label, _ = max(music_cands, key=lambda x: x[1])
-
-    best_bgm_label = caption_label
-    best_bgm_score = max_music_score
-
-    # 최상위 라벨 (자연음 우선 판단용 - 주로 다큐에서 사용)
-    top1_label = _labels[top_idx[0]]
-    top1_score = float(scores[top_idx[0]])
-
-    # ==========================================
-    # 🔍 디버그 로그
-    # ==========================================
-    DEBUG_PANNS_RAW = True  # 필요 없으면 False 로 변경
-
-    LOG_DIR = BASE_DIR / "logs"
-    LOG_DIR.mkdir(parents=True, exist_ok=True)
-
-    RAW_LOG_PATH = LOG_DIR / "환승연애5_raw_log.txt"
-
-    if DEBUG_PANNS_RAW:
-        with open(RAW_LOG_PATH, "a") as f:
-            f.write(f"MODE={MODE}, elapsed={elapsed:.2f}, rms={rms:.4f}\n")
-            f.write("----- [RAW TOP-5] ----------------\n")
-            for i in top_idx[:5]:
-                label = _labels[i]
-                score = float(scores[i])
-                f.write(f"  {label:30s}  score={score:.3f}\n")
-            f.write("------------------------------------\n")
-            f.write(f"[SFX_DEBUG] best_sfx_label={best_sfx_label}, "
-                    f"score={best_sfx_score:.3f}, is_impact={is_impact}\n")
-            f.write("------------------------------------\n\n")
-
-    # ==========================================
-    # 모드별 threshold 설정
-    # ==========================================
-    if MODE == "DRAMA":
-        MUSIC_MIN_SCORE = 0.12
-        SFX_MIN_SCORE = 0.22
-        STRONG_SFX_SCORE = 0.35
-        ENV_SFX_MIN_SCORE = 0.30
-        SUPPRESS_BGM_BY_SFX = False
-
-    elif MODE == "ENTERTAINMENT":
-        MUSIC_MIN_SCORE = 0.20
-        SFX_MIN_SCORE = 0.18
-        STRONG_SFX_SCORE = 0.30
-        ENV_SFX_MIN_SCORE = 0.28
-        SUPPRESS_BGM_BY_SFX = False
-
-    else:  # DOCUMENTARY
-        MUSIC_MIN_SCORE = 0.45
-        SFX_MIN_SCORE = 0.18
-        STRONG_SFX_SCORE = 0.40
-        ENV_SFX_MIN_SCORE = 0.22
-        SUPPRESS_BGM_BY_SFX = True
-
-    # ==========================================
-    # 🎯 DOCUMENTARY 모드용 BGM 필터링
-    # ==========================================
-    if MODE == "DOCUMENTARY":
-        # 자연/환경음이 top1 이고 점수가 꽤 높으면 → BGM 강제 OFF
-        if top1_label in ENV_SFX_LABELS and top1_score >= 0.30:
-            best_bgm_label = None
-            best_bgm_score = 0.0
+        return points
 
-        # 자연 SFX 가 BGM 보다 훨씬 강하면 BGM OFF
-        if SUPPRESS_BGM_BY_SFX:
-            if best_sfx_label in ENV_SFX_LABELS and best_sfx_score >= best_bgm_score * 0.8:
-                best_bgm_label = None
-                best_bgm_score = 0.0
 
-    # Music 계열 자체가 약하면 BGM OFF
-    if best_bgm_score < MUSIC_MIN_SCORE:
-        best_bgm_label = None
-        best_bgm_score = 0.0
+# ==========================================
+# 8) 모듈 함수 (기본 분석기 1개 공유 - 단독 실행 / 기존 러너 호환용)
+# ==========================================
+_default_analyzer = BgmAnalyzer()
 
-    # ==========================================
-    # 9) BGM 문구 안정화 로직
-    # ==========================================
-    temp_bgm_raw = ""
+# 외부에서 읽어갈 현재 표시용 텍스트 (기본 분석기 기준)
+current_bgm_text: str = ""
+current_sfx_text: str = ""
 
-    if best_bgm_label and best_bgm_score >= MUSIC_MIN_SCORE:
-        temp_bgm_raw = BGM_LABEL_TEXT.get(best_bgm_label, "")
-        if temp_bgm_raw:
-            _bgm_last_detected_time = elapsed
-            _last_detected_bgm_text = temp_bgm_raw
-
-    # 최근 히스토리 업데이트
-    if temp_bgm_raw:
-        _bgm_recent.append(temp_bgm_raw)
-        if len(_bgm_recent) > _BGM_STABLE_COUNT:
-            _bgm_recent.pop(0)
-    else:
-        _bgm_recent.clear()
-
-    # N번 연속 같은 값일 때만 안정된 BGM 으로 사용
-    temp_bgm = ""
-    if _bgm_recent:
-        if len(_bgm_recent) == _BGM_STABLE_COUNT and len(set(_bgm_recent)) == 1:
-            temp_bgm = _bgm_recent[0]
-
-    # 감지가 끊겨도 BGM_HOLD_TIME 만큼은 유지
-    if not temp_bgm:
-        if elapsed - _bgm_last_detected_time < BGM_HOLD_TIME:
-            temp_bgm = _last_detected_bgm_text
-        else:
-            temp_bgm = ""
-
-    # ==========================================
-    # 10) 화면 표시용 BGM 게이트 (ON / OFF 딜레이)
-    # ==========================================
-    if temp_bgm:
-        _music_stopped_at = None
-        if _music_started_at is None:
-            _music_started_at = elapsed
-
-        if elapsed - _music_started_at >= MUSIC_ON_MIN:
-            _display_bgm_text = temp_bgm
-    else:
-        _music_started_at = None
-        if _music_stopped_at is None:
-            _music_stopped_at = elapsed
-
-        if elapsed - _music_stopped_at >= MUSIC_OFF_MIN:
-            _display_bgm_text = ""
-
-    current_bgm_text = _display_bgm_text
-
-    # ==========================================
-    # 11) 효과음(SFX) 최종 선택 (자연/환경음은 모드에 따라 처리)
-    # ==========================================
-    new_sfx = ""  # 이번 프레임에서 새로 감지된 효과음 문구
-
-    if best_sfx_label:
-        is_env_sfx = best_sfx_label in ENV_SFX_LABELS
-
-        # ------------------------
-        # DOCUMENTARY 모드
-        # ------------------------
-        if MODE == "DOCUMENTARY":
-            if is_env_sfx:
-                # 자연/환경 소리: 임팩트 없어도 점수만 되면 표시
-                if best_sfx_score >= ENV_SFX_MIN_SCORE:
-                    new_sfx = SFX_LABEL_TEXT.get(best_sfx_label, "")
-            else:
-                # 일반 효과음: 임팩트 or 높은 점수
-                if best_sfx_score >= SFX_MIN_SCORE:
-                    if is_impact or best_sfx_score >= STRONG_SFX_SCORE:
-                        new_sfx = SFX_LABEL_TEXT.get(best_sfx_label, "")
 
-        # ------------------------
-        # ENTERTAINMENT (예능) 모드
-        # ------------------------
-        elif MODE == "ENTERTAINMENT":
+def reset_state():
+    """기본 분석기 상태 초기화"""
+    global current_bgm_text, current_sfx_text
+    _default_analyzer.reset()
+    current_bgm_text = current_sfx_text = ""
 
-            # 1) 자연음/환경음 절대 금지
-            if is_env_sfx:
-                new_sfx = ""
 
-            # 2) 엔터용 별도 ignore 리스트도 절대 금지
-            elif best_sfx_label in IGNORE_SFX_ENTER:
-                new_sfx = ""
+def analyze_bgm_chunk(chunk: bytes, in_sr: int = 16000, now: float = None):
+    """기본 분석기로 chunk 분석 (BgmAnalyzer.analyze_chunk 참고)"""
+    global current_bgm_text, current_sfx_text
+    event = _default_analyzer.analyze_chunk(chunk, in_sr, now)
+    current_bgm_text = _default_analyzer.current_bgm_text
+    current_sfx_text = _default_analyzer.current_sfx_text
+    return event
 
-            # 3) 그 외 라벨만 점수 기반으로 허용
-            else:
-                if best_sfx_score >= SFX_MIN_SCORE:
-                    if is_impact or best_sfx_score >= STRONG_SFX_SCORE:
-                        new_sfx = SFX_LABEL_TEXT.get(best_sfx_label, "")
 
-        # ------------------------
-        # DRAMA 모드
-        # ------------------------
-        else:  # MODE == "DRAMA"
-            # DRAMA 모드는 대부분 자연음이 앞단에서 컷됨
-            if best_sfx_score >= SFX_MIN_SCORE:
-                if is_impact or best_sfx_score >= STRONG_SFX_SCORE:
-                    new_sfx = SFX_LABEL_TEXT.get(best_sfx_label, "")
-
-    # ==========================================
-    # 12) SFX 표시 + HOLD TIME 적용
-    # ==========================================
-    if new_sfx:
-        current_sfx_text = new_sfx
-        _sfx_last_time = elapsed
-    else:
-        if elapsed - _sfx_last_time >= _SFX_HOLD_TIME:
-            current_sfx_text = ""
-
-    # ==========================================
-    # 13) 이벤트 딕셔너리 생성 (변경 있을 때만)
-    # ==========================================
-    event = {}
-
-    if current_bgm_text != _last_event_bgm:
-        event["bgm_text"] = current_bgm_text
-        _last_event_bgm = current_bgm_text
-
-    if current_sfx_text != _last_event_sfx:
-        event["sfx_text"] = current_sfx_text
-        _last_event_sfx = current_sfx_text
-
-    _last_pred_time = elapsed
-
-    return event or None
+# ==========================================
+# 8-2) 오프라인 분석 (에셋 전체를 한 번에)
+# ==========================================
+def analyze_bgm_track(
+    samples: np.ndarray, in_sr: int = 16000, batch_size: int = 32, analyzer: BgmAnalyzer = None, mode: str = None
+):
+    """에셋 전체 int16 샘플 → [(시각(초), bgm_text, sfx_text), ...] (analyzer 가 없으면 mode 로 새로 만들어 사용)"""
+    if analyzer is None:
+        analyzer = BgmAnalyzer(mode)
+    return analyzer.analyze_track(samples, in_sr, batch_size)
@@ -1,18 +1,8 @@
 # ai_engine/speaker_diarization.py
+# 매핑 상태는 SpeakerTracker 에 보관 (세션/러너마다 1개),
+# 모듈 함수(map_speaker_id / stabilize_speaker / reset_speaker_map)는 기본 tracker 1개를 쓰는 기존 인터페이스
 from collections import Counter
-
-# ---------------------------------------------------------
-# 화자(speaker) 처리 유틸
-# ---------------------------------------------------------
-
-# Deepgram speaker → 우리 UI 인물번호 매핑 저장
-#   - key: Deepgram speaker id (0,1,2,…)
-#   - val: 우리 쪽 인물번호(1,2,3,…)  → 화면에 [인물1], [인물2] 이런 식으로 표시
-SPEAKER_MAP = {}
-NEXT_SPEAKER_LABEL = 1  # 인물1, 인물2, ... 이런 식으로 증가
-
-# 화면에 마지막으로 사용한 인물 번호 (stabilize_speaker 에서 사용)
-LAST_SPEAKER = None
+from typing import Dict, Optional
 
 
 def get_major_speaker(alt):
@@ -38,58 +28,106 @@ def get_major_speaker(alt):
     return major_id
 
 
-def map_speaker_id(raw_id):
-    """
-    Deepgram speaker id (0,1,2,…)를
-    우리 쪽 인물번호(1,2,3,…)로 매핑.
-    한 번 매핑된 값은 계속 유지된다.
-    """
-    global NEXT_SPEAKER_LABEL
-
-    if raw_id is None:
-        return None
-
-    if raw_id not in SPEAKER_MAP:
-        SPEAKER_MAP[raw_id] = NEXT_SPEAKER_LABEL
-        NEXT_SPEAKER_LABEL += 1
+class SpeakerTracker:
+    """Deepgram speaker → 인물번호 매핑 상태 (세션 1개 분량, 생성/스냅샷 비용이 작음)
 
-    return SPEAKER_MAP[raw_id]
-
-
-def stabilize_speaker(raw_id, text: str, min_len: int = 3):
-    """
-    화자 id 를 '안정화'해서 리턴하는 헬퍼.
-
-    - raw_id      : Deepgram이 준 speaker id (0,1,2,… 또는 None)
-    - text        : 이번 segment의 자막 텍스트
-    - min_len     : 이 길이 이하의 짧은 문장에서는 화자를 바꾸지 않음
-
-    규칙:
-      1) text가 너무 짧으면 (기본 3글자 이하) → 이전 화자(LAST_SPEAKER) 유지
-      2) raw_id 가 None 이면 → 이전 화자 유지
-      3) 위 두 경우가 아니면 → map_speaker_id 로 매핑하고 그 값을 LAST_SPEAKER로 저장
+    - speaker_map : Deepgram speaker id (0,1,2,…) → 우리 쪽 인물번호(1,2,3,…)
+                    → 화면에 [인물1], [인물2] 이런 식으로 표시
+    - next_label  : 다음에 새로 줄 인물번호
+    - last_speaker: 화면에 마지막으로 사용한 인물 번호 (stabilize_speaker 에서 사용)
     """
-    global LAST_SPEAKER
+    __slots__ = ("speaker_map", "next_label", "last_speaker")
+
+    def __init__(self, speaker_map: Optional[Dict] = None, next_label: int = 1, last_speaker=None):
+        self.speaker_map = dict(speaker_map) if speaker_map else {}
+        self.next_label = next_label
+        self.last_speaker = last_speaker
+
+    get_major_speaker = staticmethod(get_major_speaker)
+
+    def map_speaker_id(self, raw_id):
+        """
+        Deepgram speaker id (0,1,2,…)를
+        우리 쪽 인물번호(1,2,3,…)로 매핑.
+        한 번 매핑된 값은 계속 유지된다.
+        """
+        if raw_id is None:
+            return None
+
+        if raw_id not in self.speaker_map:
+            self.speaker_map[raw_id] = self.next_label
+            self.next_label += 1
+
+        return self.speaker_map[raw_id]
+
+    def stabilize_speaker(self, raw_id, text: str, min_len: int = 3):
+        """
+        화자 id 를 '안정화'해서 리턴하는 헬퍼.
+
+        - raw_id      : Deepgram이 준 speaker id (0,1,2,… 또는 None)
+        - text        : 이번 segment의 자막 텍스트
+        - min_len     : 이 길이 이하의 짧은 문장에서는 화자를 바꾸지 않음
+
+        규칙:
+          1) text가 너무 짧으면 (기본 3글자 이하) → 이전 화자(last_speaker) 유지
+          2) raw_id 가 None 이면 → 이전 화자 유지
+          3) 위 두 경우가 아니면 → map_speaker_id 로 매핑하고 그 값을 last_speaker로 저장
+        """
+        # Deepgram id → 우리 인물 번호(1,2,3,…)로 매핑
+        mapped = self.map_speaker_id(raw_id)
+
+        # 너무 짧은 텍스트(추임새, 단발음 등)는 화자 전환 안 함
+        if not text or len(text.strip()) <= min_len:
+            return self.last_speaker
+
+        # speaker 정보가 없으면 이전 화자 유지
+        if mapped is None:
+            return self.last_speaker
+
+        # 정상적인 경우: 화자 업데이트
+        self.last_speaker = mapped
+        return self.last_speaker
+
+    def reset(self):
+        """speaker 매핑 & 상태 초기화."""
+        self.speaker_map = {}
+        self.next_label = 1
+        self.last_speaker = None
+
+    def snapshot(self) -> Dict:
+        """현재 상태 (JSON 직렬화 가능, from_snapshot 으로 복원)"""
+        return {
+            "speaker_map": [[raw_id, label] for raw_id, label in self.speaker_map.items()],
+            "next_label": self.next_label,
+            "last_speaker": self.last_speaker,
+        }
+
+    @classmethod
+    def from_snapshot(cls, state: Dict) -> "SpeakerTracker":
+        return cls(
+            {raw_id: label for raw_id, label in state.get("speaker_map", [])},
+            state.get("next_label", 1),
+            state.get("last_speaker"),
+        )
+
+    def copy(self) -> "SpeakerTracker":
+        return SpeakerTracker(self.speaker_map, self.next_label, self.last_speaker)
+
+
+# 모듈 함수용 기본 tracker (세션 구분 없이 쓰는 기존 코드용)
+_default_tracker = SpeakerTracker()
 
-    # Deepgram id → 우리 인물 번호(1,2,3,…)로 매핑
-    mapped = map_speaker_id(raw_id)
 
-    # 너무 짧은 텍스트(추임새, 단발음 등)는 화자 전환 안 함
-    if not text or len(text.strip()) <= min_len:
-        return LAST_SPEAKER
+def map_speaker_id(raw_id):
+    """기본 tracker 로 Deepgram speaker id → 인물번호 매핑 (SpeakerTracker.map_speaker_id 참고)"""
+    return _default_tracker.map_speaker_id(raw_id)
 
-    # speaker 정보가 없으면 이전 화자 유지
-    if mapped is None:
-        return LAST_SPEAKER
 
-    # 정상적인 경우: 화자 업데이트
-    LAST_SPEAKER = mapped
-    return LAST_SPEAKER
+def stabilize_speaker(raw_id, text: str, min_len: int = 3):
+    """기본 tracker 로 화자 안정화 (SpeakerTracker.stabilize_speaker 참고)"""
+    return _default_tracker.stabilize_speaker(raw_id, text, min_len)
 
 
 def reset_speaker_map():
     """필요할 때 speaker 매핑 & 상태 초기화."""
-    global SPEAKER_MAP, NEXT_SPEAKER_LABEL, LAST_SPEAKER
-    SPEAKER_MAP = {}
-    NEXT_SPEAKER_LABEL = 1
-    LAST_SPEAKER = None
+    _default_tracker.reset()
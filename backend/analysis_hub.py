@@ -0,0 +1,310 @@
+"""
+에셋별 공유 분석 세션 (같은 에셋을 보는 시청자들이 STT/BGM/감정 분석 결과를 공유)
+- (에셋, 모드) 당 producer 세션 1개가 자막 이벤트를 공유 로그에 기록
+- 시청자(Subscriber)는 자기 재생 위치부터 구독
+    • 이미 로그에 있는 자막은 즉시 backfill (송신 대기열이 넘치지 않게 나눠서)
+    • 이후 자막은 producer 가 만드는 대로 전달
+- 시청자의 재생 위치가 producer 가 처리 중인 구간 밖이면 (너무 앞/뒤) 별도 세션을 만든다
+- 마지막 시청자가 나가면 잠시 기다렸다가 producer 종료, 끝까지 분석한 세션 로그는 일정 시간 보관
+- 로그는 producer 위치 기준 최근 LOG_REPLAY_SECONDS 만 보관 (backfill 중인 시청자가 아직 못 받은 것은 제외)
+    • 트랙 저장이 가능한 세션(0초부터 한 번에 분석)은 저장할 때까지 전체 로그 유지
+    • 잘라낸 구간(log_start 이전)으로는 합류/seek 하지 않고 별도 세션을 만든다
+- 임시 자막(provisional)은 로그에 남기지 않고 현재 시청자에게만 전달
+- 시청자 제어 (seek / pause / resume / rate)
+    • seek: 세션 범위 안이면 로그에서 다시 backfill, 혼자 보는 세션이면 producer 를 그 위치로 이동
+      (producer 를 옮기면 로그를 비움 → 이전 자막을 다시 backfill 하거나 트랙에 겹쳐 저장하지 않음)
+    • 모든 시청자가 일시정지하면 producer 도 멈춤, 재생 속도는 시청자 중 가장 빠른 값을 따름
+"""
+import logging
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 기존 세션에 합류할 수 있는 재생 위치 범위 (초)
+JOIN_BEHIND_TOLERANCE = 2.0   # 세션 시작 위치보다 이만큼 앞까지 허용
+JOIN_AHEAD_TOLERANCE = 30.0   # producer 처리 위치보다 이만큼 뒤까지 허용 (producer 가 실시간보다 빠름)
+# 마지막 시청자가 나간 뒤 producer 를 유지하는 시간 (재접속 대비, 초)
+IDLE_GRACE_SECONDS = 5.0
+# 끝까지 분석한 세션 로그를 메모리에 보관하는 시간 (초)
+FINISHED_TTL_SECONDS = 600.0
+# producer 이동 후 새 위치보다 이만큼 뒤에서 시작하는 자막은 이동 전 구간의 늦은 결과로 보고 버림 (초)
+SEEK_STALE_TOLERANCE = 1.0
+# producer 위치보다 이만큼 이전까지의 로그만 보관 (늦게 합류/seek 한 시청자 backfill 용, 초)
+LOG_REPLAY_SECONDS = 120.0
+
+SessionKey = Tuple[str, str]  # (에셋 이름, 분석 모드)
+
+
+class Subscriber:
+    """시청자 1명 (재생 시작 위치 + 송신 대기열)"""
+
+    def __init__(self, sender, offset: float = 0.0, interim_captions: bool = False):
+        self.sender = sender
+        self.offset = offset
+        self.interim_captions = interim_captions
+        self.live = False  # backfill 이 끝나 실시간 이벤트를 받는 중
+        self.paused = False
+        self.rate = 1.0
+        self._delivered: Set = set()  # 전달한 final 의 caption_id (패치 전달 여부 판단)
+        self.generation = 0  # reset 할 때마다 증가 (진행 중이던 backfill 중단)
+        self.cursor: Optional[int] = None  # backfill 중인 로그 위치 (절대 번호, 이 앞까지만 로그를 자를 수 있음)
+
+    def reset(self, offset: float):
+        """재생 위치 이동 (다시 backfill 받을 준비)"""
+        self.offset = offset
+        self.live = False
+        self._delivered.clear()
+        self.generation += 1
+
+    @property
+    def closed(self) -> bool:
+        return self.sender.closed
+
+    def deliver(self, event: Dict) -> bool:
+        """이 시청자에게 필요한 이벤트만 송신 대기열에 추가"""
+        msg_type = event.get("type")
+        if msg_type in ("provisional", "retract"):
+            if not self.interim_captions:
+                return True
+        elif msg_type == "final":
+            if event.get("end", self.offset) < self.offset:
+                return True
+            self._delivered.add(event.get("caption_id"))
+        elif msg_type == "patch":
+            if event.get("caption_id") not in self._delivered:
+                return True
+        # 로그 이벤트는 여러 시청자가 공유하므로 복사해서 전달 (송신 대기열이 패치를 final 에 합치기 때문)
+        return self.sender.send(dict(event))
+
+
+class AnalysisSession:
+    """(에셋, 모드) 당 producer 1개 + 공유 자막 로그 + 시청자 목록"""
+
+    def __init__(self, key: SessionKey, start_offset: float = 0.0):
+        self.key = key
+        self.start_offset = start_offset  # producer 가 분석을 시작한 오디오 위치 (초)
+        self.position = start_offset      # producer 가 지금까지 처리한 오디오 위치 (초)
+        self.log: List[Dict] = []
+        self.log_base = 0        # 앞에서 잘라낸 로그 이벤트 수 (log[i] 의 절대 번호 = log_base + i)
+        self.log_start = 0.0     # 잘라낸 자막이 덮던 구간의 끝 (이 위치 이전으로는 backfill 불가)
+        self.keep_full_log = start_offset == 0.0  # 트랙 저장 전까지 전체 로그 유지 (release_log 로 해제)
+        self.subscribers: Set[Subscriber] = set()
+        self.complete = False  # 오디오 끝까지 읽음 (로그가 끝까지 채워질 세션)
+        self.stopped = False   # 시청자가 없어 producer 중단 요청됨
+        self.pending_seek: Optional[float] = None  # producer 가 이동해야 할 위치 (초)
+        self.seeked = False  # producer 를 한 번이라도 옮김 (로그가 처음부터 이어진 1회 분석이 아님 → 트랙 저장 안 함)
+        self.epoch = 0       # producer 를 옮길 때마다 증가 (이전 로그 기준 backfill 중단)
+        self.audio_gate = None  # producer 의 음성 게이트 (STT 로 보내지 않은 오디오 비율 보고용)
+        self.speakers = None    # producer 의 화자 → 인물번호 매핑 (SpeakerTracker)
+        self.finished = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+        self._idle_handle: Optional[asyncio.TimerHandle] = None
+
+    def covers(self, offset: float) -> bool:
+        """이 재생 위치의 시청자가 합류할 수 있는지"""
+        if offset < self.start_offset - JOIN_BEHIND_TOLERANCE or offset < self.log_start:
+            return False
+        if self.stopped:
+            return False
+        if self.complete:
+            return True
+        if self.finished.is_set():
+            return False
+        return offset <= self.position + JOIN_AHEAD_TOLERANCE
+
+    def wants_interim(self) -> bool:
+        """임시 자막을 받을 시청자가 있는지 (없으면 producer 가 만들지 않음)"""
+        return any(s.live and s.interim_captions for s in self.subscribers)
+
+    @property
+    def paused(self) -> bool:
+        """시청자가 모두 일시정지 → producer 도 오디오 전송을 멈춤"""
+        return bool(self.subscribers) and all(s.paused for s in self.subscribers)
+
+    @property
+    def rate(self) -> float:
+        """producer 재생 속도 배율 (재생 중인 시청자 중 가장 빠른 값)"""
+        return max((s.rate for s in self.subscribers if not s.paused), default=1.0)
+
+    def mark_complete(self):
+        self.complete = True
+
+    def request_seek(self, offset: float):
+        """producer 를 offset 위치로 이동 (STT 연결은 유지, 오디오 루프가 다음 청크에서 처리)"""
+        self.pending_seek = offset
+        self.start_offset = offset
+        self.position = offset
+        self.complete = False
+        # 이전 위치의 로그는 버림 (새 위치부터 다시 만들어짐)
+        self.log = []
+        self.log_base = 0
+        self.log_start = 0.0
+        self.keep_full_log = False
+        self.seeked = True
+        self.epoch += 1
+
+    def _is_stale(self, event: Dict) -> bool:
+        """producer 이동 전 구간의 자막 (이동 직전에 대기열에 있던 결과)"""
+        if not self.seeked or event.get("type") not in ("final", "patch"):
+            return False
+        start, end = event.get("start"), event.get("end")
+        if end is not None and end < self.start_offset:
+            return True
+        return start is not None and start > self.position + SEEK_STALE_TOLERANCE
+
+    def publish(self, event: Dict) -> bool:
+        """producer → 로그 기록 + 실시간 시청자에게 전달 (중단 요청된 세션이면 False)"""
+        if self.stopped:
+            return False
+        if self._is_stale(event):
+            return True
+        if event.get("type") != "provisional":
+            self.log.append(event)
+            self._trim_log()
+        for sub in list(self.subscribers):
+            if sub.live and not sub.closed:
+                sub.deliver(event)
+        return True
+
+    def release_log(self):
+        """트랙 저장이 끝났거나 하지 않기로 함 → 이후로는 최근 구간만 보관"""
+        self.keep_full_log = False
+        self._trim_log()
+
+    def _trim_log(self):
+        """producer 위치보다 LOG_REPLAY_SECONDS 이전의 로그를 앞에서부터 버림"""
+        if self.keep_full_log:
+            return
+        cutoff = self.position - LOG_REPLAY_SECONDS
+        # backfill 중인 시청자가 아직 받지 않은 이벤트는 남김
+        limit = min((s.cursor for s in self.subscribers if s.cursor is not None), default=None)
+        n = 0
+        while n < len(self.log) and (limit is None or self.log_base + n < limit):
+            end = self.log[n].get("end")
+            if end is not None and end >= cutoff:
+                break
+            if end is not None:
+                self.log_start = max(self.log_start, end)
+            n += 1
+        if n:
+            del self.log[:n]
+            self.log_base += n
+
+    async def subscribe(self, sub: Subscriber):
+        """로그 backfill 후 실시간 전달 시작 (backfill 중 추가된 이벤트도 빠짐없이 전달)"""
+        self.cancel_idle()
+        self.subscribers.add(sub)
+        await self._backfill(sub)
+
+    async def reseat(self, sub: Subscriber, offset: float):
+        """같은 세션 안에서 시청자 재생 위치 이동 (새 위치부터 로그 다시 backfill)"""
+        sub.reset(offset)
+        await self._backfill(sub)
+
+    async def _backfill(self, sub: Subscriber):
+        high_water = max(1, sub.sender.max_queue // 2)
+        epoch, generation = self.epoch, sub.generation
+        i = sub.cursor = self.log_base  # 절대 번호 (backfill 중에도 앞부분이 잘릴 수 있음)
+        while i < self.log_base + len(self.log):
+            if sub.closed:
+                sub.cursor = None
+                return
+            if self.epoch != epoch or sub.generation != generation:
+                return  # producer 이동 / 시청자 재이동 → 새로 시작한 backfill 이 이어서 처리
+            if sub.sender.depth >= high_water:
+                await asyncio.sleep(0.05)
+                continue
+            sub.deliver(self.log[i - self.log_base])
+            i = sub.cursor = i + 1
+        sub.cursor = None
+        sub.live = True
+
+    def unsubscribe(self, sub: Subscriber):
+        self.subscribers.discard(sub)
+        if not self.subscribers and not self.finished.is_set():
+            self.cancel_idle()
+            self._idle_handle = asyncio.get_event_loop().call_later(IDLE_GRACE_SECONDS, self.stop)
+
+    def cancel_idle(self):
+        if self._idle_handle is not None:
+            self._idle_handle.cancel()
+            self._idle_handle = None
+
+    def stop(self):
+        """producer 중단 요청 (producer 가 확인 후 정리하고 종료)"""
+        self._idle_handle = None
+        if not self.subscribers:
+            logger.info(f"💤 시청자 없음 → 분석 중단: {self.key}")
+            self.stopped = True
+
+    def metrics(self) -> Dict:
+        return {
+            "asset": self.key[0],
+            "mode": self.key[1],
+            "start": self.start_offset,
+            "position": round(self.position, 2),
+            "subscribers": len(self.subscribers),
+            "log_size": len(self.log),
+            "log_base": self.log_base,
+            "log_start": round(self.log_start, 2),
+            "complete": self.complete,
+            "seeked": self.seeked,
+            "finished": self.finished.is_set(),
+            "audio_gate": self.audio_gate.metrics() if self.audio_gate is not None else None,
+            "speakers": self.speakers.snapshot() if self.speakers is not None else None,
+        }
+
+
+class AnalysisHub:
+    """세션 레지스트리: 시청자를 기존 세션에 합류시키거나 새 producer 를 시작"""
+
+    def __init__(self):
+        self._sessions: Dict[SessionKey, AnalysisSession] = {}
+        self._private: Set[AnalysisSession] = set()  # 공유 세션 범위 밖 시청자용 세션
+
+    async def join(
+        self,
+        key: SessionKey,
+        sub: Subscriber,
+        produce: Callable[[AnalysisSession], Awaitable[None]],
+    ) -> AnalysisSession:
+        """시청자를 세션에 등록 (없으면 produce(session) 으로 producer 시작)"""
+        session = self._sessions.get(key)
+        if session is not None and session.covers(sub.offset):
+            logger.info(f"🔗 기존 세션 합류: {key} (위치 {sub.offset:.1f}s, 로그 {len(session.log)}개)")
+            await session.subscribe(sub)
+            return session
+
+        running = session is not None and not session.stopped and not session.finished.is_set()
+        session = AnalysisSession(key, sub.offset)
+        if running:
+            # 공유 세션이 아직 진행 중이면 그대로 두고 이 시청자만 별도 세션 사용
+            self._private.add(session)
+            logger.info(f"➕ 공유 세션 범위 밖 → 별도 세션 시작: {key} (위치 {sub.offset:.1f}s)")
+        else:
+            self._sessions[key] = session
+            logger.info(f"🆕 새 분석 세션 시작: {key} (위치 {sub.offset:.1f}s)")
+        await session.subscribe(sub)
+        session.task = asyncio.ensure_future(produce(session))
+        session.task.add_done_callback(lambda _: self._on_finished(session))
+        return session
+
+    def _on_finished(self, session: AnalysisSession):
+        session.finished.set()
+        session.cancel_idle()
+        self._private.discard(session)
+        if self._sessions.get(session.key) is not session:
+            return
+        if session.complete and not session.stopped:
+            # 끝까지 분석한 로그는 늦게 온 시청자를 위해 보관
+            asyncio.get_event_loop().call_later(FINISHED_TTL_SECONDS, self._expire, session)
+        else:
+            del self._sessions[session.key]
+
+    def _expire(self, session: AnalysisSession):
+        if self._sessions.get(session.key) is session:
+            del self._sessions[session.key]
+
+    def metrics(self) -> List[Dict]:
+        return [s.metrics() for s in list(self._sessions.values()) + list(self._private)]
@@ -0,0 +1,275 @@
+"""
+분석 모델 / 오프라인 분석 실행 (FastAPI 앱과 분리)
+- init_models(): 감정 분석(ai_engine KLUE-BERT 또는 EmotionAnalyzer), PANNs BGM/SFX, Deepgram 클라이언트 로드
+  → 모듈 import 만으로는 모델을 로드하지 않음 (spawn 으로 뜬 자식 프로세스가 모델을 다시 로드하지 않도록)
+- 실시간 서버(video_analyzer_server), 오프라인 분석 워커(job_worker), CLI(offline_analyzer)가 같은 설정/모델 사용
+  → 워커 프로세스는 이 모듈만 import (FastAPI 앱 / 실시간 세션 상태는 로드하지 않음)
+"""
+import os
+import sys
+import asyncio
+import logging
+import functools
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from caption_track import save_track
+from local_stt import CpuTranscriber, LocalSttPool, is_available as local_stt_available
+from offline_analyzer import DeepgramTranscriber, LocalTranscriber, analyze_asset, transcript_sidecar_path
+from speaker_embedding import load_asset_speakers
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+DEEPGRAM_API_KEY = os.getenv("DEEPGRAM_API_KEY")
+# 실시간 STT WebSocket 주소 변경 (로컬 가짜 STT 서버 테스트 등, 미지정 시 Deepgram 기본값)
+DEEPGRAM_WS_URL = os.getenv("DEEPGRAM_WS_URL")
+# 로컬 CPU STT: 모델 경로 (faster-whisper CTranslate2 / Vosk 모델 디렉터리), 엔진, 워커 프로세스 수 (0: 현재 프로세스), 프로세스당 스레드 수
+LOCAL_STT_MODEL = os.getenv("LOCAL_STT_MODEL")
+LOCAL_STT_ENGINE = os.getenv("LOCAL_STT_ENGINE", "auto").lower()
+LOCAL_STT_WORKERS = int(os.getenv("LOCAL_STT_WORKERS", "2"))
+LOCAL_STT_THREADS = int(os.getenv("LOCAL_STT_THREADS", "2"))
+# 화자 임베딩으로 인물 번호를 에셋 단위로 고정 ("1" 이면 사용, Deepgram 화자 id 대신 로컬 CPU 군집 사용)
+USE_SPEAKER_EMBEDDING = os.getenv("SPEAKER_EMBEDDING", "0") == "1"
+
+# 감정 이름 (영어 → 한글)
+EMOTION_KO_MAP = {
+    "joy": "기쁨",
+    "sadness": "슬픔",
+    "anger": "분노",
+    "fear": "공포",
+    "surprise": "놀람",
+    "disgust": "혐오",
+    "neutral": "중립"
+}
+
+# init_models() 에서 설정
+USE_PANNS_BGM = False
+panns_module = None  # ai_engine.panns_bgm_analyzer
+USE_AI_ENGINE_EMOTION = False
+EMOTION_ICON: Dict[str, str] = {}
+analyze_emotion = None
+analyze_emotion_batch = None
+emotion_analyzer = None
+deepgram_client = None
+local_stt_pool: Optional[LocalSttPool] = None  # 로컬 CPU STT 워커 풀 (처음 사용할 때 생성)
+# DX_Project_2 방식: 팔레트 레벨 (기본값 2)
+palette_level = 2
+
+
+def _load_ai_engine():
+    """ai_engine 의 PANNs BGM/SFX, 감정 분석 모듈 로드 (없으면 해당 기능 비활성화 / 기본 감정 분석)"""
+    global USE_PANNS_BGM, panns_module, USE_AI_ENGINE_EMOTION, EMOTION_ICON
+    global analyze_emotion, analyze_emotion_batch, emotion_analyzer
+
+    ai_engine_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'ai_engine')
+    if os.path.dirname(ai_engine_path) not in sys.path:
+        sys.path.insert(0, os.path.dirname(ai_engine_path))
+
+    # PANNs BGM/SFX 분석 모듈
+    try:
+        if os.path.exists(ai_engine_path):
+            import ai_engine.panns_bgm_analyzer as panns
+            panns_module = panns
+            USE_PANNS_BGM = True
+            logger.info("✅ PANNs BGM/SFX 분석 모듈 로드 성공")
+        else:
+            logger.warning("⚠️ ai_engine 경로를 찾을 수 없습니다. PANNs BGM/SFX 분석 비활성화")
+    except ImportError as e:
+        logger.warning(f"⚠️ PANNs BGM/SFX 분석 모듈 로드 실패: {e}. BGM/SFX 분석 비활성화")
+
+    # DX_Project_2 방식: ai_engine 감정 분석 사용 (없으면 EmotionAnalyzer)
+    try:
+        if os.path.exists(ai_engine_path):
+            from ai_engine.emotion_wrapper import analyze_emotion as _analyze, analyze_emotion_batch as _analyze_batch
+            from ai_engine.kluebert_emotion import EMOTION_ICON as _icons
+            analyze_emotion, analyze_emotion_batch, EMOTION_ICON = _analyze, _analyze_batch, _icons
+            USE_AI_ENGINE_EMOTION = True
+            logger.info("✅ ai_engine 감정 분석 모듈 로드 성공")
+        else:
+            logger.warning("⚠️ ai_engine 경로를 찾을 수 없습니다. 기본 감정 분석 사용")
+    except ImportError as e:
+        logger.warning(f"⚠️ ai_engine 모듈 로드 실패: {e}. 기본 감정 분석 사용")
+
+    if not USE_AI_ENGINE_EMOTION:
+        try:
+            from ai_engine.emotion_analyzer import EmotionAnalyzer
+            emotion_analyzer = EmotionAnalyzer(r"C:\Users\155\Downloads\My_Emotion_Model")
+        except Exception as e:
+            logger.error(f"❌ 기본 감정 분석 모델 로드 실패: {e}. 감정은 중립으로 표시")
+
+
+def init_models():
+    """모델 / STT 클라이언트 로드 (프로세스마다 한 번)"""
+    global deepgram_client
+    try:
+        _load_ai_engine()
+        if DEEPGRAM_API_KEY:
+            from deepgram import AsyncDeepgramClient
+            if DEEPGRAM_WS_URL:
+                from deepgram.environment import DeepgramClientEnvironment
+                environment = DeepgramClientEnvironment(
+                    base="https://api.deepgram.com", production=DEEPGRAM_WS_URL, agent=DEEPGRAM_WS_URL
+                )
+                deepgram_client = AsyncDeepgramClient(api_key=DEEPGRAM_API_KEY, environment=environment)
+                logger.info(f"🔧 실시간 STT 주소: {DEEPGRAM_WS_URL}")
+            else:
+                deepgram_client = AsyncDeepgramClient(api_key=DEEPGRAM_API_KEY)
+        logger.info("✅ 모델 초기화 완료")
+    except Exception as e:
+        logger.error(f"❌ 모델 초기화 실패: {e}")
+
+
+def correct_common_errors(text: str) -> str:
+    """자주 잘못 인식되는 단어 교정: 지혁 → 지옥"""
+    return text.replace("지혁", "지옥")
+
+
+def content_mode(audio_name: str) -> str:
+    """비디오 파일명으로 PANNs 분석 모드 결정"""
+    video_basename = os.path.basename(audio_name).lower()
+    if '환승연애' in video_basename or '예능' in video_basename or 'enter_web' in video_basename:
+        return 'ENTERTAINMENT'
+    if '친애하는' in video_basename or '드라마' in video_basename or '영화' in video_basename or 'drama' in video_basename:
+        return 'DRAMA'
+    return 'DOCUMENTARY'
+
+
+def _ansi_to_hex(ansi_color: str) -> str:
+    """ANSI 색상 코드를 HEX 색상으로 변환"""
+    color_map = {
+        "\033[93m": "#FFFF00",  # 노란색
+        "\033[92m": "#00FF00",  # 초록색
+        "\033[94m": "#0000FF",  # 파란색
+        "\033[95m": "#FF00FF",  # 자홍색
+        "\033[91m": "#FF0000",  # 빨간색
+        "\033[97m": "#FFFFFF",  # 흰색
+    }
+    return color_map.get(ansi_color, "#FFFFFF")
+
+
+async def analyze_emotion_styling(transcript: str) -> Optional[Dict]:
+    """감정 분석 → 스타일링 값 반환 (DX_Project_2 방식: ai_engine 사용)
+
+    반환값: {"emotion": 한글 감정명, "emotion_icon": 이모지, "color": HEX} (실패 시 None)
+    """
+    try:
+        loop = asyncio.get_event_loop()
+
+        if USE_AI_ENGINE_EMOTION:
+            # DX_Project_2 방식: ai_engine.emotion_wrapper 사용
+            emotion, conf, color_hex = await loop.run_in_executor(
+                None,
+                analyze_emotion,
+                transcript,
+                palette_level
+            )
+            # 감정 이름을 한글로 변환
+            emotion_val = EMOTION_KO_MAP.get(emotion, "중립")
+            color_val = color_hex
+            # 감정 이모지 가져오기 (USE_AI_ENGINE_EMOTION일 때만)
+            emotion_icon = EMOTION_ICON.get(emotion if emotion in EMOTION_KO_MAP else "neutral", "")
+        else:
+            # 기본 방식: EmotionAnalyzer 사용
+            if not emotion_analyzer:
+                return None
+            emotion_result = await loop.run_in_executor(
+                None,
+                emotion_analyzer.predict,
+                transcript
+            )
+            emotion_val = emotion_result.get("emotion_ko", "중립")
+            ansi_color = emotion_result.get("color", "\033[97m")
+            color_val = _ansi_to_hex(ansi_color)
+            emotion_icon = ""
+
+        logger.debug("🎨 감정 분석 완료: %s %s (%s)", emotion_val, emotion_icon, color_val, extra={"category": "emotion"})
+        return {"emotion": emotion_val, "emotion_icon": emotion_icon, "color": color_val}
+    except Exception as e:
+        logger.exception("감정 분석 오류: %s", e, extra={"category": "emotion"})
+        return None
+
+
+async def infer_emotions_batch(texts: List[str]) -> List[Optional[Dict]]:
+    """여러 문장 감정 분석 → 스타일링 dict 리스트 (오프라인 분석용 배치 추론)"""
+    if not USE_AI_ENGINE_EMOTION:
+        return list(await asyncio.gather(*(analyze_emotion_styling(t) for t in texts)))
+    try:
+        results = await asyncio.get_event_loop().run_in_executor(
+            None, analyze_emotion_batch, texts, palette_level
+        )
+    except Exception as e:
+        logger.error(f"배치 감정 분석 오류: {e}")
+        return [None] * len(texts)
+    return [
+        {
+            "emotion": EMOTION_KO_MAP.get(emotion, "중립"),
+            "emotion_icon": EMOTION_ICON.get(emotion if emotion in EMOTION_KO_MAP else "neutral", ""),
+            "color": color_hex,
+        }
+        for emotion, conf, color_hex in results
+    ]
+
+
+def use_in_process_local_stt():
+    """로컬 CPU STT 를 이 프로세스 안에서 실행 (오프라인 작업 워커: 워커 안에서 다시 프로세스 풀을 만들지 않음)"""
+    global LOCAL_STT_WORKERS
+    LOCAL_STT_WORKERS = 0
+
+
+def get_local_stt_pool() -> LocalSttPool:
+    """로컬 CPU STT 워커 풀 (처음 사용할 때 프로세스 생성, 모델은 워커마다 한 번 로드)"""
+    global local_stt_pool
+    if local_stt_pool is None:
+        local_stt_pool = LocalSttPool(
+            LOCAL_STT_MODEL, LOCAL_STT_ENGINE, workers=LOCAL_STT_WORKERS, threads=LOCAL_STT_THREADS
+        )
+        if LOCAL_STT_WORKERS > 0:
+            logger.info(f"✅ 로컬 STT 워커 {LOCAL_STT_WORKERS}개 시작 ({local_stt_pool.engine}: {LOCAL_STT_MODEL})")
+        else:
+            logger.info(f"✅ 로컬 STT 프로세스 내 실행 ({local_stt_pool.engine}: {LOCAL_STT_MODEL})")
+    return local_stt_pool
+
+
+def make_transcriber(stt: str, audio_path: str):
+    """오프라인 분석용 STT 선택 (auto: Deepgram → 로컬 전사 파일 → 로컬 CPU 모델 순으로 사용 가능한 것)"""
+    if stt == "auto" and not deepgram_client:
+        has_sidecar = os.path.exists(transcript_sidecar_path(audio_path))
+        stt = "cpu" if not has_sidecar and local_stt_available(LOCAL_STT_ENGINE, LOCAL_STT_MODEL) else "local"
+    if stt == "local":
+        return LocalTranscriber()
+    if stt == "cpu":
+        if not local_stt_available(LOCAL_STT_ENGINE, LOCAL_STT_MODEL):
+            raise RuntimeError("로컬 STT 를 사용할 수 없습니다. (faster-whisper / vosk 미설치 또는 LOCAL_STT_MODEL 없음)")
+        return CpuTranscriber(get_local_stt_pool())
+    if not deepgram_client:
+        raise RuntimeError("Deepgram 클라이언트가 초기화되지 않았습니다.")
+    return DeepgramTranscriber(deepgram_client)
+
+
+async def run_offline_analysis(audio_path: str, mode: str, stt: str = "auto", progress=None):
+    """WAV 전체를 페이싱 없이 분석해 자막 트랙 저장 → (자막 목록, 트랙 경로)"""
+    asset_speakers = None
+    if USE_SPEAKER_EMBEDDING:
+        asset_speakers = await asyncio.get_event_loop().run_in_executor(None, load_asset_speakers, audio_path)
+    captions = await analyze_asset(
+        audio_path,
+        make_transcriber(stt, audio_path),
+        infer_emotions_batch,
+        analyze_bgm=functools.partial(
+            panns_module.analyze_bgm_track, analyzer=panns_module.BgmAnalyzer(mode)
+        ) if USE_PANNS_BGM else None,
+        correct_text=correct_common_errors,
+        progress=progress,
+        label_speaker=asset_speakers.label_for if asset_speakers is not None else None,
+    )
+    if asset_speakers is not None:
+        await asyncio.get_event_loop().run_in_executor(None, asset_speakers.save)
+    if progress:
+        progress("save", 0.95)
+    track_path = await asyncio.get_event_loop().run_in_executor(None, save_track, audio_path, mode, captions)
+    if progress:
+        progress("done", 1.0)
+    return captions, track_path
@@ -0,0 +1,226 @@
+"""
+자막 WebSocket 전송 포맷 (클라이언트별 협상)
+- json    : 기존 방식 (기본값, 항상 사용 가능)
+- msgpack : 바이너리 포맷 (msgpack 패키지가 설치된 경우에만)
+    • 키는 숫자 코드(FIELD_CODES), 감정/BGM/SFX 문구는 숫자 코드로 전송
+      (코드 ↔ 문구 사전은 세션 시작 시 1번 전송, 새 문구가 나오면 추가분만 전송)
+    • 실수 값(start/end/intensity)은 float32
+    • final 자막은 직전 final 과 같은 스타일 필드(감정/색상/BGM 등)를 생략 (delta)
+      → 클라이언트는 생략된 필드를 직전 final 값으로 채운다
+    • 코드가 없는 필드/타입은 조용히 버리지 않고 ValueError (새 메시지를 추가하면 코드도 추가할 것)
+    • MsgpackDecoder: 역변환 (클라이언트 구현 참고 / 왕복 확인용, python caption_codec.py 로 실행)
+"""
+import math
+from typing import Dict, List, Optional, Union
+
+try:
+    import msgpack
+    HAS_MSGPACK = True
+except ImportError:
+    HAS_MSGPACK = False
+
+WIRE_FORMAT_VERSION = 1
+
+FIELD_CODES = {
+    "type": 0,
+    "caption_id": 1,
+    "revision": 2,
+    "text": 3,
+    "emotion": 4,
+    "emotion_icon": 5,
+    "color": 6,
+    "intensity": 7,
+    "pitch": 8,
+    "bgm": 9,
+    "sfx": 10,
+    "start": 11,
+    "end": 12,
+    "error": 13,
+    "action": 14,
+    "time": 15,
+    "rate": 16,
+}
+TYPE_CODES = {"final": 0, "provisional": 1, "patch": 2, "retract": 3, "dict": 4, "control": 5}
+
+# 문자열 대신 사전 코드로 보내는 필드
+LABEL_FIELDS = ("emotion", "emotion_icon", "bgm", "sfx")
+# final 자막에서 직전 final 과 값이 같으면 생략하는 필드
+DELTA_FIELDS = ("emotion", "emotion_icon", "color", "intensity", "pitch", "bgm", "sfx")
+
+Payload = Union[Dict, bytes]
+
+
+class JsonCodec:
+    """기존 JSON 포맷 (메시지를 그대로 전송)"""
+    name = "json"
+
+    def session_header(self) -> List[Payload]:
+        return []
+
+    def encode(self, message: Dict) -> List[Payload]:
+        return [message]
+
+
+class MsgpackCodec:
+    """숫자 키 + 라벨 사전 + delta 인코딩 msgpack 포맷 (세션마다 새로 생성)"""
+    name = "msgpack"
+
+    def __init__(self, labels: Dict[str, List[str]]):
+        self._labels: Dict[str, List[str]] = {field: list(labels.get(field, [])) for field in LABEL_FIELDS}
+        self._codes: Dict[str, Dict[str, int]] = {
+            field: {label: i for i, label in enumerate(values)} for field, values in self._labels.items()
+        }
+        self._last_final: Dict[str, object] = {}
+        self._packer = msgpack.Packer(use_single_float=True)
+
+    def _pack(self, obj) -> bytes:
+        return self._packer.pack(obj)
+
+    def session_header(self) -> List[Payload]:
+        """세션 시작 시 1번 보내는 사전 (필드/타입 코드 + 라벨 목록)"""
+        return [self._pack({
+            FIELD_CODES["type"]: TYPE_CODES["dict"],
+            "version": WIRE_FORMAT_VERSION,
+            "fields": FIELD_CODES,
+            "types": TYPE_CODES,
+            "labels": self._labels,
+        })]
+
+    def _label_code(self, field: str, value, additions: Dict[str, Dict[int, str]]) -> int:
+        codes = self._codes[field]
+        if value not in codes:
+            code = len(self._labels[field])
+            self._labels[field].append(value)
+            codes[value] = code
+            additions.setdefault(field, {})[code] = value
+        return codes[value]
+
+    def encode(self, message: Dict) -> List[Payload]:
+        msg_type = message.get("type")
+        additions: Dict[str, Dict[int, str]] = {}
+        out = {}
+
+        for key, value in message.items():
+            if key not in FIELD_CODES:
+                raise ValueError(f"msgpack 필드 코드가 없는 키: {key!r} (FIELD_CODES 에 추가 필요)")
+            if msg_type == "final" and key in DELTA_FIELDS:
+                if key in self._last_final and self._last_final[key] == value:
+                    continue
+            if key == "type":
+                if value not in TYPE_CODES:
+                    raise ValueError(f"msgpack 타입 코드가 없는 메시지: {value!r} (TYPE_CODES 에 추가 필요)")
+                value = TYPE_CODES[value]
+            elif key in LABEL_FIELDS and isinstance(value, str):
+                value = self._label_code(key, value, additions)
+            out[FIELD_CODES[key]] = value
+
+        if msg_type == "final":
+            for key in DELTA_FIELDS:
+                if key in message:
+                    self._last_final[key] = message[key]
+
+        frames: List[Payload] = []
+        if additions:
+            # 새 라벨이 생기면 해당 메시지보다 먼저 사전 추가분 전송
+            frames.append(self._pack({FIELD_CODES["type"]: TYPE_CODES["dict"], "labels_add": additions}))
+        frames.append(self._pack(out))
+        return frames
+
+
+class MsgpackDecoder:
+    """MsgpackCodec 역변환 (세션 사전 / 라벨 추가분 / delta 생략 필드 복원)"""
+
+    def __init__(self):
+        self._fields: Dict[int, str] = {}
+        self._types: Dict[int, str] = {}
+        self._labels: Dict[str, List[str]] = {}
+        self._last_final: Dict[str, object] = {}
+
+    def decode(self, payload: bytes) -> Optional[Dict]:
+        """프레임 1개 → 메시지 (사전 프레임이면 None)"""
+        obj = msgpack.unpackb(payload, strict_map_key=False)
+        if obj.get(FIELD_CODES["type"]) == TYPE_CODES["dict"]:
+            if "fields" in obj:
+                self._fields = {code: name for name, code in obj["fields"].items()}
+                self._types = {code: name for name, code in obj["types"].items()}
+                self._labels = {field: list(values) for field, values in obj["labels"].items()}
+            for field, added in obj.get("labels_add", {}).items():
+                for code, label in sorted(added.items()):
+                    self._labels.setdefault(field, []).append(label)
+            return None
+
+        message = {}
+        for code, value in obj.items():
+            key = self._fields[code]
+            if key == "type":
+                value = self._types[value]
+            elif key in LABEL_FIELDS and isinstance(value, int):
+                value = self._labels[key][value]
+            message[key] = value
+        if message.get("type") == "final":
+            for key in DELTA_FIELDS:
+                if key in message:
+                    self._last_final[key] = message[key]
+                elif key in self._last_final:
+                    message[key] = self._last_final[key]
+        return message
+
+
+def _same(a, b) -> bool:
+    if isinstance(a, float) or isinstance(b, float):
+        return math.isclose(a, b, rel_tol=1e-6, abs_tol=1e-6)
+    return a == b
+
+
+def _check_round_trip():
+    """서버가 보내는 모든 메시지 종류를 msgpack 으로 인코딩 → 디코딩해 원본과 같은지 확인"""
+    final = {
+        "type": "final", "caption_id": 1, "revision": 2, "text": "[인물1] 안녕하세요", "emotion": "기쁨",
+        "emotion_icon": "😊", "color": "#FFFF00", "intensity": 0.5, "pitch": 0.5, "bgm": "잔잔한 음악",
+        "sfx": None, "start": 1.25, "end": 2.5,
+    }
+    messages = [
+        {"type": "provisional", "caption_id": 1, "revision": 1, "text": "안녕", "start": 1.25, "end": 1.5},
+        final,
+        {**final, "caption_id": 2, "text": "같은 스타일", "start": 3.0, "end": 4.0},   # delta 생략
+        {**final, "caption_id": 3, "emotion": "새 감정", "bgm": None, "start": 5.0, "end": 6.0},  # 라벨 추가
+        {"type": "patch", "caption_id": 3, "start": 5.0, "end": 6.0, "emotion": "분노", "emotion_icon": "😠",
+         "color": "#FF0000"},
+        {"type": "retract", "caption_id": 4},
+        {"type": "control", "action": "seek", "time": 12.5},
+        {"type": "control", "action": "pause"},
+        {"type": "control", "action": "rate", "rate": 1.5},
+        {"type": "control", "action": "seek", "error": "could not convert string to float"},
+        {"error": "WAV 파일 형식이 맞지 않습니다."},
+    ]
+    codec = MsgpackCodec({"emotion": ["기쁨", "분노"], "emotion_icon": ["😊", "😠"]})
+    decoder = MsgpackDecoder()
+    for frame in codec.session_header():
+        assert decoder.decode(frame) is None
+    for message in messages:
+        decoded = [decoder.decode(frame) for frame in codec.encode(message)]
+        decoded = [m for m in decoded if m is not None]
+        assert len(decoded) == 1, (message, decoded)
+        assert decoded[0].keys() == message.keys(), (message, decoded[0])
+        assert all(_same(decoded[0][k], v) for k, v in message.items()), (message, decoded[0])
+
+    try:
+        codec.encode({"type": "final", "unknown_field": 1})
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("코드가 없는 필드가 조용히 버려짐")
+
+
+def negotiate_codec(requested: str, labels: Dict[str, List[str]]):
+    """init 메시지의 wire_format 요청 → 사용할 코덱 (불가능하면 JSON)"""
+    if requested == "msgpack" and HAS_MSGPACK:
+        return MsgpackCodec(labels)
+    return JsonCodec()
+
+
+if __name__ == "__main__":
+    if not HAS_MSGPACK:
+        raise SystemExit("msgpack 이 설치되어 있지 않습니다.")
+    _check_round_trip()
+    print(f"✅ msgpack 왕복 확인 완료 (메시지 타입 {len(TYPE_CODES) - 1}종, 필드 {len(FIELD_CODES)}개)")
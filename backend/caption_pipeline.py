@@ -0,0 +1,174 @@
+"""
+세션별 자막 전송 파이프라인
+- 순서 보장: 대기열에 들어온 순서대로 자막(final / provisional / retract)을 전송
+- 감정 분석: 대기 중인 여러 문장에 대해 동시에 진행 (최대 max_in_flight 개)
+- 감정 분석이 늦으면 final 은 기본값으로 먼저 보내고, 결과가 나오면 패치를 따로 전송
+  (패치는 항상 해당 자막의 final 이 전송된 뒤에만 나간다)
+- 중복 자막 제거(CaptionDeduper): 세션 길이와 무관하게 최근 DEDUP_WINDOW_SECONDS 초 분량만 보관
+"""
+import logging
+import asyncio
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 동시에 진행할 감정 분석(KLUE-BERT) 최대 개수
+DEFAULT_MAX_IN_FLIGHT = 3
+# 중복 확인용으로 보관하는 최근 자막 구간 (초, 전송 워터마크 기준)
+DEDUP_WINDOW_SECONDS = 30.0
+
+
+class CaptionDeduper:
+    """전송한 자막 중복 확인 (전송 워터마크 + 최근 구간 링)
+
+    - 워터마크: 지금까지 보낸 자막의 가장 늦은 끝 시각 (seek 전까지 단조 증가)
+    - 워터마크보다 window 초 이상 앞에서 끝나는 자막은 이미 지나간 구간 → 중복으로 처리
+    - 그 안쪽은 (시작, 끝, 텍스트 해시) 키를 링에 보관해 O(1) 로 확인, 창 밖으로 밀려난 키는 버림
+    → 몇 시간짜리 실시간 채널에서도 메모리가 일정하다
+    """
+
+    def __init__(self, window: float = DEDUP_WINDOW_SECONDS):
+        self.window = window
+        self.watermark: Optional[float] = None
+        self._ring: Deque[Tuple[float, Tuple]] = deque()  # [(끝 시각, 키)] 전송 순
+        self._keys: Set[Tuple] = set()                    # 링 안의 키
+
+    @staticmethod
+    def _key(start: float, end: float, text: str) -> Tuple:
+        return (round(start, 2), round(end, 2), hash(text))
+
+    def seen(self, start: float, end: float, text: str) -> bool:
+        """이미 보낸 자막인지 확인하고, 처음이면 보낸 것으로 기록"""
+        if self.watermark is not None and end < self.watermark - self.window:
+            return True
+        key = self._key(start, end, text)
+        if key in self._keys:
+            return True
+
+        self._ring.append((end, key))
+        self._keys.add(key)
+        if self.watermark is None or end > self.watermark:
+            self.watermark = end
+        self._evict()
+        return False
+
+    def _evict(self):
+        # 링은 전송 순서라 끝 시각이 조금 뒤섞일 수 있음 → 앞에서부터 창 밖인 것만 제거
+        horizon = self.watermark - self.window
+        while self._ring and self._ring[0][0] < horizon:
+            self._keys.discard(self._ring.popleft()[1])
+
+    def reset(self):
+        """seek 등으로 재생 위치가 바뀌면 워터마크와 링을 비움 (앞쪽 구간을 다시 분석할 수 있도록)"""
+        self.watermark = None
+        self._ring.clear()
+        self._keys.clear()
+
+    def __len__(self) -> int:
+        return len(self._ring)
+
+
+class CaptionPipeline:
+    """자막 전송 대기열 + 감정 분석 동시 실행 관리"""
+
+    def __init__(
+        self,
+        infer_emotion: Callable[[str], Awaitable[Optional[Dict]]],
+        send_caption: Callable[[Dict, Optional[Dict]], Awaitable[None]],
+        send_patch: Callable[[Dict, Dict], Awaitable[None]],
+        send_raw: Callable[[Dict], Awaitable[None]],
+        emotion_wait_time: float = 0.15,
+        max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+    ):
+        self.infer_emotion = infer_emotion  # text → 스타일링 dict (실패 시 None)
+        self.send_caption = send_caption    # (문장, 스타일링 또는 None) → final 자막 전송
+        self.send_patch = send_patch        # (문장, 스타일링) → 감정 패치 전송
+        self.send_raw = send_raw            # provisional / retract 등 가공 없는 메시지 전송
+        self.emotion_wait_time = emotion_wait_time
+        self.max_in_flight = max_in_flight
+
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+        self._patch_tasks: Set[asyncio.Task] = set()
+        self._task: Optional[asyncio.Task] = None
+        self.closed = False  # True 이면 더 이상 전송하지 않음 (연결 끊김 등)
+
+    def submit(self, item: Dict):
+        """전송 대기열에 추가 (final 문장이면 감정 분석을 즉시 시작)"""
+        emotion_task = None
+        if item.get('type') not in ('provisional', 'retract'):
+            emotion_task = asyncio.ensure_future(self._infer_limited(item['text']))
+        self._queue.put_nowait((item, emotion_task))
+
+    async def _infer_limited(self, text: str) -> Optional[Dict]:
+        async with self._semaphore:
+            return await self.infer_emotion(text)
+
+    async def run(self):
+        """대기열 소비 태스크 (세션당 1개) - close() 가 호출될 때까지 실행"""
+        while True:
+            entry = await self._queue.get()
+            if entry is None:  # 종료 신호
+                break
+            item, emotion_task = entry
+            if self.closed:
+                if emotion_task is not None:
+                    emotion_task.cancel()
+                continue
+            try:
+                if emotion_task is None:
+                    await self.send_raw(item)
+                    continue
+
+                # 이 문장 차례가 되면 감정 분석을 emotion_wait_time 까지만 기다림
+                styling = None
+                try:
+                    styling = await asyncio.wait_for(asyncio.shield(emotion_task), timeout=self.emotion_wait_time)
+                except asyncio.TimeoutError:
+                    pass
+
+                await self.send_caption(item, styling)
+
+                # 늦은 감정 결과는 별도 태스크에서 패치로 전송 (다음 문장 전송을 막지 않음)
+                if styling is None and not emotion_task.done():
+                    task = asyncio.ensure_future(self._patch_when_ready(item, emotion_task))
+                    self._patch_tasks.add(task)
+                    task.add_done_callback(self._patch_tasks.discard)
+            except Exception as e:
+                logger.warning(f"⚠️ 자막 전송 오류: {e}")
+
+    async def _patch_when_ready(self, item: Dict, emotion_task: asyncio.Future):
+        styling = await emotion_task
+        if styling and not self.closed:
+            try:
+                await self.send_patch(item, styling)
+            except Exception as e:
+                logger.warning(f"⚠️ 감정 패치 전송 오류: {e}")
+
+    def start(self):
+        """대기열 소비 태스크 시작"""
+        self._task = asyncio.ensure_future(self.run())
+
+    async def close(self, timeout: float = 10.0):
+        """남은 대기열을 모두 전송하고 종료 (늦은 패치도 timeout 까지 대기)"""
+        self._queue.put_nowait(None)
+        try:
+            await asyncio.wait_for(self._finish(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        self.cancel()
+
+    async def _finish(self):
+        if self._task is not None:
+            await self._task
+        if self._patch_tasks:
+            await asyncio.gather(*list(self._patch_tasks), return_exceptions=True)
+
+    def cancel(self):
+        """즉시 중단 (전송하지 않은 자막/패치는 버림)"""
+        self.closed = True
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+        for task in list(self._patch_tasks):
+            task.cancel()
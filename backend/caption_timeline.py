@@ -0,0 +1,105 @@
+"""
+구간(run-length) 타임라인 유틸
+PANNs BGM/SFX 처럼 가끔씩만 바뀌는 상태를 "바뀐 시점"만 기록하고,
+자막 구간 [start, end] 과 겹치는 상태를 bisect 로 조회한다.
+"""
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, Optional
+
+
+class StateTimeline:
+    """상태 변화 시점만 저장하는 타임라인 (메모리: O(변화 횟수))"""
+
+    def __init__(self):
+        self._starts: List[float] = []            # 각 구간 시작 시간 (오름차순)
+        self._values: List[Optional[str]] = []    # 각 구간의 상태 값 (None = 없음)
+        self._end: Optional[float] = None         # 마지막(열린) 구간의 끝 시간
+
+    def __len__(self) -> int:
+        return len(self._starts)
+
+    def update(self, start: float, end: float, value: Optional[str]):
+        """[start, end) 구간의 관측값 기록 (값이 바뀔 때만 새 구간 추가)"""
+        value = value or None
+
+        # 시간이 뒤로 가면(seek 등) 그 이후 기록은 버리고 다시 쌓는다
+        if self._starts and start < self._starts[-1]:
+            cut = bisect_right(self._starts, start)
+            del self._starts[cut:]
+            del self._values[cut:]
+
+        if self._starts and self._starts[-1] == start:
+            # 같은 시점에서 다시 시작 (seek 직후 등) → 마지막 구간 값을 덮어씀
+            self._values[-1] = value
+            if len(self._values) > 1 and self._values[-2] == value:
+                del self._starts[-1]
+                del self._values[-1]
+        elif not self._values or self._values[-1] != value:
+            self._starts.append(start)
+            self._values.append(value)
+
+        self._end = end
+
+    def seek(self, t: float):
+        """재생 위치 이동: t 이후 기록은 버리고, 다음 관측 전까지는 상태 없음(None) 구간으로 둔다
+        (앞으로 건너뛴 구간이 이전 상태로 채워지지 않게)"""
+        cut = bisect_left(self._starts, t)
+        del self._starts[cut:]
+        del self._values[cut:]
+        if not self._starts:
+            self._end = None
+            return
+
+        gap_start = t if self._end is None else min(self._end, t)
+        if self._values[-1] is not None:
+            self._starts.append(gap_start)
+            self._values.append(None)
+        self._end = gap_start
+
+    def dominant(self, start: float, end: float) -> Optional[str]:
+        """[start, end] 와 겹치는 시간이 가장 긴 상태 값 반환 (없으면 None)"""
+        if not self._starts or end <= start:
+            return None
+
+        durations: Dict[str, float] = {}
+        i = max(bisect_right(self._starts, start) - 1, 0)
+        last = len(self._starts) - 1
+
+        while i <= last and self._starts[i] < end:
+            seg_start = self._starts[i]
+            seg_end = self._starts[i + 1] if i < last else self._end
+            value = self._values[i]
+            if value is not None and seg_end is not None:
+                overlap = min(seg_end, end) - max(seg_start, start)
+                if overlap > 0:
+                    durations[value] = durations.get(value, 0.0) + overlap
+            i += 1
+
+        if not durations:
+            return None
+        return max(durations, key=durations.get)
+
+    def reset(self):
+        """타임라인 초기화"""
+        self._starts = []
+        self._values = []
+        self._end = None
+
+
+if __name__ == "__main__":
+    # seek 점검: 0초 'A' → 10초에서 100초로 seek → 100초 'B'
+    timeline = StateTimeline()
+    timeline.update(0.0, 10.0, "A")
+    timeline.seek(100.0)
+    timeline.update(100.0, 110.0, "B")
+    assert timeline.dominant(50.0, 60.0) is None, timeline.dominant(50.0, 60.0)
+    assert timeline.dominant(5.0, 8.0) == "A"
+    assert timeline.dominant(100.0, 105.0) == "B"
+    assert timeline.dominant(8.0, 101.0) == "A"  # 겹친 시간: A 2초, B 1초, 건너뛴 구간 제외
+
+    # 뒤로 seek: 이후 기록은 버리고 새로 쌓음
+    timeline.seek(5.0)
+    assert timeline.dominant(100.0, 105.0) is None
+    timeline.update(5.0, 6.0, "C")
+    assert timeline.dominant(5.0, 6.0) == "C" and timeline.dominant(0.0, 4.0) == "A"
+    print("✅ StateTimeline seek: 건너뛴 구간은 상태 없음")
@@ -0,0 +1,238 @@
+"""
+분석이 끝난 에셋의 자막 트랙 디스크 캐시
+- 세션이 에셋 처음부터 끝까지 분석하면 최종 자막(감정 패치 반영, 강도/BGM/SFX 포함)을 JSON 으로 저장
+- 키: 에셋 내용 해시 + 파이프라인 버전 + 분석 모드 (하나라도 바뀌면 새로 분석)
+- 다음 시청자는 STT/모델 추론 없이 디스크의 자막을 audio_start_time 기준으로 재생 속도에 맞춰 전송
+  (TrackPlayer: 재생 중 seek / pause / resume / rate 제어)
+- 구간 조회(GET /api/captions)용 시간 인덱스 (start 정렬 배열 + bisect, 구간당 O(log n))
+"""
+import logging
+import os
+import json
+import asyncio
+import tempfile
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from loudness_envelope import file_content_hash
+
+logger = logging.getLogger(__name__)
+
+# 자막 생성 로직(STT 옵션, 문장 버퍼, 감정/BGM 분석 등)이 바뀌면 올릴 것 → 이전 캐시 무효화
+PIPELINE_VERSION = 1
+TRACK_FORMAT_VERSION = 1
+# 재생 위치보다 이만큼 먼저 자막을 보냄 (초)
+REPLAY_LEAD_SECONDS = 5.0
+# 메모리에 올려두는 자막 인덱스 개수 (에셋/모드 단위)
+INDEX_CACHE_SIZE = 32
+
+
+def track_cache_path(audio_path: str, digest: str, mode: str) -> str:
+    """캐시 파일 경로: <에셋 파일명>.<해시 16자리>.<모드>.v<버전>.captions.json (에셋과 같은 폴더)"""
+    return f"{audio_path}.{digest[:16]}.{mode.lower()}.v{PIPELINE_VERSION}.captions.json"
+
+
+def compact_caption_log(events: List[Dict]) -> List[Dict]:
+    """세션 로그 → final 자막 목록 (늦게 온 감정 패치는 해당 final 에 합침, start 순 정렬)"""
+    finals: Dict = {}
+    for event in events:
+        msg_type = event.get("type")
+        if msg_type == "final":
+            finals[event.get("caption_id")] = dict(event)
+        elif msg_type == "patch" and event.get("caption_id") in finals:
+            finals[event["caption_id"]].update(
+                {k: v for k, v in event.items() if k not in ("type", "caption_id", "start", "end")}
+            )
+    return sorted(finals.values(), key=lambda c: c["start"])
+
+
+def save_track(audio_path: str, mode: str, events: List[Dict]) -> Optional[str]:
+    """세션 로그를 자막 트랙으로 저장 (저장한 경로, 실패 시 None)"""
+    try:
+        digest = file_content_hash(audio_path)
+        cache_path = track_cache_path(audio_path, digest, mode)
+        track = {
+            "format_version": TRACK_FORMAT_VERSION,
+            "pipeline_version": PIPELINE_VERSION,
+            "asset_hash": digest,
+            "mode": mode,
+            "captions": compact_caption_log(events),
+        }
+        # 다른 세션/프로세스와 동시에 저장할 수 있으므로 고유한 임시 파일에 쓰고 교체
+        tmp = tempfile.NamedTemporaryFile('w', encoding='utf-8', suffix='.tmp', delete=False,
+                                          dir=os.path.dirname(os.path.abspath(cache_path)))
+        try:
+            with tmp:
+                json.dump(track, tmp, ensure_ascii=False)
+            os.replace(tmp.name, cache_path)
+        except BaseException:
+            os.unlink(tmp.name)
+            raise
+        logger.info(f"💾 자막 트랙 저장: {cache_path} ({len(track['captions'])}개)")
+        return cache_path
+    except Exception as e:
+        logger.warning(f"⚠️ 자막 트랙 저장 실패 ({audio_path}): {e}")
+        return None
+
+
+def _load_track_file(audio_path: str, mode: str) -> Tuple[Optional[str], Optional[List[Dict]]]:
+    """(캐시 파일 경로, 자막 목록) - 없거나 버전이 다르면 자막 목록은 None"""
+    digest = file_content_hash(audio_path)
+    cache_path = track_cache_path(audio_path, digest, mode)
+    if not os.path.exists(cache_path):
+        return cache_path, None
+    with open(cache_path, 'r', encoding='utf-8') as f:
+        track = json.load(f)
+    if (track.get("format_version") != TRACK_FORMAT_VERSION
+            or track.get("pipeline_version") != PIPELINE_VERSION
+            or track.get("asset_hash") != digest):
+        return cache_path, None
+    return cache_path, track["captions"]
+
+
+def load_track(audio_path: str, mode: str) -> Optional[List[Dict]]:
+    """캐시된 자막 트랙 로드 (없거나 버전이 다르면 None)"""
+    try:
+        return _load_track_file(audio_path, mode)[1]
+    except Exception as e:
+        logger.warning(f"⚠️ 자막 트랙 로드 실패 ({audio_path}): {e}")
+        return None
+
+
+class CaptionIndex:
+    """자막 트랙 시간 인덱스 - [t0, t1] 과 겹치는 자막을 O(log n + k) 로 조회
+
+    start 정렬 배열로 끝 위치를, end 의 누적 최대값(단조 증가) 배열로 시작 위치를 bisect 로 찾는다.
+    """
+
+    def __init__(self, captions: List[Dict], etag: str):
+        self.captions = sorted(captions, key=lambda c: c["start"])
+        self.etag = etag  # 트랙 식별자 (해시 + 모드 + 버전 + 파일 수정 시각) - 구간 응답 ETag 의 기준
+        self._starts = [c["start"] for c in self.captions]
+        self._max_ends = []
+        running = float("-inf")
+        for c in self.captions:
+            running = max(running, c["end"])
+            self._max_ends.append(running)
+
+    def __len__(self) -> int:
+        return len(self.captions)
+
+    def first_ending_after(self, t: float) -> int:
+        """end >= t 일 수 있는 첫 자막의 위치 (이전 자막은 모두 t 전에 끝남)"""
+        return bisect_left(self._max_ends, t)
+
+    def window(self, t0: float, t1: float) -> List[Dict]:
+        lo = self.first_ending_after(t0)
+        hi = bisect_right(self._starts, t1)    # 이후 자막은 모두 t1 뒤에 시작
+        return [c for c in self.captions[lo:hi] if c["end"] >= t0]
+
+
+# {(트랙 파일 경로, 수정 시각): 인덱스} - 워커 프로세스가 트랙을 다시 쓰면 새로 로드
+_index_cache: "OrderedDict[Tuple[str, int], CaptionIndex]" = OrderedDict()
+
+
+def load_index(audio_path: str, mode: str) -> Optional[CaptionIndex]:
+    """캐시된 자막 트랙의 시간 인덱스 (메모리에 INDEX_CACHE_SIZE 개까지 보관, 트랙이 없으면 None)"""
+    try:
+        digest = file_content_hash(audio_path)
+        cache_path = track_cache_path(audio_path, digest, mode)
+        if not os.path.exists(cache_path):
+            return None
+        key = (cache_path, os.stat(cache_path).st_mtime_ns)
+        if key in _index_cache:
+            _index_cache.move_to_end(key)
+            return _index_cache[key]
+
+        _, captions = _load_track_file(audio_path, mode)
+        if captions is None:
+            return None
+        index = CaptionIndex(captions, etag=f"{digest[:16]}-{mode.lower()}-v{PIPELINE_VERSION}-{key[1]:x}")
+        _index_cache[key] = index
+        while len(_index_cache) > INDEX_CACHE_SIZE:
+            _index_cache.popitem(last=False)
+        return index
+    except Exception as e:
+        logger.warning(f"⚠️ 자막 인덱스 로드 실패 ({audio_path}): {e}")
+        return None
+
+
+class TrackPlayer:
+    """캐시된 자막을 재생 위치에 맞춰 전송 (자막 start 가 재생 위치 + lead 안에 들어오면 전송)
+
+    재생 위치는 (기준 위치, 기준 시각, 배속) 으로 계산하므로 seek / pause / resume / rate 는
+    기준만 바꾸고 전송 태스크를 다시 시작한다. 이미 보낸 자막은 seek 전까지 다시 보내지 않는다.
+    send() 가 False 를 반환하면 (연결 끊김) 중단한다.
+    """
+
+    def __init__(
+        self,
+        captions: List[Dict],
+        send: Callable[[Dict], bool],
+        position: float = 0.0,
+        lead: float = REPLAY_LEAD_SECONDS,
+    ):
+        self.index = CaptionIndex(captions, etag="")
+        self.send = send
+        self.lead = lead
+        self.rate = 1.0
+        self.paused = False
+        self._loop = asyncio.get_event_loop()
+        self._anchor_pos = position
+        self._anchor_wall = self._loop.time()
+        self._next = self.index.first_ending_after(position)
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def position(self) -> float:
+        """현재 재생 위치 (초)"""
+        if self.paused:
+            return self._anchor_pos
+        return self._anchor_pos + (self._loop.time() - self._anchor_wall) * self.rate
+
+    def _rebase(self, position: float):
+        self._anchor_pos = position
+        self._anchor_wall = self._loop.time()
+
+    def start(self):
+        self.stop()
+        if not self.paused:
+            self._task = asyncio.ensure_future(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        captions = self.index.captions
+        while self._next < len(captions):
+            caption = captions[self._next]
+            if caption["end"] >= self._anchor_pos:
+                delay = (caption["start"] - self.lead - self.position) / self.rate
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                if not self.send(dict(caption)):
+                    return
+            self._next += 1
+
+    def seek(self, position: float):
+        self._rebase(position)
+        self._next = self.index.first_ending_after(position)
+        self.start()
+
+    def pause(self):
+        self._rebase(self.position)
+        self.paused = True
+        self.stop()
+
+    def resume(self):
+        self._rebase(self._anchor_pos)
+        self.paused = False
+        self.start()
+
+    def set_rate(self, rate: float):
+        self._rebase(self.position)
+        self.rate = rate
+        self.start()
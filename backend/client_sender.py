@@ -0,0 +1,186 @@
+"""
+클라이언트별 WebSocket 송신 대기열 (backpressure + drop 정책)
+- 분석 경로는 send() 로 대기열에 넣기만 하고, 실제 전송은 writer 태스크가 담당
+  → 느린 TV 클라이언트 / 불안정한 Wi-Fi 가 STT 처리와 오디오 페이싱을 막지 않음
+- 대기열 정책
+    • patch      : 같은 caption_id 의 대기 중인 이전 패치는 버림 (최신 감정만 전송)
+    • provisional: 같은 caption_id 의 대기 중인 이전 임시 자막은 버림
+    • final      : 같은 caption_id 의 대기 중인 임시 자막은 버림 (final 이 대체)
+    • 대기열이 가득 차면 가장 오래된 임시 자막부터 버리고, 그래도 가득 차 있으면
+      클라이언트가 너무 뒤처진 것으로 보고 연결을 끊는다
+"""
+import logging
+import asyncio
+from collections import deque
+from typing import Deque, Dict, Optional
+
+from fastapi import WebSocket
+
+from caption_codec import JsonCodec
+
+logger = logging.getLogger(__name__)
+
+# 대기열 최대 길이 (초과 시 임시 자막 drop → 그래도 초과면 연결 종료)
+DEFAULT_MAX_QUEUE = 200
+# 너무 뒤처진 클라이언트 연결 종료 코드 (1013: Try Again Later)
+LAGGING_CLOSE_CODE = 1013
+# 감정 패치가 덮어쓰는 필드
+PATCH_FIELDS = ("emotion", "emotion_icon", "color")
+
+
+class ClientSender:
+    """WebSocket 1개에 대한 송신 대기열 + writer 태스크"""
+
+    def __init__(self, websocket: WebSocket, max_queue: int = DEFAULT_MAX_QUEUE, codec=None):
+        self.websocket = websocket
+        self.codec = codec or JsonCodec()  # 전송 포맷 (인코딩은 실제 전송 시점에 writer 가 수행)
+        self.max_queue = max_queue
+        self._queue: Deque[Dict] = deque()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False  # close() 호출됨 - 남은 대기열만 보내고 종료
+        self.closed = False
+        self._closed_event = asyncio.Event()  # closed 가 되면 설정 (연결 유지 루프가 폴링 없이 대기)
+
+        # 메트릭
+        self.sent = 0
+        self.dropped = 0      # 정책에 의해 버려진 메시지 수
+        self.max_depth = 0    # 관측된 최대 대기열 길이
+
+    @property
+    def depth(self) -> int:
+        return len(self._queue)
+
+    def metrics(self) -> Dict:
+        return {
+            "queue_depth": self.depth,
+            "max_queue_depth": self.max_depth,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "closed": self.closed,
+        }
+
+    def _mark_closed(self):
+        self.closed = True
+        self._closed_event.set()
+
+    async def wait_closed(self):
+        """송신이 끝날 때까지 (연결 끊김 / 뒤처져서 종료 / close) 대기"""
+        await self._closed_event.wait()
+
+    def _remove_queued(self, msg_type: str, caption_id) -> int:
+        """대기 중인 메시지 중 (type, caption_id) 가 같은 것 제거"""
+        if caption_id is None:
+            return 0
+        before = len(self._queue)
+        self._queue = deque(
+            m for m in self._queue
+            if not (m.get("type") == msg_type and m.get("caption_id") == caption_id)
+        )
+        removed = before - len(self._queue)
+        self.dropped += removed
+        return removed
+
+    def _drop_oldest_provisional(self) -> bool:
+        for i, m in enumerate(self._queue):
+            if m.get("type") == "provisional":
+                del self._queue[i]
+                self.dropped += 1
+                return True
+        return False
+
+    def send(self, message: Dict) -> bool:
+        """대기열에 추가 (즉시 반환). 연결이 끊겼거나 끊어야 하면 False"""
+        if self.closed:
+            return False
+
+        msg_type = message.get("type")
+        caption_id = message.get("caption_id")
+
+        # 대체된 메시지 정리
+        if msg_type == "patch":
+            # 같은 자막의 final 이 아직 대기 중이면 패치를 final 에 합쳐서 한 번만 전송
+            for queued in self._queue:
+                if queued.get("type") == "final" and queued.get("caption_id") == caption_id and caption_id is not None:
+                    queued.update({k: v for k, v in message.items() if k in PATCH_FIELDS})
+                    return True
+            self._remove_queued("patch", caption_id)
+        elif msg_type == "provisional":
+            self._remove_queued("provisional", caption_id)
+        elif msg_type in ("final", "retract"):
+            self._remove_queued("provisional", caption_id)
+
+        if len(self._queue) >= self.max_queue:
+            if not self._drop_oldest_provisional():
+                logger.warning(f"⚠️ 클라이언트가 너무 뒤처짐 (대기열 {len(self._queue)}개) → 연결 종료")
+                self._disconnect()
+                return False
+
+        self._queue.append(message)
+        self.max_depth = max(self.max_depth, len(self._queue))
+        self._wakeup.set()
+        return True
+
+    def start(self):
+        """writer 태스크 시작"""
+        self._task = asyncio.ensure_future(self._writer())
+
+    async def _send_payload(self, payload):
+        if isinstance(payload, bytes):
+            await self.websocket.send_bytes(payload)
+        else:
+            await self.websocket.send_json(payload)
+
+    async def _writer(self):
+        try:
+            for payload in self.codec.session_header():
+                await self._send_payload(payload)
+        except Exception as e:
+            logger.warning(f"🔌 전송 실패 (연결 끊김): {type(e).__name__}")
+            self._mark_closed()
+            return
+
+        while not self.closed:
+            if not self._queue:
+                if self._closing:
+                    break
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            message = self._queue.popleft()
+            try:
+                # delta 인코딩 상태가 실제 전송된 메시지와 일치하도록 전송 직전에 인코딩
+                for payload in self.codec.encode(message):
+                    await self._send_payload(payload)
+                self.sent += 1
+            except ValueError as e:
+                # 포맷에 코드가 없는 메시지 (서버 버그) → 연결은 유지하고 이 메시지만 버림
+                logger.error(f"❌ 메시지 인코딩 실패 ({self.codec.name}): {e}")
+            except Exception as e:
+                logger.warning(f"🔌 전송 실패 (연결 끊김): {type(e).__name__}")
+                self._mark_closed()
+                self._queue.clear()
+
+    def _disconnect(self):
+        self._mark_closed()
+        self._queue.clear()
+        self._wakeup.set()
+        asyncio.ensure_future(self._close_websocket())
+
+    async def _close_websocket(self):
+        try:
+            await self.websocket.close(code=LAGGING_CLOSE_CODE)
+        except Exception:
+            pass
+
+    async def close(self, timeout: float = 5.0):
+        """남은 대기열 전송 후 writer 종료 (timeout 초과 시 버림)"""
+        self._closing = True
+        self._wakeup.set()
+        if self._task is not None:
+            try:
+                await asyncio.wait_for(self._task, timeout=timeout)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                pass
+        self._mark_closed()
+        self._queue.clear()
@@ -0,0 +1,180 @@
+"""
+가짜 실시간 STT WebSocket 서버 (Deepgram /v1/listen 프로토콜 흉내, 네트워크/API 키 없이 테스트용)
+- 바이너리 오디오(16kHz mono 16-bit PCM)를 받으면 utterance_seconds 마다 Results(is_final) 전송
+- 제어 메시지: KeepAlive (idle 시간 초기화) / Finalize (남은 오디오 결과, from_finalize=True) / CloseStream
+- idle_timeout 초 동안 오디오/KeepAlive 가 없으면 서버가 연결을 끊음 (Deepgram 은 10초, 1011)
+- drop_connections() : 열린 연결을 서버 쪽에서 모두 끊음 (끊긴 연결 처리 테스트)
+
+단독 실행 (실제 서버를 여기에 붙여 테스트):
+    python fake_stt_server.py [port]
+    DEEPGRAM_WS_URL=ws://127.0.0.1:<port> DEEPGRAM_API_KEY=test python video_analyzer_server.py
+"""
+import logging
+import sys
+import json
+import asyncio
+import uuid
+from typing import Dict, Set
+
+import websockets
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+# 이만큼 오디오가 쌓일 때마다 결과 1개 전송 (초)
+UTTERANCE_SECONDS = 2.0
+# 오디오/KeepAlive 없이 연결을 유지하는 시간 (초)
+IDLE_TIMEOUT = 10.0
+# 결과 1개에 넣는 단어 수 (단어 시각은 구간을 균등 분할)
+WORDS_PER_RESULT = 4
+
+
+def _results(start: float, end: float, index: int, speech_final: bool = True, from_finalize: bool = False) -> Dict:
+    """[start, end] 스트림 구간의 Results 메시지 (단어는 '단어<번호>')"""
+    words = []
+    if end > start:
+        span = (end - start) / WORDS_PER_RESULT
+        for i in range(WORDS_PER_RESULT):
+            word = f"단어{index}-{i + 1}"
+            words.append({
+                "word": word, "punctuated_word": word, "confidence": 0.99,
+                "start": round(start + i * span, 3), "end": round(start + (i + 1) * span, 3), "speaker": 0,
+            })
+    return {
+        "type": "Results",
+        "channel_index": [0, 1],
+        "duration": round(end - start, 3),
+        "start": round(start, 3),
+        "is_final": True,
+        "speech_final": speech_final,
+        "from_finalize": from_finalize,
+        "channel": {"alternatives": [{
+            "transcript": " ".join(w["word"] for w in words),
+            "confidence": 0.99,
+            "words": words,
+        }]},
+        "metadata": {"request_id": str(uuid.uuid4()), "model_uuid": "fake", "model_info": {"name": "fake", "version": "0", "arch": "fake"}},
+    }
+
+
+class FakeSttServer:
+    """가짜 STT 서버 (asyncio, 한 프로세스 안에서 테스트와 함께 실행)"""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        utterance_seconds: float = UTTERANCE_SECONDS,
+        idle_timeout: float = IDLE_TIMEOUT,
+    ):
+        self.host = host
+        self.port = port
+        self.utterance_seconds = utterance_seconds
+        self.idle_timeout = idle_timeout
+        self._server = None
+        self._connections: Set = set()
+
+        # 통계
+        self.opened = 0
+        self.keepalives = 0
+        self.finalizes = 0
+        self.close_streams = 0
+        self.idle_closes = 0
+        self.dropped = 0
+        self.audio_seconds = 0.0
+
+    @property
+    def url(self) -> str:
+        return f"ws://{self.host}:{self.port}"
+
+    @property
+    def open_connections(self) -> int:
+        return len(self._connections)
+
+    async def start(self):
+        self._server = await websockets.serve(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info(f"🧪 가짜 STT 서버 시작: {self.url}")
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def drop_connections(self, code: int = 1011, reason: str = "server closed connection"):
+        """열린 연결을 서버 쪽에서 모두 끊음"""
+        for ws in list(self._connections):
+            self.dropped += 1
+            await ws.close(code, reason)
+
+    async def _handle(self, ws):
+        self.opened += 1
+        self._connections.add(ws)
+        sent = 0.0          # 받은 오디오 누적 시간 (스트림 시각)
+        result_start = 0.0  # 아직 결과를 보내지 않은 구간 시작
+        index = 0
+        try:
+            while True:
+                try:
+                    message = await asyncio.wait_for(ws.recv(), timeout=self.idle_timeout)
+                except asyncio.TimeoutError:
+                    self.idle_closes += 1
+                    await ws.close(1011, "did not receive audio data or a text message within the timeout window")
+                    return
+                if isinstance(message, bytes):
+                    duration = len(message) / 2 / SAMPLE_RATE
+                    sent += duration
+                    self.audio_seconds += duration
+                    if sent - result_start >= self.utterance_seconds:
+                        index += 1
+                        await ws.send(json.dumps(_results(result_start, sent, index)))
+                        result_start = sent
+                    continue
+
+                msg_type = json.loads(message).get("type")
+                if msg_type == "KeepAlive":
+                    self.keepalives += 1
+                elif msg_type == "Finalize":
+                    self.finalizes += 1
+                    index += 1
+                    await ws.send(json.dumps(_results(result_start, sent, index, from_finalize=True)))
+                    result_start = sent
+                elif msg_type == "CloseStream":
+                    self.close_streams += 1
+                    await ws.send(json.dumps({
+                        "type": "Metadata", "request_id": str(uuid.uuid4()), "duration": round(sent, 3), "channels": 1,
+                    }))
+                    await ws.close(1000)
+                    return
+        except websockets.ConnectionClosed:
+            return
+        finally:
+            self._connections.discard(ws)
+
+    def metrics(self) -> Dict:
+        return {
+            "open": self.open_connections,
+            "opened": self.opened,
+            "keepalives": self.keepalives,
+            "finalizes": self.finalizes,
+            "close_streams": self.close_streams,
+            "idle_closes": self.idle_closes,
+            "dropped": self.dropped,
+            "audio_seconds": round(self.audio_seconds, 2),
+        }
+
+
+async def _serve(port: int):
+    server = FakeSttServer(port=port)
+    await server.start()
+    print(f"가짜 STT 서버: DEEPGRAM_WS_URL={server.url}")
+    await asyncio.Future()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(_serve(int(sys.argv[1]) if len(sys.argv) > 1 else 8765))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,273 @@
+"""
+오프라인 분석 작업 큐 (SQLite, 여러 워커 프로세스가 공유)
+- 우선순위: priority 가 높은 순 → 방송 예정 시각(scheduled_at)이 빠른 순 → 등록 순
+- 중복 제거: 같은 에셋(내용 해시) + 모드의 작업이 대기/진행/완료 상태면 새로 만들지 않고 기존 작업 반환
+- 실패 시 backoff 후 재시도 (RETRY_BASE_SECONDS * 2^(시도 횟수-1), 최대 MAX_ATTEMPTS 회)
+- 취소: 대기 중이면 즉시 취소, 실행 중이면 취소 요청만 기록 → 워커가 단계 경계에서 확인
+- 실행 중인 작업은 워커가 주기적으로 heartbeat 를 기록 (임대, LEASE_SECONDS)
+  → 임대가 만료된 running 작업만 recover_stale() 로 다시 대기열로 (살아 있는 다른 프로세스의 작업은 그대로)
+"""
+import os
+import json
+import time
+import uuid
+import sqlite3
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+# 기본 DB 경로 (ANALYSIS_DB_PATH 환경 변수로 변경)
+DEFAULT_DB_PATH = str(Path(__file__).parent / "analysis_jobs.db")
+MAX_ATTEMPTS = 3
+RETRY_BASE_SECONDS = 30.0
+RETRY_MAX_SECONDS = 600.0
+# 실행 중 작업의 임대 시간: 이 시간 동안 heartbeat 가 없으면 워커가 죽은 것으로 보고 다시 대기열로 (초)
+LEASE_SECONDS = 60.0
+
+# 작업 상태
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS analysis_jobs (
+    job_id           TEXT PRIMARY KEY,
+    video_name       TEXT NOT NULL,
+    audio_path       TEXT NOT NULL,
+    asset_hash       TEXT NOT NULL,
+    mode             TEXT NOT NULL,
+    stt              TEXT NOT NULL,
+    priority         INTEGER NOT NULL DEFAULT 0,
+    scheduled_at     REAL,
+    status           TEXT NOT NULL,
+    attempts         INTEGER NOT NULL DEFAULT 0,
+    next_run_at      REAL NOT NULL,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    worker           TEXT,
+    worker_pid       INTEGER,
+    heartbeat_at     REAL,
+    stage            TEXT,
+    progress         REAL NOT NULL DEFAULT 0,
+    stage_timings    TEXT,
+    captions         INTEGER NOT NULL DEFAULT 0,
+    track_path       TEXT,
+    error            TEXT,
+    created_at       REAL NOT NULL,
+    started_at       REAL,
+    finished_at      REAL
+);
+CREATE INDEX IF NOT EXISTS idx_analysis_jobs_claim ON analysis_jobs (status, next_run_at);
+CREATE INDEX IF NOT EXISTS idx_analysis_jobs_asset ON analysis_jobs (asset_hash, mode);
+"""
+# 이전 스키마 DB 에 추가할 컬럼
+_MIGRATIONS = {
+    "worker_pid": "INTEGER",
+    "heartbeat_at": "REAL",
+}
+
+
+class JobCancelled(Exception):
+    """실행 중 취소 요청된 작업 (워커가 progress 콜백에서 발생시킴)"""
+
+
+class JobQueue:
+    """SQLite 기반 작업 큐 (연산마다 연결을 새로 열어 프로세스 간 공유)"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        with self._conn() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(analysis_jobs)")}
+            for name, sql_type in _MIGRATIONS.items():
+                if name not in columns:
+                    conn.execute(f"ALTER TABLE analysis_jobs ADD COLUMN {name} {sql_type}")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30.0, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    @contextmanager
+    def _conn(self):
+        """단일 문장용 연결 (autocommit, 사용 후 닫음)"""
+        conn = self._connect()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> Dict:
+        job = dict(row)
+        job["stage_timings"] = json.loads(job["stage_timings"]) if job["stage_timings"] else {}
+        job["cancel_requested"] = bool(job["cancel_requested"])
+        return job
+
+    def enqueue(
+        self,
+        video_name: str,
+        audio_path: str,
+        asset_hash: str,
+        mode: str,
+        stt: str = "auto",
+        priority: int = 0,
+        scheduled_at: Optional[float] = None,
+        force: bool = False,
+    ) -> Tuple[str, bool]:
+        """작업 등록 → (job_id, 중복 여부). force=True 면 완료된 작업이 있어도 새로 분석"""
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            statuses = (QUEUED, RUNNING) if force else (QUEUED, RUNNING, DONE)
+            row = conn.execute(
+                f"SELECT job_id, status, priority FROM analysis_jobs WHERE asset_hash = ? AND mode = ? "
+                f"AND status IN ({','.join('?' * len(statuses))}) ORDER BY created_at DESC LIMIT 1",
+                (asset_hash, mode, *statuses),
+            ).fetchone()
+            if row is not None:
+                # 대기 중인 중복 작업은 더 급한 쪽 우선순위로 올림
+                if row["status"] == QUEUED:
+                    conn.execute(
+                        "UPDATE analysis_jobs SET priority = MAX(priority, ?), "
+                        "scheduled_at = CASE WHEN ? IS NOT NULL AND (scheduled_at IS NULL OR ? < scheduled_at) "
+                        "THEN ? ELSE scheduled_at END WHERE job_id = ?",
+                        (priority, scheduled_at, scheduled_at, scheduled_at, row["job_id"]),
+                    )
+                conn.execute("COMMIT")
+                return row["job_id"], True
+
+            job_id = uuid.uuid4().hex[:12]
+            conn.execute(
+                "INSERT INTO analysis_jobs (job_id, video_name, audio_path, asset_hash, mode, stt, priority, "
+                "scheduled_at, status, next_run_at, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, video_name, audio_path, asset_hash, mode, stt, priority, scheduled_at, QUEUED, now, now),
+            )
+            conn.execute("COMMIT")
+            return job_id, False
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def claim(self, worker: str) -> Optional[Dict]:
+        """실행할 작업 1개를 가져와 running 으로 표시 + 이 프로세스의 임대 기록 (없으면 None)"""
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT * FROM analysis_jobs WHERE status = ? AND next_run_at <= ? "
+                "ORDER BY priority DESC, COALESCE(scheduled_at, 1e18) ASC, created_at ASC LIMIT 1",
+                (QUEUED, now),
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE analysis_jobs SET status = ?, worker = ?, worker_pid = ?, heartbeat_at = ?, "
+                "attempts = attempts + 1, started_at = ?, stage = NULL, progress = 0, stage_timings = NULL, "
+                "error = NULL WHERE job_id = ?",
+                (RUNNING, worker, os.getpid(), now, now, row["job_id"]),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        return self.get(row["job_id"])
+
+    def update_progress(self, job_id: str, stage: str, progress: float, stage_timings: Dict):
+        with self._conn() as conn:
+            conn.execute(
+                "UPDATE analysis_jobs SET stage = ?, progress = ?, stage_timings = ?, heartbeat_at = ? WHERE job_id = ?",
+                (stage, round(progress, 3), json.dumps(stage_timings), time.time(), job_id),
+            )
+
+    def heartbeat(self, job_id: str, worker: str) -> bool:
+        """실행 중인 작업의 임대 연장 (임대가 만료돼 다른 워커에게 넘어갔으면 False)"""
+        with self._conn() as conn:
+            cur = conn.execute(
+                "UPDATE analysis_jobs SET heartbeat_at = ? WHERE job_id = ? AND status = ? AND worker = ?",
+                (time.time(), job_id, RUNNING, worker),
+            )
+            return cur.rowcount > 0
+
+    def complete(self, job_id: str, captions: int, track_path: str, stage_timings: Dict):
+        with self._conn() as conn:
+            conn.execute(
+                "UPDATE analysis_jobs SET status = ?, stage = 'done', progress = 1, captions = ?, track_path = ?, "
+                "stage_timings = ?, finished_at = ? WHERE job_id = ?",
+                (DONE, captions, track_path, json.dumps(stage_timings), time.time(), job_id),
+            )
+
+    def fail(self, job_id: str, error: str) -> bool:
+        """실패 기록 → 재시도 가능하면 backoff 후 다시 대기열로 (재시도 예약 시 True)"""
+        now = time.time()
+        with self._conn() as conn:
+            row = conn.execute("SELECT attempts FROM analysis_jobs WHERE job_id = ?", (job_id,)).fetchone()
+            attempts = row["attempts"] if row else MAX_ATTEMPTS
+            if attempts < MAX_ATTEMPTS:
+                delay = min(RETRY_BASE_SECONDS * 2 ** (attempts - 1), RETRY_MAX_SECONDS)
+                conn.execute(
+                    "UPDATE analysis_jobs SET status = ?, error = ?, next_run_at = ?, worker = NULL WHERE job_id = ?",
+                    (QUEUED, error, now + delay, job_id),
+                )
+                return True
+            conn.execute(
+                "UPDATE analysis_jobs SET status = ?, error = ?, finished_at = ? WHERE job_id = ?",
+                (FAILED, error, now, job_id),
+            )
+            return False
+
+    def cancel(self, job_id: str) -> Optional[str]:
+        """취소 (대기 중이면 즉시, 실행 중이면 요청만) → 변경 후 상태, 작업이 없으면 None"""
+        with self._conn() as conn:
+            row = conn.execute("SELECT status FROM analysis_jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            if row["status"] == QUEUED:
+                conn.execute(
+                    "UPDATE analysis_jobs SET status = ?, finished_at = ? WHERE job_id = ?",
+                    (CANCELLED, time.time(), job_id),
+                )
+                return CANCELLED
+            if row["status"] == RUNNING:
+                conn.execute("UPDATE analysis_jobs SET cancel_requested = 1 WHERE job_id = ?", (job_id,))
+            return row["status"]
+
+    def is_cancel_requested(self, job_id: str) -> bool:
+        with self._conn() as conn:
+            row = conn.execute("SELECT cancel_requested FROM analysis_jobs WHERE job_id = ?", (job_id,)).fetchone()
+            return bool(row and row["cancel_requested"])
+
+    def mark_cancelled(self, job_id: str):
+        with self._conn() as conn:
+            conn.execute(
+                "UPDATE analysis_jobs SET status = ?, finished_at = ? WHERE job_id = ?",
+                (CANCELLED, time.time(), job_id),
+            )
+
+    def recover_stale(self, lease_seconds: float = LEASE_SECONDS) -> int:
+        """임대가 만료된 running 작업(워커가 죽음)을 다시 대기열로 (heartbeat 중인 작업은 그대로)
+
+        프로세스 생존 여부(pid)는 확인하지 않음 - Windows 의 os.kill 은 프로세스를 종료시킴
+        """
+        now = time.time()
+        with self._conn() as conn:
+            cur = conn.execute(
+                "UPDATE analysis_jobs SET status = ?, worker = NULL, worker_pid = NULL, next_run_at = ? "
+                "WHERE status = ? AND COALESCE(heartbeat_at, started_at, 0) < ?",
+                (QUEUED, now, RUNNING, now - lease_seconds),
+            )
+            return cur.rowcount
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._conn() as conn:
+            row = conn.execute("SELECT * FROM analysis_jobs WHERE job_id = ?", (job_id,)).fetchone()
+            return self._to_dict(row) if row else None
@@ -0,0 +1,110 @@
+"""
+오프라인 분석 워커 프로세스
+- 프로세스마다 모델(KLUE-BERT, PANNs, STT 클라이언트)을 한 번만 로드해 두고 작업 큐에서 계속 가져와 처리
+- 단계별 소요 시간(stage_timings)과 진행률을 큐에 기록, 단계 경계마다 취소 요청 확인
+- 실행 중에는 HEARTBEAT_INTERVAL 마다 임대 연장, 대기열이 비면 임대가 만료된(죽은 워커의) 작업을 되돌림
+- 서버(video_analyzer_server)가 ANALYSIS_WORKERS 개를 별도 프로세스로 띄움, 단독 실행도 가능:
+    python job_worker.py [워커 이름] [DB 경로]
+- 모델/설정은 analysis_models 에서 로드 (서버 모듈과 FastAPI 앱은 import 하지 않음)
+- 로컬 CPU STT 는 워커 프로세스 안에서 모델 1개로 실행 (워커마다 다시 프로세스 풀을 만들지 않음)
+"""
+import logging
+import os
+import sys
+import time
+import asyncio
+import threading
+from typing import Dict
+
+import analysis_models as models
+from job_queue import DEFAULT_DB_PATH, JobCancelled, JobQueue
+from log_config import setup_logging
+
+logger = logging.getLogger(__name__)
+
+# 대기열이 비었을 때 다시 확인하는 간격 (초)
+POLL_INTERVAL = 2.0
+# 실행 중 작업의 임대 연장 간격 (초, job_queue.LEASE_SECONDS 보다 충분히 짧게)
+HEARTBEAT_INTERVAL = 15.0
+
+
+def _heartbeat(queue: JobQueue, job_id: str, worker: str, stop: threading.Event):
+    """작업이 끝날 때까지 주기적으로 임대 연장 (단계 하나가 오래 걸려도 다른 프로세스가 되돌리지 않게)"""
+    while not stop.wait(HEARTBEAT_INTERVAL):
+        try:
+            if not queue.heartbeat(job_id, worker):
+                logger.warning(f"⚠️ 작업 임대 만료 (다른 워커가 가져감): {job_id}")
+                return
+        except Exception as e:
+            logger.warning(f"⚠️ heartbeat 기록 실패: {job_id}: {e}")
+
+
+def run_job(queue: JobQueue, job: Dict) -> None:
+    """작업 1개 실행 (결과/실패/취소를 큐에 기록)"""
+    job_id = job["job_id"]
+    timings: Dict[str, float] = {}
+    current = {"stage": None, "since": time.time()}
+
+    def progress(stage: str, fraction: float):
+        now = time.time()
+        if current["stage"] is not None:
+            timings[current["stage"]] = round(now - current["since"], 3)
+        current["stage"], current["since"] = stage, now
+        queue.update_progress(job_id, stage, fraction, timings)
+        if stage != "done" and queue.is_cancel_requested(job_id):
+            raise JobCancelled(job_id)
+
+    logger.info(f"▶️ 작업 시작: {job_id} {job['video_name']} (시도 {job['attempts']})")
+    stop_heartbeat = threading.Event()
+    heartbeat = threading.Thread(
+        target=_heartbeat, args=(queue, job_id, job["worker"], stop_heartbeat), daemon=True
+    )
+    heartbeat.start()
+    try:
+        captions, track_path = asyncio.run(
+            models.run_offline_analysis(job["audio_path"], job["mode"], job["stt"], progress=progress)
+        )
+        if not track_path:
+            raise RuntimeError("자막 트랙 저장 실패")
+        queue.complete(job_id, len(captions), track_path, timings)
+        logger.info(f"✅ 작업 완료: {job_id} (자막 {len(captions)}개, {timings})")
+    except JobCancelled:
+        queue.mark_cancelled(job_id)
+        logger.info(f"⏹️ 작업 취소: {job_id}")
+    except Exception as e:
+        if queue.is_cancel_requested(job_id):
+            queue.mark_cancelled(job_id)
+            return
+        retry = queue.fail(job_id, f"{type(e).__name__}: {e}")
+        logger.error(f"❌ 작업 실패: {job_id}: {e} ({'재시도 예약' if retry else '재시도 없음'})")
+    finally:
+        stop_heartbeat.set()
+        heartbeat.join()
+
+
+def worker_main(db_path: str, worker_name: str):
+    """워커 프로세스 진입점: 모델 로드 후 작업 큐를 계속 처리"""
+    setup_logging()
+    models.use_in_process_local_stt()
+    # 실시간 분석과 같은 감정/BGM/STT 설정으로 모델 로드 (프로세스당 한 번)
+    models.init_models()
+
+    queue = JobQueue(db_path)
+    logger.info(f"✅ 워커 준비 완료: {worker_name} (pid {os.getpid()})")
+    while True:
+        job = queue.claim(worker_name)
+        if job is None:
+            recovered = queue.recover_stale()
+            if recovered:
+                logger.info(f"🔁 임대가 만료된 분석 작업 {recovered}개 다시 대기열로")
+                continue
+            time.sleep(POLL_INTERVAL)
+            continue
+        run_job(queue, job)
+
+
+if __name__ == "__main__":
+    worker_main(
+        sys.argv[2] if len(sys.argv) > 2 else os.getenv("ANALYSIS_DB_PATH", DEFAULT_DB_PATH),
+        sys.argv[1] if len(sys.argv) > 1 else f"worker-{os.getpid()}",
+    )
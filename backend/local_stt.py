@@ -0,0 +1,319 @@
+"""
+로컬 CPU STT (인터넷 없는 환경 / 카탈로그 일괄 사전 분석용)
+- 디스크에 둔 모델로 전사: faster-whisper(CTranslate2) 또는 Vosk (설치된 것 사용, 둘 다 선택 설치)
+- 결과는 사이드카 전사 파일과 같은 형식 (발화 + 단어별 시각)
+    [{"text": "...", "start": 0.0, "end": 1.2, "speaker": None, "words": [{"word": "...", "start": ..., "end": ...}]}]
+- 모델 추론은 워커 프로세스 풀에서 실행 (프로세스마다 모델을 한 번만 로드, 여러 파일 병렬 처리)
+    • workers=0 : 프로세스 풀 없이 현재 프로세스에 모델 1개를 로드해 스레드 1개에서 실행
+      (오프라인 분석 작업 워커처럼 이미 별도 프로세스인 곳에서 다시 자식 프로세스를 만들지 않음)
+- 처리량 보고: 오디오 초 / 경과 초 (전체, 코어당) + 오디오 초 / CPU 초
+
+사용법 (CLI, 여러 파일 병렬 전사 → <wav>.transcript.json 저장):
+    python local_stt.py <wav 경로> [<wav 경로> ...] --model <모델 경로> [--engine auto|whisper|vosk]
+                        [--workers N] [--threads N] [--no-sidecar]
+"""
+import os
+import json
+import logging
+import time
+import wave
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+
+try:
+    from faster_whisper import WhisperModel
+    HAS_FASTER_WHISPER = True
+except ImportError:
+    HAS_FASTER_WHISPER = False
+
+try:
+    from vosk import KaldiRecognizer, Model as VoskModel, SetLogLevel
+    HAS_VOSK = True
+except ImportError:
+    HAS_VOSK = False
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+LANGUAGE = "ko"
+# 워커 프로세스 수 / 프로세스당 추론 스레드 수
+LOCAL_STT_WORKERS = max(1, (os.cpu_count() or 2) // 2)
+LOCAL_STT_THREADS = 2
+# faster-whisper 연산 정밀도 (CPU 는 int8 이 가장 빠름)
+WHISPER_COMPUTE_TYPE = "int8"
+# Vosk 에 한 번에 넣는 오디오 크기 (바이트, 0.25초)
+VOSK_CHUNK_BYTES = 8000
+
+# 워커 프로세스 상태 (프로세스마다 모델 1개, workers=0 이면 현재 프로세스)
+_engine: Optional[str] = None
+_model = None
+_load_error: Optional[str] = None
+_load_lock = threading.Lock()
+
+
+def resolve_engine(engine: str = "auto") -> Optional[str]:
+    """auto → 설치된 엔진 (faster-whisper 우선), 설치되지 않은 엔진이면 None"""
+    if engine == "auto":
+        return "whisper" if HAS_FASTER_WHISPER else "vosk" if HAS_VOSK else None
+    if engine == "whisper":
+        return engine if HAS_FASTER_WHISPER else None
+    if engine == "vosk":
+        return engine if HAS_VOSK else None
+    return None
+
+
+def is_available(engine: str, model_path: Optional[str]) -> bool:
+    """엔진이 설치되어 있고 모델이 디스크에 있는지"""
+    return resolve_engine(engine) is not None and bool(model_path) and os.path.exists(model_path)
+
+
+def _init_worker(engine: str, model_path: str, threads: int):
+    """워커 프로세스 시작 시 모델 로드 (실패하면 전사 요청마다 오류로 알림)"""
+    global _engine, _model, _load_error
+    try:
+        _engine = resolve_engine(engine)
+        if _engine == "whisper":
+            _model = WhisperModel(model_path, device="cpu", compute_type=WHISPER_COMPUTE_TYPE, cpu_threads=threads)
+        elif _engine == "vosk":
+            SetLogLevel(-1)
+            _model = VoskModel(model_path)
+        else:
+            raise RuntimeError(f"로컬 STT 엔진을 사용할 수 없습니다: {engine} (faster-whisper / vosk 미설치)")
+    except Exception as e:
+        _load_error = f"{type(e).__name__}: {e}"
+
+
+def _read_pcm(path: str) -> bytes:
+    with wave.open(path, 'rb') as wav_file:
+        if (wav_file.getframerate() != SAMPLE_RATE or wav_file.getnchannels() != 1
+                or wav_file.getsampwidth() != 2):
+            raise ValueError("WAV 파일 형식이 맞지 않습니다. 16kHz mono 16-bit가 필요합니다.")
+        return wav_file.readframes(wav_file.getnframes())
+
+
+def _whisper_utterances(pcm: bytes) -> List[Dict]:
+    audio = np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0
+    segments, _ = _model.transcribe(audio, language=LANGUAGE, beam_size=1, word_timestamps=True, vad_filter=True)
+    utterances = []
+    for seg in segments:
+        words = [
+            {"word": w.word.strip(), "start": float(w.start), "end": float(w.end)}
+            for w in (seg.words or [])
+            if w.word.strip()
+        ]
+        text = seg.text.strip()
+        if text:
+            utterances.append({"text": text, "start": float(seg.start), "end": float(seg.end), "speaker": None, "words": words})
+    return utterances
+
+
+def _vosk_utterance(result: Dict) -> Optional[Dict]:
+    words = [
+        {"word": w["word"], "start": float(w["start"]), "end": float(w["end"])}
+        for w in result.get("result", [])
+    ]
+    if not words:
+        return None
+    text = result.get("text") or " ".join(w["word"] for w in words)
+    return {"text": text, "start": words[0]["start"], "end": words[-1]["end"], "speaker": None, "words": words}
+
+
+def _vosk_utterances(pcm: bytes) -> List[Dict]:
+    recognizer = KaldiRecognizer(_model, SAMPLE_RATE)
+    recognizer.SetWords(True)
+    results = []
+    for i in range(0, len(pcm), VOSK_CHUNK_BYTES):
+        if recognizer.AcceptWaveform(pcm[i:i + VOSK_CHUNK_BYTES]):
+            results.append(json.loads(recognizer.Result()))
+    results.append(json.loads(recognizer.FinalResult()))
+    return [u for u in map(_vosk_utterance, results) if u is not None]
+
+
+def _transcribe_pcm(pcm: bytes) -> Dict:
+    """(워커 프로세스) 16kHz mono 16-bit PCM → 발화 목록 + 처리 통계"""
+    if _load_error or _model is None:
+        raise RuntimeError(f"로컬 STT 모델 로드 실패: {_load_error}")
+    started, cpu_started = time.perf_counter(), time.process_time()
+    utterances = _whisper_utterances(pcm) if _engine == "whisper" else _vosk_utterances(pcm)
+    return {
+        "utterances": utterances,
+        "audio_seconds": len(pcm) / 2 / SAMPLE_RATE,
+        "elapsed": time.perf_counter() - started,
+        "cpu_seconds": time.process_time() - cpu_started,
+    }
+
+
+def _transcribe_file(path: str) -> Dict:
+    """(워커 프로세스) WAV 파일 전체 전사"""
+    return _transcribe_pcm(_read_pcm(path))
+
+
+class LocalSttPool:
+    """로컬 STT 워커 프로세스 풀 (파일/세그먼트 단위로 병렬 전사, 처리량 집계, workers=0 이면 현재 프로세스)"""
+
+    def __init__(
+        self,
+        model_path: str,
+        engine: str = "auto",
+        workers: int = LOCAL_STT_WORKERS,
+        threads: int = LOCAL_STT_THREADS,
+    ):
+        self.engine = resolve_engine(engine) or engine
+        self.model_path = model_path
+        self.workers = workers
+        self.threads = threads
+        self._init_args = (engine, model_path, threads)
+        if workers > 0:
+            self._executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=self._init_args,
+            )
+        else:
+            # 모델 1개를 스레드 1개에서만 사용 (이벤트 루프는 막지 않음, 모델은 처음 전사할 때 로드)
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="local-stt")
+
+        # 메트릭
+        self.requests = 0
+        self.failures = 0
+        self.audio_seconds = 0.0
+        self.busy_seconds = 0.0  # 워커들이 전사에 쓴 시간 합
+        self.cpu_seconds = 0.0
+
+    @property
+    def cores(self) -> int:
+        return max(1, self.workers) * self.threads
+
+    def _call_in_process(self, fn, arg) -> Dict:
+        with _load_lock:
+            if _model is None and _load_error is None:
+                _init_worker(*self._init_args)
+        return fn(arg)
+
+    async def _run(self, fn, arg) -> Dict:
+        self.requests += 1
+        try:
+            if self.workers > 0:
+                result = await asyncio.get_event_loop().run_in_executor(self._executor, fn, arg)
+            else:
+                result = await asyncio.get_event_loop().run_in_executor(self._executor, self._call_in_process, fn, arg)
+        except Exception:
+            self.failures += 1
+            raise
+        self.audio_seconds += result["audio_seconds"]
+        self.busy_seconds += result["elapsed"]
+        self.cpu_seconds += result["cpu_seconds"]
+        return result
+
+    async def transcribe(self, audio_path: str) -> Dict:
+        """WAV 파일 1개 전사 → {"utterances", "audio_seconds", "elapsed", "cpu_seconds"}"""
+        return await self._run(_transcribe_file, audio_path)
+
+    async def transcribe_pcm(self, pcm: bytes) -> List[Dict]:
+        """PCM 구간 1개 전사 → 발화 목록 (시각은 구간 시작 기준)"""
+        return (await self._run(_transcribe_pcm, pcm))["utterances"]
+
+    async def transcribe_many(self, audio_paths: List[str]) -> Dict:
+        """여러 파일 병렬 전사 → {"results": {경로: 결과 또는 {"error"}}, "throughput": {...}}"""
+        started = time.perf_counter()
+        outcomes = await asyncio.gather(*(self.transcribe(p) for p in audio_paths), return_exceptions=True)
+        wall = time.perf_counter() - started
+        results = {
+            path: {"error": f"{type(o).__name__}: {o}"} if isinstance(o, Exception) else o
+            for path, o in zip(audio_paths, outcomes)
+        }
+        audio = sum(r.get("audio_seconds", 0.0) for r in results.values())
+        return {"results": results, "throughput": self._throughput(audio, wall)}
+
+    def _throughput(self, audio_seconds: float, wall_seconds: float) -> Dict:
+        per_wall = audio_seconds / wall_seconds if wall_seconds > 0 else 0.0
+        return {
+            "audio_seconds": round(audio_seconds, 1),
+            "wall_seconds": round(wall_seconds, 2),
+            "realtime_factor": round(per_wall, 2),              # 오디오 초 / 경과 초
+            "per_core": round(per_wall / max(1, self.cores), 2),  # 위 값 / (워커 × 스레드)
+        }
+
+    def metrics(self) -> Dict:
+        return {
+            "engine": self.engine,
+            "workers": self.workers,
+            "threads": self.threads,
+            "requests": self.requests,
+            "failures": self.failures,
+            "audio_seconds": round(self.audio_seconds, 1),
+            "busy_seconds": round(self.busy_seconds, 1),
+            # 오디오 초 / CPU 초 (프로세스 CPU 시간 기준 코어당 처리량)
+            "audio_per_cpu_second": round(self.audio_seconds / self.cpu_seconds, 2) if self.cpu_seconds > 0 else None,
+        }
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class CpuTranscriber:
+    """오프라인 분석용 STT: 로컬 CPU 모델로 파일 전체 전사 (offline_analyzer 의 Transcriber 와 같은 인터페이스)"""
+    name = "cpu"
+
+    def __init__(self, pool: LocalSttPool):
+        self.pool = pool
+
+    async def transcribe(self, audio_path: str) -> List[Dict]:
+        result = await self.pool.transcribe(audio_path)
+        logger.info(
+            "✅ 전사 완료: %s (%.0f초 오디오 / %.1f초, x%.1f)",
+            os.path.basename(audio_path), result["audio_seconds"], result["elapsed"],
+            result["audio_seconds"] / max(result["elapsed"], 1e-6),
+        )
+        return result["utterances"]
+
+
+def main():
+    import argparse
+
+    from offline_analyzer import transcript_sidecar_path
+
+    parser = argparse.ArgumentParser(description="로컬 CPU STT 일괄 전사 (여러 파일 병렬)")
+    parser.add_argument("audio_paths", nargs="+", help="16kHz mono 16-bit WAV 경로")
+    parser.add_argument("--model", required=True, help="모델 경로 (faster-whisper CTranslate2 / Vosk 모델 디렉터리)")
+    parser.add_argument("--engine", default="auto", choices=["auto", "whisper", "vosk"])
+    parser.add_argument("--workers", type=int, default=LOCAL_STT_WORKERS, help="워커 프로세스 수 (0: 현재 프로세스)")
+    parser.add_argument("--threads", type=int, default=LOCAL_STT_THREADS, help="프로세스당 추론 스레드 수")
+    parser.add_argument("--no-sidecar", action="store_true", help="<wav>.transcript.json 을 저장하지 않음")
+    args = parser.parse_args()
+
+    if not is_available(args.engine, args.model):
+        raise SystemExit(f"[Local STT] ❌ 엔진({args.engine}) 미설치 또는 모델 경로 없음: {args.model}")
+
+    pool = LocalSttPool(args.model, args.engine, workers=args.workers, threads=args.threads)
+    try:
+        report = asyncio.run(pool.transcribe_many([os.path.abspath(p) for p in args.audio_paths]))
+    finally:
+        pool.close()
+
+    for path, result in report["results"].items():
+        if "error" in result:
+            print(f"[Local STT] ❌ {os.path.basename(path)}: {result['error']}")
+            continue
+        if not args.no_sidecar:
+            with open(transcript_sidecar_path(path), 'w', encoding='utf-8') as f:
+                json.dump(result["utterances"], f, ensure_ascii=False)
+        print(
+            f"[Local STT] ✅ {os.path.basename(path)}: 발화 {len(result['utterances'])}개, "
+            f"{result['audio_seconds']:.0f}초 오디오 / {result['elapsed']:.1f}초"
+        )
+    t = report["throughput"]
+    print(
+        f"[Local STT] 📊 처리량: 오디오 {t['audio_seconds']}초 / {t['wall_seconds']}초 "
+        f"= x{t['realtime_factor']} (코어당 x{t['per_core']}, {pool.workers}프로세스 × {pool.threads}스레드)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+로깅 설정 (print 대체)
+- 이벤트 루프/오디오 루프에서는 LogRecord 를 큐에 넣기만 하고, 메시지 포맷과 stdout 출력은 QueueListener 스레드가 처리
+  → Windows 콘솔처럼 출력이 느린 환경에서도 자막/오디오 경로가 멈추지 않음
+- 환경 변수
+    LOG_LEVEL      : 기본 레벨 (기본 INFO)
+    LOG_LEVELS     : 모듈(로거)별 레벨, 예) "video_analyzer=DEBUG,stt_stream=WARNING,ai_engine.kluebert_emotion=DEBUG"
+    LOG_FORMAT     : text (기본) / json (한 줄에 JSON 1개, 로그 수집용)
+    LOG_RATE_LIMIT : 카테고리가 붙은 로그의 카테고리별 초당 최대 개수 (기본 5, 0 이면 제한 없음)
+- 자주 나오는 로그(자막 1개마다, 감정 추론마다, 오디오 청크마다)는 extra={"category": "caption"} 처럼 카테고리를 붙임
+  → 카테고리별로 초당 개수를 제한하고, 버린 개수는 다음에 나가는 같은 카테고리 로그에 함께 표시
+"""
+import os
+import sys
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, List, Optional
+
+DEFAULT_RATE_LIMIT = 5
+TEXT_FORMAT = "%(asctime)s %(levelname)-7s [%(name)s] %(message)s"
+
+_listener: Optional[QueueListener] = None
+
+
+class RateLimitFilter(logging.Filter):
+    """category 가 있는 레코드를 카테고리별 1초당 per_second 개까지만 통과 (버린 개수는 record.suppressed)"""
+
+    def __init__(self, per_second: int = DEFAULT_RATE_LIMIT):
+        super().__init__()
+        self.per_second = per_second
+        self._state: Dict[str, List] = {}  # 카테고리 → [구간 시작, 구간 안에서 통과한 개수, 버린 개수]
+        self._lock = threading.Lock()      # executor 스레드에서도 로그를 남김
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        category = getattr(record, "category", None)
+        if category is None or self.per_second <= 0:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            state = self._state.setdefault(category, [now, 0, 0])
+            if now - state[0] >= 1.0:
+                state[0], state[1] = now, 0
+            if state[1] >= self.per_second:
+                state[2] += 1
+                return False
+            state[1] += 1
+            record.suppressed, state[2] = state[2], 0
+        return True
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """메시지 포맷을 리스너 스레드로 미룸 (기본 QueueHandler.prepare 는 호출한 스레드에서 포맷)"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        suppressed = getattr(record, "suppressed", 0)
+        return f"{text} (같은 종류 로그 {suppressed}개 생략)" if suppressed else text
+
+
+class JsonFormatter(logging.Formatter):
+    """한 줄에 JSON 객체 1개 (ts, level, logger, msg, category, suppressed, exc)"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "pid": record.process,
+        }
+        category = getattr(record, "category", None)
+        if category is not None:
+            entry["category"] = category
+        if getattr(record, "suppressed", 0):
+            entry["suppressed"] = record.suppressed
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+def _parse_levels(spec: str) -> Dict[str, str]:
+    levels = {}
+    for item in spec.split(","):
+        name, sep, level = item.partition("=")
+        if sep and name.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def setup_logging(
+    level: Optional[str] = None,
+    module_levels: Optional[str] = None,
+    fmt: Optional[str] = None,
+    rate_limit: Optional[int] = None,
+) -> None:
+    """루트 로거를 큐 기반 비동기 출력으로 설정 (프로세스마다 한 번, 다시 호출하면 무시)"""
+    global _listener
+    if _listener is not None:
+        return
+
+    level = (level or os.getenv("LOG_LEVEL", "INFO")).upper()
+    module_levels = module_levels if module_levels is not None else os.getenv("LOG_LEVELS", "")
+    fmt = (fmt or os.getenv("LOG_FORMAT", "text")).lower()
+    rate_limit = rate_limit if rate_limit is not None else int(os.getenv("LOG_RATE_LIMIT", str(DEFAULT_RATE_LIMIT)))
+
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter(TEXT_FORMAT))
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    handler = _DeferredQueueHandler(log_queue)
+    handler.addFilter(RateLimitFilter(rate_limit))
+
+    root = logging.getLogger()
+    for old in list(root.handlers):
+        root.removeHandler(old)
+    root.addHandler(handler)
+    root.setLevel(level)
+    for name, module_level in _parse_levels(module_levels).items():
+        logging.getLogger(name).setLevel(module_level)
+
+    _listener = QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging() -> None:
+    """남은 로그를 모두 출력하고 리스너 스레드 종료"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,128 @@
+"""
+WAV 전체 음량(RMS) 엔벨로프 사전 계산 + 디스크 캐시
+- 16kHz mono 16-bit WAV 를 블록 단위로 읽으며 고정 hop 단위 RMS 계산 (NumPy 벡터 연산)
+- 결과는 에셋 옆에 .npy 로 저장 (파일 내용 해시로 키잉), 로드 시 memory-map
+- 자막 구간 [start, end] 의 intensity 를 스트리밍 위치와 무관하게 즉시 조회
+"""
+import logging
+import os
+import hashlib
+import tempfile
+import wave
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+HOP_FRAMES = 512  # 32ms - 실시간 스트리밍 청크(1024 bytes)와 동일한 단위
+INTENSITY_GAIN = 2.0  # RMS → intensity(0~1) 변환 배율 (실시간 계산과 동일)
+BLOCK_HOPS = 2048  # 한 번에 읽는 hop 수 (약 65초)
+
+# 해시 재계산 방지: {(path, size, mtime_ns): sha1}
+_hash_cache: Dict[Tuple[str, int, int], str] = {}
+
+
+def file_content_hash(path: str, block_size: int = 1 << 20) -> str:
+    """파일 내용 SHA-1 해시 (크기/수정시간이 같으면 프로세스 내 캐시 사용)"""
+    st = os.stat(path)
+    key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    if key in _hash_cache:
+        return _hash_cache[key]
+
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            h.update(block)
+    digest = h.hexdigest()
+    _hash_cache[key] = digest
+    return digest
+
+
+def compute_envelope(samples: np.ndarray, hop: int = HOP_FRAMES) -> np.ndarray:
+    """int16 샘플 배열 → hop 단위 intensity(0~1) 배열 (float32, 마지막 hop 은 0 으로 채움)"""
+    if samples.size == 0:
+        return np.zeros(0, dtype=np.float32)
+
+    n_full = samples.size // hop
+    x = samples[:n_full * hop].astype(np.float32).reshape(n_full, hop) / 32768.0
+    sq = np.sum(x * x, axis=1)
+    if samples.size > n_full * hop:
+        tail = samples[n_full * hop:].astype(np.float32) / 32768.0
+        sq = np.append(sq, np.sum(tail * tail))
+
+    rms = np.sqrt(sq / hop)
+    return np.minimum(1.0, rms * INTENSITY_GAIN).astype(np.float32)
+
+
+def compute_wav_envelope(wav_file: wave.Wave_read, hop: int = HOP_FRAMES,
+                         block_hops: int = BLOCK_HOPS) -> np.ndarray:
+    """WAV 를 block_hops 개 hop 씩 읽으며 엔벨로프 계산 (파일 전체를 메모리에 올리지 않음)"""
+    parts = []
+    while True:
+        data = wav_file.readframes(hop * block_hops)
+        if not data:
+            break
+        parts.append(compute_envelope(np.frombuffer(data, dtype=np.int16), hop))
+    if not parts:
+        return np.zeros(0, dtype=np.float32)
+    return np.concatenate(parts)
+
+
+class LoudnessEnvelope:
+    """hop 단위 intensity 배열 + 시간 구간 조회"""
+
+    def __init__(self, values: np.ndarray, hop_seconds: float = HOP_FRAMES / SAMPLE_RATE):
+        self.values = values
+        self.hop_seconds = hop_seconds
+
+    @property
+    def duration(self) -> float:
+        return len(self.values) * self.hop_seconds
+
+    def intensity(self, start: float, end: float, default: float = 0.5) -> float:
+        """[start, end] 구간 평균 intensity (데이터가 없으면 default)"""
+        i0 = max(int(start / self.hop_seconds), 0)
+        i1 = min(int(np.ceil(end / self.hop_seconds)), len(self.values))
+        if i1 <= i0:
+            return default
+        return float(np.mean(self.values[i0:i1]))
+
+
+def envelope_cache_path(wav_path: str, digest: str) -> str:
+    """캐시 파일 경로: <에셋 파일명>.<해시 16자리>.loudness.npy (에셋과 같은 폴더)"""
+    return f"{wav_path}.{digest[:16]}.loudness.npy"
+
+
+def load_or_build_envelope(wav_path: str) -> Optional[LoudnessEnvelope]:
+    """캐시가 있으면 memory-map 으로 로드, 없으면 WAV 를 블록 단위로 읽어 계산 후 저장"""
+    try:
+        digest = file_content_hash(wav_path)
+        cache_path = envelope_cache_path(wav_path, digest)
+
+        if os.path.exists(cache_path):
+            values = np.load(cache_path, mmap_mode='r')
+            return LoudnessEnvelope(values)
+
+        with wave.open(wav_path, 'rb') as wav_file:
+            if (wav_file.getframerate() != SAMPLE_RATE or wav_file.getnchannels() != 1
+                    or wav_file.getsampwidth() != 2):
+                return None
+            values = compute_wav_envelope(wav_file)
+
+        # 다른 세션/프로세스와 동시에 만들 수 있으므로 고유한 임시 파일에 쓰고 교체
+        tmp = tempfile.NamedTemporaryFile(dir=os.path.dirname(os.path.abspath(cache_path)),
+                                          suffix='.tmp', delete=False)
+        try:
+            with tmp:
+                np.save(tmp, values)
+            os.replace(tmp.name, cache_path)
+        except BaseException:
+            os.unlink(tmp.name)
+            raise
+
+        return LoudnessEnvelope(np.load(cache_path, mmap_mode='r'))
+    except Exception as e:
+        logger.warning(f"⚠️ 음량 엔벨로프 생성 실패 ({wav_path}): {e}")
+        return None
@@ -0,0 +1,248 @@
+"""
+에셋 전체 오프라인 분석 (방송 전 사전 처리)
+- 실시간 WebSocket 루프와 달리 asyncio.sleep 페이싱 없이 STT 제공자가 허용하는 최대 속도로 처리
+- 단계: STT → 문장 묶기 → 음량(엔벨로프) → BGM/SFX(PANNs 배치) → 감정(배치) → 자막 트랙
+- STT 는 교체 가능
+    • DeepgramTranscriber : Deepgram 사전 녹음(prerecorded) API 로 파일 전체를 한 번에 전사
+    • LocalTranscriber    : <wav>.transcript.json 사이드카를 읽는 대체 구현 (테스트/오프라인용)
+    • CpuTranscriber      : 로컬 CPU 모델(faster-whisper / Vosk)로 전사 (local_stt, 인터넷 없는 환경용)
+- 결과는 caption_track 으로 저장 → 이후 시청자는 디스크에서 재생
+
+사용법 (CLI):
+    python offline_analyzer.py <wav 경로> [--stt auto|deepgram|local|cpu]
+"""
+import os
+import json
+import time
+import wave
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from caption_timeline import StateTimeline
+from loudness_envelope import load_or_build_envelope
+from speaker_diarization import SpeakerTracker
+
+# 진행률 보고 시 단계별 시작 지점 (0~1)
+STAGE_PROGRESS = {
+    "stt": 0.0,
+    "intensity": 0.4,
+    "bgm": 0.5,
+    "emotion": 0.8,
+    "save": 0.95,
+    "done": 1.0,
+}
+# 짧은 발화를 다음 발화와 합치는 기준 (실시간 SentenceBuffer 와 동일)
+MIN_SENTENCE_LENGTH = 5
+MAX_MERGE_GAP = 1.0  # 초
+
+ProgressCallback = Callable[[str, float], None]
+
+
+def transcript_sidecar_path(audio_path: str) -> str:
+    return f"{audio_path}.transcript.json"
+
+
+class LocalTranscriber:
+    """STT 대체 구현: 사이드카 파일의 발화 목록을 그대로 반환 (네트워크/과금 없음)
+
+    사이드카 형식: [{"text": "...", "start": 0.0, "end": 1.2, "speaker": 0}, ...]
+    """
+    name = "local"
+
+    async def transcribe(self, audio_path: str) -> List[Dict]:
+        with open(transcript_sidecar_path(audio_path), 'r', encoding='utf-8') as f:
+            utterances = json.load(f)
+        return [
+            {
+                "text": u.get("text", ""),
+                "start": float(u.get("start", 0.0)),
+                "end": float(u.get("end", u.get("start", 0.0))),
+                "speaker": u.get("speaker"),
+            }
+            for u in utterances
+        ]
+
+
+class DeepgramTranscriber:
+    """Deepgram 사전 녹음 API: 파일 전체를 한 번에 보내고 발화(utterance) 단위 결과를 받음"""
+    name = "deepgram"
+
+    def __init__(self, client, model: str = "nova-2", language: str = "ko-KR"):
+        self.client = client
+        self.model = model
+        self.language = language
+
+    async def transcribe(self, audio_path: str) -> List[Dict]:
+        loop = asyncio.get_event_loop()
+        audio = await loop.run_in_executor(None, _read_bytes, audio_path)
+        response = await self.client.listen.v1.media.transcribe_file(
+            request=audio,
+            model=self.model,
+            language=self.language,
+            smart_format=True,
+            punctuate=True,
+            diarize=True,
+            utterances=True,
+        )
+        utterances = getattr(getattr(response, "results", None), "utterances", None) or []
+        return [
+            {
+                "text": getattr(u, "transcript", "") or "",
+                "start": float(getattr(u, "start", 0.0)),
+                "end": float(getattr(u, "end", 0.0)),
+                "speaker": getattr(u, "speaker", None),
+            }
+            for u in utterances
+        ]
+
+
+def _read_bytes(path: str) -> bytes:
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def read_wav_samples(path: str) -> np.ndarray:
+    """16kHz mono 16-bit WAV → int16 샘플 배열"""
+    with wave.open(path, 'rb') as wav_file:
+        if (wav_file.getframerate() != 16000 or wav_file.getnchannels() != 1
+                or wav_file.getsampwidth() != 2):
+            raise ValueError("WAV 파일 형식이 맞지 않습니다. 16kHz mono 16-bit가 필요합니다.")
+        return np.frombuffer(wav_file.readframes(wav_file.getnframes()), dtype=np.int16)
+
+
+def group_sentences(
+    utterances: List[Dict],
+    min_length: int = MIN_SENTENCE_LENGTH,
+    max_gap: float = MAX_MERGE_GAP,
+) -> List[Dict]:
+    """발화 → 자막 문장 (min_length 보다 짧은 발화는 같은 화자의 바로 다음 발화와 합침)"""
+    sentences: List[Dict] = []
+    for u in sorted(utterances, key=lambda u: u["start"]):
+        text = u["text"].strip()
+        if not text:
+            continue
+        last = sentences[-1] if sentences else None
+        if (last is not None and len(last["text"]) < min_length
+                and last["speaker"] == u["speaker"] and u["start"] - last["end"] <= max_gap):
+            last["text"] = f"{last['text']} {text}"
+            last["end"] = max(last["end"], u["end"])
+            continue
+        sentences.append({"text": text, "start": u["start"], "end": u["end"], "speaker": u["speaker"]})
+    return sentences
+
+
+def _build_timelines(points: List[Tuple[float, str, str]]) -> Tuple[StateTimeline, StateTimeline]:
+    """PANNs 분석 지점 [(시각, bgm, sfx)] → BGM/SFX 타임라인 (지점 사이 구간은 직전 값 유지)"""
+    bgm_timeline = StateTimeline()
+    sfx_timeline = StateTimeline()
+    prev_t = 0.0
+    for t, bgm, sfx in points:
+        bgm_timeline.update(prev_t, t, bgm)
+        sfx_timeline.update(prev_t, t, sfx)
+        prev_t = t
+    return bgm_timeline, sfx_timeline
+
+
+async def analyze_asset(
+    audio_path: str,
+    transcriber,
+    infer_emotions: Callable[[List[str]], Awaitable[List[Optional[Dict]]]],
+    analyze_bgm: Optional[Callable[[np.ndarray], List[Tuple[float, str, str]]]] = None,
+    correct_text: Optional[Callable[[str], str]] = None,
+    progress: Optional[ProgressCallback] = None,
+    label_speaker: Optional[Callable[[float, float], Optional[int]]] = None,
+) -> List[Dict]:
+    """WAV 전체 → final 자막 목록 (실시간 세션이 보내는 final 자막과 같은 형식)
+
+    infer_emotions: 문장 리스트 → 스타일링 dict 리스트 (배치 추론, 실패한 문장은 None)
+    analyze_bgm   : int16 샘플 전체 → [(시각, bgm_text, sfx_text)] (None 이면 BGM/SFX 생략)
+    label_speaker : 문장 구간 (start, end) → 인물 번호 (화자 임베딩, 없으면 STT 화자 id 를 등장 순서로 번호 매김)
+    """
+    report = progress or (lambda stage, fraction: None)
+    loop = asyncio.get_event_loop()
+
+    # 1) STT (페이싱 없이 한 번에)
+    report("stt", STAGE_PROGRESS["stt"])
+    utterances = await transcriber.transcribe(audio_path)
+    if correct_text is not None:
+        for u in utterances:
+            u["text"] = correct_text(u["text"])
+    sentences = group_sentences(utterances)
+
+    # 2) 음량 엔벨로프 (NumPy 벡터 연산 1번, 캐시 공유)
+    report("intensity", STAGE_PROGRESS["intensity"])
+    envelope = await loop.run_in_executor(None, load_or_build_envelope, audio_path)
+
+    # 3) BGM/SFX (PANNs 배치 추론)
+    report("bgm", STAGE_PROGRESS["bgm"])
+    bgm_timeline = sfx_timeline = None
+    if analyze_bgm is not None:
+        samples = await loop.run_in_executor(None, read_wav_samples, audio_path)
+        points = await loop.run_in_executor(None, analyze_bgm, samples)
+        bgm_timeline, sfx_timeline = _build_timelines(points)
+
+    # 4) 감정 (배치 추론)
+    report("emotion", STAGE_PROGRESS["emotion"])
+    stylings = await infer_emotions([s["text"] for s in sentences]) if sentences else []
+
+    # 5) 자막 조립 (화자 번호는 처음 등장한 순서대로 1, 2, 3 ... / 화자 임베딩이 있으면 에셋 단위 인물 번호)
+    speakers = SpeakerTracker()
+    if label_speaker is not None:
+        labels = await loop.run_in_executor(None, lambda: [label_speaker(s["start"], s["end"]) for s in sentences])
+    else:
+        labels = [speakers.map_speaker_id(s["speaker"]) for s in sentences]
+    captions = []
+    for caption_id, (sentence, styling, label) in enumerate(zip(sentences, stylings, labels), start=1):
+        text = f"[인물{label}] {sentence['text']}" if label else sentence["text"]
+
+        styling = styling or {"emotion": "중립", "emotion_icon": "", "color": "#FFFFFF"}
+        start, end = sentence["start"], sentence["end"]
+        captions.append({
+            "type": "final",
+            "caption_id": caption_id,
+            "revision": 0,
+            "text": text,
+            "emotion": styling["emotion"],
+            "emotion_icon": styling["emotion_icon"],
+            "color": styling["color"],
+            "intensity": envelope.intensity(start, end) if envelope is not None else 0.5,
+            "pitch": 0.5,
+            "bgm": bgm_timeline.dominant(start, end) if bgm_timeline is not None else None,
+            "sfx": sfx_timeline.dominant(start, end) if sfx_timeline is not None else None,
+            "start": float(start),
+            "end": float(end),
+        })
+
+    return captions
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="에셋 전체 오프라인 자막 분석")
+    parser.add_argument("audio_path", help="16kHz mono 16-bit WAV 경로")
+    parser.add_argument("--stt", default="auto", choices=["auto", "deepgram", "local", "cpu"],
+                        help="auto: Deepgram 키가 있으면 Deepgram, 없으면 사이드카 전사 파일, 그것도 없으면 로컬 CPU 모델")
+    args = parser.parse_args()
+
+    # 실시간 분석과 같은 감정/BGM/STT 설정으로 모델 로드
+    import analysis_models as models
+    from log_config import setup_logging
+    setup_logging()
+    models.init_models()
+
+    def print_progress(stage: str, fraction: float):
+        print(f"[Offline Analyzer] ⏳ {stage} ({fraction * 100:.0f}%)")
+
+    audio_path = os.path.abspath(args.audio_path)
+    started = time.time()
+    captions, track_path = asyncio.run(models.run_offline_analysis(
+        audio_path, models.content_mode(audio_path), args.stt, progress=print_progress
+    ))
+    print(f"[Offline Analyzer] ✅ 완료: 자막 {len(captions)}개, {time.time() - started:.1f}초 → {track_path}")
+
+
+if __name__ == "__main__":
+    main()
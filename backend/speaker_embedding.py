@@ -0,0 +1,303 @@
+"""
+로컬 화자 임베딩 기반 화자 구분 (CPU, 에셋 단위로 인물 번호 고정)
+- Deepgram speaker id 는 연결마다 0 부터 다시 매겨지므로 seek / 재연결 / 다른 세션에서 [인물N] 이 바뀔 수 있다
+  → 확정된 발화 구간의 오디오에서 작은 화자 임베딩을 뽑아 에셋별로 점진적 군집화 (군집 번호 = 인물 번호)
+- 임베딩: resemblyzer 설치 시 d-vector(256차원), 없으면 MFCC 평균/표준편차(38차원, NumPy 만 사용)
+- 발화 구간 → 인물 번호 결과와 군집 중심은 에셋 옆에 .npz 로 저장 (파일 내용 해시로 키잉)
+  → 다시 볼 때 이미 계산한 구간은 임베딩 계산 없이 캐시에서 바로 조회
+- cached_label() 은 캐시만 조회 (이벤트 루프에서 호출 가능), label_for() 는 WAV 읽기 + 임베딩 계산이
+  필요할 수 있으므로 executor 에서 호출
+"""
+import logging
+import os
+import tempfile
+import wave
+import threading
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from loudness_envelope import file_content_hash
+
+logger = logging.getLogger(__name__)
+
+try:
+    from resemblyzer import VoiceEncoder
+    HAS_RESEMBLYZER = True
+except ImportError:
+    HAS_RESEMBLYZER = False
+
+SAMPLE_RATE = 16000
+# 이보다 짧은 발화는 임베딩 신뢰도가 낮아 인물 번호를 정하지 않음 (초)
+MIN_EMBED_SECONDS = 0.8
+# 임베딩 계산에 쓰는 최대 구간 길이 (초, 긴 발화는 가운데 부분만)
+MAX_EMBED_SECONDS = 6.0
+# 에셋당 최대 인물 수 (넘으면 가장 가까운 군집에 배정)
+MAX_SPEAKERS = 10
+# 캐시된 구간과 이 비율 이상 겹치면 캐시 결과 사용
+CACHE_OVERLAP_RATIO = 0.6
+
+# MFCC 임베딩 설정 (25ms 창 / 10ms hop)
+FRAME_SIZE = 400
+FRAME_HOP = 160
+N_FFT = 512
+N_MELS = 40
+N_MFCC = 20
+MEL_RANGE_HZ = (80.0, 7600.0)
+# 가장 큰 프레임보다 이만큼 작은 프레임은 무음으로 보고 제외 (dB)
+FRAME_ENERGY_RANGE_DB = 30.0
+
+
+class MfccEmbedder:
+    """MFCC(c1~c19) 평균 + 표준편차 → 단위 벡터 (모델 없이 NumPy 만 사용)"""
+    name = "mfcc"
+    threshold = 0.86  # 군집 중심과의 코사인 유사도가 이 이상이면 같은 인물
+
+    def __init__(self):
+        self._window = np.hamming(FRAME_SIZE).astype(np.float32)
+        self._mel = self._mel_filterbank()
+        n = np.arange(N_MELS)
+        k = np.arange(1, N_MFCC)[:, None]
+        self._dct = (np.cos(np.pi / N_MELS * (n + 0.5) * k) * np.sqrt(2.0 / N_MELS)).astype(np.float32)
+
+    @staticmethod
+    def _mel_filterbank() -> np.ndarray:
+        def hz_to_mel(f):
+            return 2595.0 * np.log10(1.0 + f / 700.0)
+
+        def mel_to_hz(m):
+            return 700.0 * (10.0 ** (m / 2595.0) - 1.0)
+
+        mels = np.linspace(hz_to_mel(MEL_RANGE_HZ[0]), hz_to_mel(MEL_RANGE_HZ[1]), N_MELS + 2)
+        bins = np.floor((N_FFT + 1) * mel_to_hz(mels) / SAMPLE_RATE).astype(int)
+        bank = np.zeros((N_MELS, N_FFT // 2 + 1), dtype=np.float32)
+        for i in range(N_MELS):
+            lo, mid, hi = bins[i], bins[i + 1], bins[i + 2]
+            if mid > lo:
+                bank[i, lo:mid] = (np.arange(lo, mid) - lo) / (mid - lo)
+            if hi > mid:
+                bank[i, mid:hi] = (hi - np.arange(mid, hi)) / (hi - mid)
+        return bank
+
+    def embed(self, samples: np.ndarray) -> Optional[np.ndarray]:
+        x = samples.astype(np.float32) / 32768.0
+        n_frames = 1 + (x.size - FRAME_SIZE) // FRAME_HOP
+        if n_frames < 10:
+            return None
+        idx = np.arange(FRAME_SIZE)[None, :] + FRAME_HOP * np.arange(n_frames)[:, None]
+        power = np.abs(np.fft.rfft(x[idx] * self._window, n=N_FFT)) ** 2
+        log_mel = np.log(power @ self._mel.T + 1e-10)
+
+        # 무음 프레임 제외 (발화 구간 안의 숨/쉼)
+        energy_db = 10.0 * np.log10(power.sum(axis=1) + 1e-10)
+        voiced = energy_db >= energy_db.max() - FRAME_ENERGY_RANGE_DB
+        if voiced.sum() < 10:
+            return None
+        mfcc = log_mel[voiced] @ self._dct.T
+        vector = np.concatenate([mfcc.mean(axis=0), mfcc.std(axis=0)])
+        norm = float(np.linalg.norm(vector))
+        return (vector / norm).astype(np.float32) if norm > 0 else None
+
+
+class ResemblyzerEmbedder:
+    """resemblyzer d-vector (GE2E, 256차원, CPU)"""
+    name = "resemblyzer"
+    threshold = 0.75
+
+    def __init__(self):
+        self._encoder = VoiceEncoder("cpu", verbose=False)
+
+    def embed(self, samples: np.ndarray) -> Optional[np.ndarray]:
+        vector = self._encoder.embed_utterance(samples.astype(np.float32) / 32768.0)
+        return np.asarray(vector, dtype=np.float32)
+
+
+_default_embedder = None
+
+
+def default_embedder():
+    """설치된 것 중 가장 좋은 임베딩 (프로세스당 1개)"""
+    global _default_embedder
+    if _default_embedder is None:
+        _default_embedder = ResemblyzerEmbedder() if HAS_RESEMBLYZER else MfccEmbedder()
+    return _default_embedder
+
+
+def speaker_cache_path(wav_path: str, digest: str, embedder_name: str) -> str:
+    """캐시 파일 경로: <에셋 파일명>.<해시 16자리>.speakers.<임베딩>.npz (에셋과 같은 폴더)"""
+    return f"{wav_path}.{digest[:16]}.speakers.{embedder_name}.npz"
+
+
+class AssetSpeakers:
+    """에셋 1개의 화자 군집 + 발화 구간별 인물 번호 캐시 (같은 에셋의 세션들이 공유)"""
+
+    def __init__(self, wav_path: str, cache_path: str, embedder):
+        self.wav_path = wav_path
+        self.cache_path = cache_path
+        self.embedder = embedder
+        self._lock = threading.Lock()  # 실시간 세션(이벤트 루프)과 저장(executor)이 동시에 접근
+        self._centroids: List[np.ndarray] = []  # 인물별 임베딩 합 (방향만 사용)
+        self._counts: List[int] = []
+        # 발화 구간 캐시 (시작 시각 순)
+        self._starts: List[float] = []
+        self._ends: List[float] = []
+        self._labels: List[int] = []
+        self._max_span = 0.0  # 캐시 구간 중 가장 긴 길이 (초, 겹치는 구간 탐색 범위)
+        self.dirty = False
+
+        # 메트릭
+        self.cache_hits = 0
+        self.embedded = 0
+
+    # ---- 캐시 ----
+
+    def load(self):
+        if not os.path.exists(self.cache_path):
+            return
+        with np.load(self.cache_path) as data:
+            self._centroids = [c for c in data["centroids"]]
+            self._counts = [int(c) for c in data["counts"]]
+            self._starts = [float(t) for t in data["starts"]]
+            self._ends = [float(t) for t in data["ends"]]
+            self._labels = [int(label) for label in data["labels"]]
+        self._max_span = max((e - s for s, e in zip(self._starts, self._ends)), default=0.0)
+
+    def save(self):
+        """새로 계산한 구간이 있으면 캐시 파일 교체"""
+        with self._lock:
+            if not self.dirty:
+                return
+            dim = self._centroids[0].size if self._centroids else 0
+            arrays = dict(
+                centroids=np.array(self._centroids, dtype=np.float32).reshape(len(self._centroids), dim),
+                counts=np.array(self._counts, dtype=np.int32),
+                starts=np.array(self._starts, dtype=np.float64),
+                ends=np.array(self._ends, dtype=np.float64),
+                labels=np.array(self._labels, dtype=np.int32),
+            )
+            self.dirty = False
+        try:
+            # 다른 세션/프로세스와 동시에 저장할 수 있으므로 고유한 임시 파일에 쓰고 교체
+            tmp = tempfile.NamedTemporaryFile(dir=os.path.dirname(os.path.abspath(self.cache_path)),
+                                              suffix='.tmp', delete=False)
+            try:
+                with tmp:
+                    np.savez(tmp, **arrays)
+                os.replace(tmp.name, self.cache_path)
+            except BaseException:
+                os.unlink(tmp.name)
+                raise
+        except Exception as e:
+            logger.warning(f"⚠️ 화자 캐시 저장 실패 ({self.cache_path}): {e}")
+
+    def _cached_label(self, start: float, end: float) -> Optional[int]:
+        """[start, end] 와 충분히 겹치는 캐시 구간의 인물 번호"""
+        span = max(end - start, 1e-3)
+        hi = bisect_left(self._starts, end)
+        # 저장된 구간은 발화 전체 길이 → 가장 긴 구간만큼 앞에서 시작한 구간까지 겹칠 수 있음
+        lo = bisect_right(self._starts, start - self._max_span)
+        best, best_overlap = None, 0.0
+        for i in range(lo, hi):
+            overlap = min(end, self._ends[i]) - max(start, self._starts[i])
+            if overlap > best_overlap:
+                best, best_overlap = self._labels[i], overlap
+        return best if best_overlap / span >= CACHE_OVERLAP_RATIO else None
+
+    # ---- 임베딩 / 군집 ----
+
+    def _read_span(self, start: float, end: float) -> Optional[np.ndarray]:
+        if end - start > MAX_EMBED_SECONDS:
+            middle = (start + end) / 2.0
+            start, end = middle - MAX_EMBED_SECONDS / 2.0, middle + MAX_EMBED_SECONDS / 2.0
+        with wave.open(self.wav_path, 'rb') as wav_file:
+            first = max(0, int(start * SAMPLE_RATE))
+            count = min(int(end * SAMPLE_RATE), wav_file.getnframes()) - first
+            if count <= 0:
+                return None
+            wav_file.setpos(first)
+            return np.frombuffer(wav_file.readframes(count), dtype=np.int16)
+
+    def _assign(self, embedding: np.ndarray) -> int:
+        """가장 가까운 인물 군집에 추가 (충분히 가깝지 않으면 새 인물), 인물 번호(1부터) 반환"""
+        best, best_sim = -1, -1.0
+        for i, centroid in enumerate(self._centroids):
+            sim = float(centroid @ embedding) / (float(np.linalg.norm(centroid)) + 1e-10)
+            if sim > best_sim:
+                best, best_sim = i, sim
+        if best < 0 or (best_sim < self.embedder.threshold and len(self._centroids) < MAX_SPEAKERS):
+            self._centroids.append(embedding.copy())
+            self._counts.append(1)
+            return len(self._centroids)
+        self._centroids[best] = self._centroids[best] + embedding
+        self._counts[best] += 1
+        return best + 1
+
+    def cached_label(self, start: float, end: float) -> Optional[int]:
+        """캐시에 있는 구간이면 인물 번호 (임베딩 계산 없음, 없으면 None)"""
+        if end - start < MIN_EMBED_SECONDS:
+            return None
+        with self._lock:
+            label = self._cached_label(start, end)
+            if label is not None:
+                self.cache_hits += 1
+            return label
+
+    def label_for(self, start: float, end: float) -> Optional[int]:
+        """발화 구간(에셋 시각) → 인물 번호 (짧아서 판단할 수 없으면 None, 캐시에 없으면 임베딩 계산)"""
+        if end - start < MIN_EMBED_SECONDS:
+            return None
+        with self._lock:
+            label = self._cached_label(start, end)
+            if label is not None:
+                self.cache_hits += 1
+                return label
+        try:
+            samples = self._read_span(start, end)
+            embedding = self.embedder.embed(samples) if samples is not None else None
+        except Exception as e:
+            logger.warning(f"⚠️ 임베딩 실패 ({start:.1f}~{end:.1f}초): {e}")
+            return None
+        if embedding is None:
+            return None
+        with self._lock:
+            label = self._assign(embedding)
+            i = bisect_right(self._starts, start)
+            self._starts.insert(i, start)
+            self._ends.insert(i, end)
+            self._labels.insert(i, label)
+            self._max_span = max(self._max_span, end - start)
+            self.embedded += 1
+            self.dirty = True
+        return label
+
+    def metrics(self) -> Dict:
+        return {
+            "embedder": self.embedder.name,
+            "speakers": len(self._centroids),
+            "spans": len(self._labels),
+            "cache_hits": self.cache_hits,
+            "embedded": self.embedded,
+        }
+
+
+# 프로세스 안에서 같은 에셋의 세션들이 공유: {캐시 경로: AssetSpeakers}
+_assets: Dict[str, AssetSpeakers] = {}
+_assets_lock = threading.Lock()
+
+
+def load_asset_speakers(wav_path: str) -> Optional[AssetSpeakers]:
+    """에셋의 화자 군집 (디스크 캐시가 있으면 로드, 실패하면 None)"""
+    try:
+        embedder = default_embedder()
+        cache_path = speaker_cache_path(wav_path, file_content_hash(wav_path), embedder.name)
+        with _assets_lock:
+            speakers = _assets.get(cache_path)
+            if speakers is None:
+                speakers = AssetSpeakers(wav_path, cache_path, embedder)
+                speakers.load()
+                _assets[cache_path] = speakers
+        return speakers
+    except Exception as e:
+        logger.warning(f"⚠️ 화자 군집 로드 실패 ({wav_path}): {e}")
+        return None
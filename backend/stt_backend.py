@@ -0,0 +1,321 @@
+"""
+실시간 STT 백엔드 (자막 파이프라인과 STT 제공자 분리)
+- SttBackend.open() → 스트림 연결 1개 (SttBackendConnection). 연결이 제공하는 것:
+    • async send(chunk, t) : 16kHz mono 16-bit PCM 청크 전송 (t: 청크의 에셋 시각, 백엔드에 따라 무시)
+    • async finalize()     : 지금까지 보낸 오디오의 결과 확정 요청 (마지막 결과는 from_finalize=True)
+    • async keep_alive()   : 오디오 없이 연결 유지
+    • async close()        : 연결 종료 (여러 번 호출해도 됨, results() 가 끝남)
+    • results()            : 결과 메시지 async iterator (Deepgram Results / UtteranceEnd 와 같은 형식)
+    • closed               : 닫힌 연결이면 True (send / finalize / keep_alive 는 예외 → SttStream 이 재연결)
+- DeepgramBackend : Deepgram 실시간 API (연결 풀 사용 가능)
+- ReplayBackend   : 녹화해 둔 전사 JSON(<wav>.transcript.json)을 보낸 오디오 위치에 맞춰 재생
+                    → 네트워크 없이 같은 입력으로 전체 파이프라인 성능 측정 / 부하 테스트 가능
+- CpuBackend      : 로컬 CPU 모델(local_stt)로 보낸 오디오를 구간 단위로 전사 (인터넷 없는 환경)
+- 재생 백엔드로 세션 파이프라인 전체 점검: python stt_replay_check.py
+"""
+import abc
+import logging
+import json
+import asyncio
+from types import SimpleNamespace
+from typing import AsyncIterator, Dict, List, Optional
+
+from offline_analyzer import transcript_sidecar_path
+from local_stt import LocalSttPool
+from stt_pool import SttConnection, SttConnectionPool, open_connection
+
+logger = logging.getLogger(__name__)
+
+# 로컬 CPU 백엔드: finalize 없이 오디오가 이만큼 쌓이면 구간을 잘라 전사 (초)
+CPU_SEGMENT_SECONDS = 10.0
+# 재생 백엔드: 발화가 끝난 오디오를 보낸 뒤 결과가 나오기까지 지연 (초, 실제 STT 의 endpointing 지연 흉내)
+REPLAY_LATENCY = 0.3
+SAMPLE_RATE = 16000
+
+
+class SttBackendConnection(abc.ABC):
+    """STT 백엔드 연결 1개의 인터페이스 (SttStream 이 사용하는 계약, 모듈 설명 참고)"""
+    closed: bool = False
+
+    @abc.abstractmethod
+    async def send(self, chunk: bytes, t: Optional[float] = None):
+        """PCM 청크 전송 (닫힌 연결이면 예외)"""
+
+    @abc.abstractmethod
+    async def finalize(self):
+        """보낸 오디오의 결과 확정 요청 (마지막 결과는 from_finalize=True)"""
+
+    @abc.abstractmethod
+    async def keep_alive(self):
+        """오디오 없이 연결 유지 (닫힌 연결이면 예외)"""
+
+    @abc.abstractmethod
+    async def close(self):
+        """연결 종료 (results() 가 끝남, 여러 번 호출해도 됨)"""
+
+    @abc.abstractmethod
+    def results(self) -> AsyncIterator:
+        """결과 메시지 async iterator (연결이 닫히면 끝남)"""
+
+
+# Deepgram 연결(stt_pool)은 stt_pool 이 이 모듈을 import 하지 않도록 가상 하위 클래스로 등록
+SttBackendConnection.register(SttConnection)
+
+
+class SttBackend(abc.ABC):
+    """실시간 STT 백엔드 인터페이스"""
+    name = "base"
+
+    @abc.abstractmethod
+    async def open(self) -> SttBackendConnection:
+        """새 스트림 연결 (실패하면 예외)"""
+
+
+class DeepgramBackend(SttBackend):
+    """Deepgram 실시간 API (pool 이 있으면 미리 열어 둔 연결 사용)"""
+    name = "deepgram"
+
+    def __init__(self, connect, options: Dict, pool: Optional[SttConnectionPool] = None):
+        self.connect = connect
+        self.options = options
+        self.pool = pool
+
+    async def open(self) -> SttBackendConnection:
+        if self.pool is not None:
+            return await self.pool.acquire(self.options)
+        return await open_connection(self.connect, self.options)
+
+
+def _result_message(words: List[Dict], speech_final: bool = True, from_finalize: bool = False):
+    """단어 목록 → Deepgram Results 메시지와 같은 모양의 객체"""
+    word_objs = [
+        SimpleNamespace(
+            word=w["word"], punctuated_word=w["word"], start=w["start"], end=w["end"], speaker=w.get("speaker")
+        )
+        for w in words
+    ]
+    alternative = SimpleNamespace(transcript=" ".join(w["word"] for w in words), words=word_objs)
+    return SimpleNamespace(
+        type="Results",
+        is_final=True,
+        speech_final=speech_final,
+        from_finalize=from_finalize,
+        channel=SimpleNamespace(alternatives=[alternative]),
+    )
+
+
+def _utterance_words(u: Dict) -> List[Dict]:
+    """발화의 단어별 시각 (words 가 없으면 발화 구간을 글자 수 비율로 나눔)"""
+    if u.get("words"):
+        return [
+            {"word": w["word"], "start": float(w["start"]), "end": float(w["end"]), "speaker": w.get("speaker", u.get("speaker"))}
+            for w in u["words"]
+        ]
+    tokens = u.get("text", "").split()
+    if not tokens:
+        return []
+    start, end = float(u["start"]), float(u["end"])
+    total = sum(len(t) for t in tokens)
+    words, t = [], start
+    for token in tokens:
+        span = (end - start) * len(token) / total
+        words.append({"word": token, "start": t, "end": t + span, "speaker": u.get("speaker")})
+        t += span
+    return words
+
+
+class ReplayConnection(SttBackendConnection):
+    """재생 백엔드의 연결 1개
+
+    보낸 오디오의 에셋 시각(t)으로 녹화된 발화를 찾고, 발화 끝까지 오디오를 보낸 뒤 latency 초 후에
+    결과를 내보낸다. 타임스탬프는 실제 STT 처럼 "이 연결로 보낸 오디오 누적 시간" 기준으로 변환한다.
+    """
+
+    def __init__(self, words_by_utterance: List[List[Dict]], latency: float):
+        self._pending = [w for w in words_by_utterance if w]  # 발화 끝 시각 순
+        self.latency = latency
+        self.closed = False
+        self._results: asyncio.Queue = asyncio.Queue()
+        self._sent_seconds = 0.0
+        self._runs: List[List[float]] = []  # 연속으로 보낸 구간 [에셋 시작, 에셋 끝, 스트림 시작]
+        self._timers: List[asyncio.TimerHandle] = []
+
+    def _to_stream_time(self, t: float) -> Optional[float]:
+        for asset_start, asset_end, stream_start in reversed(self._runs):
+            if asset_start - 1e-6 <= t <= asset_end + 1e-6:
+                return stream_start + (t - asset_start)
+        return None
+
+    def _emit(self, words: List[Dict], from_finalize: bool = False):
+        """보낸 오디오 안에 있는 단어만 스트림 시각으로 바꿔 결과로 내보냄"""
+        stream_words = []
+        for w in words:
+            start, end = self._to_stream_time(w["start"]), self._to_stream_time(w["end"])
+            if start is None or end is None:
+                continue
+            stream_words.append({**w, "start": start, "end": end})
+        if stream_words or from_finalize:
+            self._results.put_nowait(_result_message(stream_words, from_finalize=from_finalize))
+
+    def _schedule(self, words: List[Dict]):
+        loop = asyncio.get_event_loop()
+        self._timers.append(loop.call_later(self.latency, self._emit, words))
+
+    async def send(self, chunk: bytes, t: Optional[float] = None):
+        if self.closed:
+            raise ConnectionError("replay connection closed")
+        duration = len(chunk) / 2 / SAMPLE_RATE
+        t = self._sent_seconds if t is None else t
+        if self._runs and abs(self._runs[-1][1] - t) < 1e-3:
+            self._runs[-1][1] = t + duration
+        else:
+            self._runs.append([t, t + duration, self._sent_seconds])
+        self._sent_seconds += duration
+
+        # 발화 끝까지 오디오를 보낸 발화는 결과 예약
+        remaining = []
+        for words in self._pending:
+            if t <= words[-1]["end"] <= t + duration:
+                self._schedule(words)
+            elif words[-1]["end"] >= t + duration:
+                remaining.append(words)
+            # 이미 지나간 발화(seek 등으로 건너뜀)는 버림
+        self._pending = remaining
+
+    async def finalize(self):
+        """보낸 오디오에 걸쳐 있는 발화를 확정하고 from_finalize 결과로 알림"""
+        if not self._runs:
+            self._results.put_nowait(_result_message([], from_finalize=True))
+            return
+        sent_end = self._runs[-1][1]
+        partial = [words for words in self._pending if words[0]["start"] < sent_end]
+        self._pending = [words for words in self._pending if words[0]["start"] >= sent_end]
+        loop = asyncio.get_event_loop()
+        for words in partial:
+            self._timers.append(loop.call_later(self.latency, self._emit, [w for w in words if w["end"] <= sent_end]))
+        self._timers.append(loop.call_later(self.latency, self._emit, [], True))
+
+    async def keep_alive(self):
+        if self.closed:
+            raise ConnectionError("replay connection closed")
+
+    async def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        for timer in self._timers:
+            timer.cancel()
+        self._results.put_nowait(None)
+
+    async def results(self):
+        while True:
+            message = await self._results.get()
+            if message is None:
+                return
+            yield message
+
+
+class ReplayBackend(SttBackend):
+    """녹화된 전사 결과 재생 (네트워크 없음, 같은 입력이면 항상 같은 결과)
+
+    전사 형식: [{"text": "...", "start": 0.0, "end": 1.2, "speaker": 0,
+                 "words": [{"word": "...", "start": 0.0, "end": 0.4}, ...]}, ...]  (words 는 선택)
+    """
+    name = "replay"
+
+    def __init__(self, utterances: List[Dict], latency: float = REPLAY_LATENCY):
+        ordered = sorted(utterances, key=lambda u: float(u["end"]))
+        self.words_by_utterance = [_utterance_words(u) for u in ordered]
+        self.latency = latency
+
+    @classmethod
+    def from_sidecar(cls, audio_path: str, latency: float = REPLAY_LATENCY) -> "ReplayBackend":
+        with open(transcript_sidecar_path(audio_path), 'r', encoding='utf-8') as f:
+            return cls(json.load(f), latency=latency)
+
+    async def open(self) -> SttBackendConnection:
+        return ReplayConnection(self.words_by_utterance, self.latency)
+
+
+class CpuConnection(SttBackendConnection):
+    """로컬 CPU 백엔드의 연결 1개
+
+    보낸 오디오를 모아 두었다가 finalize (음성 게이트가 닫힐 때 / 파일 끝) 또는 CPU_SEGMENT_SECONDS 마다
+    구간을 잘라 워커 프로세스에서 전사한다. 결과는 보낸 순서대로, 타임스탬프는 스트림 시각으로 내보낸다.
+    """
+
+    def __init__(self, pool: LocalSttPool, segment_seconds: float):
+        self.pool = pool
+        self.segment_seconds = segment_seconds
+        self.closed = False
+        self._results: asyncio.Queue = asyncio.Queue()
+        self._segments: asyncio.Queue = asyncio.Queue()  # 전사할 구간 [(스트림 시작 시각, PCM, from_finalize)]
+        self._buffer = bytearray()
+        self._buffer_start = 0.0
+        self._sent_seconds = 0.0
+        self._worker = asyncio.ensure_future(self._transcribe_segments())
+
+    def _cut(self, from_finalize: bool):
+        self._segments.put_nowait((self._buffer_start, bytes(self._buffer), from_finalize))
+        self._buffer.clear()
+        self._buffer_start = self._sent_seconds
+
+    async def _transcribe_segments(self):
+        while True:
+            start, pcm, from_finalize = await self._segments.get()
+            words = []
+            if pcm:
+                try:
+                    utterances = await self.pool.transcribe_pcm(pcm)
+                except Exception as e:
+                    logger.warning(f"⚠️ 구간 전사 실패 ({start:.1f}초~): {e}")
+                    utterances = []
+                words = [
+                    {**w, "start": start + w["start"], "end": start + w["end"]}
+                    for u in utterances for w in _utterance_words(u)
+                ]
+            if words or from_finalize:
+                self._results.put_nowait(_result_message(words, from_finalize=from_finalize))
+
+    async def send(self, chunk: bytes, t: Optional[float] = None):
+        if self.closed:
+            raise ConnectionError("cpu connection closed")
+        self._buffer += chunk
+        self._sent_seconds += len(chunk) / 2 / SAMPLE_RATE
+        if len(self._buffer) / 2 / SAMPLE_RATE >= self.segment_seconds:
+            self._cut(from_finalize=False)
+
+    async def finalize(self):
+        if self.closed:
+            raise ConnectionError("cpu connection closed")
+        self._cut(from_finalize=True)
+
+    async def keep_alive(self):
+        if self.closed:
+            raise ConnectionError("cpu connection closed")
+
+    async def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self._worker.cancel()
+        self._results.put_nowait(None)
+
+    async def results(self):
+        while True:
+            message = await self._results.get()
+            if message is None:
+                return
+            yield message
+
+
+class CpuBackend(SttBackend):
+    """로컬 CPU STT (faster-whisper / Vosk 워커 프로세스 풀 공유)"""
+    name = "cpu"
+
+    def __init__(self, pool: LocalSttPool, segment_seconds: float = CPU_SEGMENT_SECONDS):
+        self.pool = pool
+        self.segment_seconds = segment_seconds
+
+    async def open(self) -> SttBackendConnection:
+        return CpuConnection(self.pool, self.segment_seconds)
@@ -0,0 +1,240 @@
+"""
+Deepgram 실시간 STT 연결 풀 (미리 열어 둔 연결을 세션에 바로 넘겨줌)
+- 세션 시작/seek 때마다 TLS + WebSocket 핸드셰이크(최대 15초)를 기다리지 않도록
+  같은 연결 옵션의 연결을 STT_POOL_SIZE 개씩 미리 열어 둔다
+- 대기 중인 연결은 KeepAlive 로 유지, STT_POOL_MAX_IDLE 초가 지나면 닫고 새로 연다
+- 세션이 가져가면 백그라운드에서 다시 채움 (연결 1개는 세션 1개만 사용, CloseStream 후 재사용 불가)
+- connect 함수(deepgram_client.listen.v1.connect 등)를 주입받으므로
+  가짜 STT WebSocket 서버(fake_stt_server.py)에 붙인 클라이언트(DEEPGRAM_WS_URL)로도 그대로 테스트 가능
+  (warm / acquire / keepalive / 다시 채움 / 서버가 끊은 연결 점검: python stt_pool_check.py)
+- SttConnection 은 stt_backend.SttBackendConnection 계약(send / finalize / keep_alive / close / results / closed)을 따름
+"""
+import logging
+import time
+import asyncio
+from collections import deque
+from typing import Callable, Deque, Dict, Optional, Tuple
+
+from deepgram.core.events import EventType
+
+logger = logging.getLogger(__name__)
+
+try:
+    from deepgram.extensions.types.sockets import ListenV1ControlMessage
+except ImportError:
+    ListenV1ControlMessage = None
+
+# 옵션별로 미리 열어 둘 연결 수
+STT_POOL_SIZE = 1
+# 대기 연결 KeepAlive 간격 (초, Deepgram 은 10초간 오디오가 없으면 연결 종료)
+STT_POOL_KEEPALIVE_INTERVAL = 5.0
+# 대기 연결 최대 유지 시간 (초, 지나면 새 연결로 교체)
+STT_POOL_MAX_IDLE = 300.0
+# 연결 수립 대기 시간 (초)
+STT_OPEN_TIMEOUT = 15.0
+# 연결 실패 시 다시 채우기까지 대기 (초)
+STT_POOL_RETRY_DELAY = 10.0
+
+OptionsKey = Tuple
+
+
+def options_key(options: Dict) -> OptionsKey:
+    return tuple(sorted((k, str(v)) for k, v in options.items()))
+
+
+async def send_control(connection, msg_type: str):
+    """Deepgram 제어 메시지 전송 (KeepAlive / Finalize / CloseStream)"""
+    if ListenV1ControlMessage is not None and hasattr(connection, "send_control"):
+        await connection.send_control(ListenV1ControlMessage(type=msg_type))
+        return
+    method = {"KeepAlive": "send_keep_alive", "Finalize": "send_finalize", "CloseStream": "send_close_stream"}[msg_type]
+    await getattr(connection, method)()
+
+
+class SttConnection:
+    """열려 있는 Deepgram 연결 1개 (수신 메시지는 results() 로 꺼냄)"""
+
+    def __init__(self, context, connection, key: OptionsKey):
+        self._context = context  # connect() 가 돌려준 async context manager
+        self.connection = connection
+        self.key = key
+        self.opened_at = time.monotonic()
+        self.closed = False
+        self._results: asyncio.Queue = asyncio.Queue()  # 수신 메시지 (None = 연결 종료)
+        self._listen_task: Optional[asyncio.Task] = None
+
+    def _dispatch(self, message):
+        self._results.put_nowait(message)
+
+    def _mark_closed(self, *_):
+        if not self.closed:
+            self.closed = True
+            self._results.put_nowait(None)
+
+    async def results(self):
+        """수신 메시지 (Results / UtteranceEnd ...) - 연결이 닫히면 끝남"""
+        while True:
+            message = await self._results.get()
+            if message is None:
+                return
+            yield message
+
+    @property
+    def idle_seconds(self) -> float:
+        return time.monotonic() - self.opened_at
+
+    async def send(self, chunk: bytes, t: Optional[float] = None):
+        await self.connection.send_media(chunk)
+
+    async def finalize(self):
+        await send_control(self.connection, "Finalize")
+
+    async def keep_alive(self):
+        await send_control(self.connection, "KeepAlive")
+
+    async def close(self):
+        """정상 종료 요청 (CloseStream) 후 연결 정리"""
+        if not self.closed:
+            try:
+                await send_control(self.connection, "CloseStream")
+            except Exception:
+                pass
+        self._mark_closed()
+        if self._listen_task is not None:
+            self._listen_task.cancel()
+        try:
+            await self._context.__aexit__(None, None, None)
+        except Exception:
+            pass
+
+
+async def open_connection(connect: Callable, options: Dict, timeout: float = STT_OPEN_TIMEOUT) -> SttConnection:
+    """새 STT 연결을 열고 OPEN 이벤트까지 대기"""
+    context = connect(**options)
+    connection = await context.__aenter__()
+    stt = SttConnection(context, connection, options_key(options))
+    opened = asyncio.Event()
+    connection.on(EventType.OPEN, lambda _: opened.set())
+    connection.on(EventType.MESSAGE, stt._dispatch)
+    connection.on(EventType.CLOSE, stt._mark_closed)
+    connection.on(EventType.ERROR, stt._mark_closed)
+    stt._listen_task = asyncio.ensure_future(connection.start_listening())
+    try:
+        await asyncio.wait_for(opened.wait(), timeout=timeout)
+    except BaseException:
+        await stt.close()
+        raise
+    return stt
+
+
+class SttConnectionPool:
+    """옵션별 대기 연결 풀 (warm() 으로 등록한 옵션만 미리 채움)"""
+
+    def __init__(
+        self,
+        connect: Callable,
+        size: int = STT_POOL_SIZE,
+        keepalive_interval: float = STT_POOL_KEEPALIVE_INTERVAL,
+        max_idle: float = STT_POOL_MAX_IDLE,
+    ):
+        self.connect = connect
+        self.size = size
+        self.keepalive_interval = keepalive_interval
+        self.max_idle = max_idle
+        self._options: Dict[OptionsKey, Dict] = {}
+        self._idle: Dict[OptionsKey, Deque[SttConnection]] = {}
+        self._filling: Dict[OptionsKey, asyncio.Task] = {}
+        self._maintain_task: Optional[asyncio.Task] = None
+
+        # 메트릭
+        self.hits = 0     # 미리 열어 둔 연결을 바로 사용
+        self.misses = 0   # 대기 연결이 없어 새로 연결
+        self.opened = 0
+        self.failures = 0
+
+    def start(self):
+        if self._maintain_task is None:
+            self._maintain_task = asyncio.ensure_future(self._maintain())
+
+    def warm(self, options: Dict):
+        """이 옵션의 연결을 size 개 유지하도록 등록 (백그라운드에서 채움)"""
+        key = options_key(options)
+        self._options[key] = dict(options)
+        self._idle.setdefault(key, deque())
+        self._schedule_fill(key)
+
+    async def acquire(self, options: Dict) -> SttConnection:
+        """옵션이 같은 대기 연결을 꺼내고 (없으면 새로 연결) 풀을 다시 채움"""
+        key = options_key(options)
+        idle = self._idle.get(key)
+        stt = None
+        while idle:
+            candidate = idle.popleft()
+            if not candidate.closed:
+                stt = candidate
+                break
+            await candidate.close()
+        if key in self._options:
+            self._schedule_fill(key)
+        if stt is not None:
+            self.hits += 1
+            return stt
+        self.misses += 1
+        stt = await open_connection(self.connect, options)
+        self.opened += 1
+        return stt
+
+    def _schedule_fill(self, key: OptionsKey):
+        task = self._filling.get(key)
+        if task is None or task.done():
+            self._filling[key] = asyncio.ensure_future(self._fill(key))
+
+    async def _fill(self, key: OptionsKey):
+        idle = self._idle.setdefault(key, deque())
+        while len(idle) < self.size and key in self._options:
+            try:
+                stt = await open_connection(self.connect, self._options[key])
+            except Exception as e:
+                self.failures += 1
+                logger.warning(f"⚠️ 대기 연결 생성 실패: {e} ({STT_POOL_RETRY_DELAY:.0f}초 후 재시도)")
+                await asyncio.sleep(STT_POOL_RETRY_DELAY)
+                continue
+            self.opened += 1
+            idle.append(stt)
+
+    async def _maintain(self):
+        """대기 연결 KeepAlive + 끊기거나 오래된 연결 교체"""
+        while True:
+            await asyncio.sleep(self.keepalive_interval)
+            for key, idle in list(self._idle.items()):
+                for stt in list(idle):
+                    if stt.closed or stt.idle_seconds > self.max_idle:
+                        idle.remove(stt)
+                        await stt.close()
+                        continue
+                    try:
+                        await stt.keep_alive()
+                    except Exception:
+                        idle.remove(stt)
+                        await stt.close()
+                if key in self._options and len(idle) < self.size:
+                    self._schedule_fill(key)
+
+    async def close(self):
+        for task in [self._maintain_task, *self._filling.values()]:
+            if task is not None:
+                task.cancel()
+        self._maintain_task = None
+        self._options.clear()
+        for idle in self._idle.values():
+            while idle:
+                await idle.popleft().close()
+
+    def metrics(self) -> Dict:
+        return {
+            "idle": sum(len(idle) for idle in self._idle.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "opened": self.opened,
+            "failures": self.failures,
+        }
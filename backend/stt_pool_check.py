@@ -0,0 +1,117 @@
+"""
+STT 연결 풀 점검 (가짜 STT 서버 + 실제 Deepgram SDK 클라이언트, 네트워크/API 키 불필요)
+    python stt_pool_check.py
+- warm      : 대기 연결이 미리 열림
+- keepalive : 서버 idle timeout 보다 오래 기다려도 KeepAlive 로 대기 연결 유지
+- acquire   : 대기 연결을 바로 받음(hit) + 백그라운드에서 다시 채움
+- 사용      : 오디오 전송 → Results, Finalize → from_finalize 결과, CloseStream 으로 정상 종료
+- 서버가 끊은 연결 : 대기 연결은 버리고 새로 채움 / 사용 중인 연결은 results() 가 끝남
+"""
+import asyncio
+
+from deepgram import AsyncDeepgramClient
+from deepgram.environment import DeepgramClientEnvironment
+
+from fake_stt_server import FakeSttServer
+from stt_pool import SttConnectionPool
+
+OPTIONS = dict(model="nova-2", language="ko-KR", encoding="linear16", sample_rate="16000")
+KEEPALIVE_INTERVAL = 0.2
+SERVER_IDLE_TIMEOUT = 1.0
+CHUNK = b"\x00\x00" * 1600  # 0.1초
+
+
+async def _wait_for(condition, timeout: float = 5.0, what: str = ""):
+    deadline = asyncio.get_event_loop().time() + timeout
+    while not condition():
+        if asyncio.get_event_loop().time() > deadline:
+            raise AssertionError(f"시간 초과: {what}")
+        await asyncio.sleep(0.02)
+
+
+def _open_idle(pool: SttConnectionPool) -> int:
+    """대기 연결 중 아직 열려 있는 것 (metrics 의 idle 은 끊긴 뒤 정리 전인 연결도 셈)"""
+    return sum(not stt.closed for idle in pool._idle.values() for stt in idle)
+
+
+async def _next_result(stt, timeout: float = 5.0):
+    return await asyncio.wait_for(stt.results().__anext__(), timeout=timeout)
+
+
+async def check_pool():
+    server = FakeSttServer(utterance_seconds=1.0, idle_timeout=SERVER_IDLE_TIMEOUT)
+    await server.start()
+    client = AsyncDeepgramClient(
+        api_key="test",
+        environment=DeepgramClientEnvironment(base="http://127.0.0.1", production=server.url, agent=server.url),
+    )
+    pool = SttConnectionPool(client.listen.v1.connect, size=1, keepalive_interval=KEEPALIVE_INTERVAL)
+    pool.start()
+    try:
+        # warm
+        pool.warm(OPTIONS)
+        await _wait_for(lambda: pool.metrics()["idle"] == 1, what="warm")
+        assert server.open_connections == 1
+        print(f"✅ warm: {pool.metrics()}")
+
+        # keepalive: 서버 idle timeout 의 2배 동안 대기해도 끊기지 않음
+        await asyncio.sleep(SERVER_IDLE_TIMEOUT * 2)
+        assert server.idle_closes == 0 and server.keepalives >= 2, server.metrics()
+        assert pool.metrics()["idle"] == 1 and server.opened == 1
+        print(f"✅ keepalive: 서버 {server.metrics()}")
+
+        # acquire (hit) + 다시 채움
+        stt = await pool.acquire(OPTIONS)
+        assert not stt.closed and pool.hits == 1 and pool.misses == 0
+        await _wait_for(lambda: pool.metrics()["idle"] == 1 and server.open_connections == 2, what="refill")
+        print(f"✅ acquire: {pool.metrics()}")
+
+        # 사용: 1초 오디오 → Results, Finalize → from_finalize
+        for _ in range(12):
+            await stt.send(CHUNK)
+        result = await _next_result(stt)
+        assert result.type == "Results" and result.channel.alternatives[0].words, result
+        await stt.finalize()
+        result = await _next_result(stt)
+        assert result.from_finalize, result
+        await stt.close()
+        await _wait_for(lambda: server.close_streams == 1, what="CloseStream")
+        print(f"✅ 사용/종료: 서버 {server.metrics()}")
+
+        # 서버가 끊은 연결 (사용 중): results() 가 끝남
+        stt = await pool.acquire(OPTIONS)
+        await _wait_for(lambda: pool.metrics()["idle"] == 1 and server.open_connections == 2, what="refill")
+        await server.drop_connections()
+        results = [m async for m in stt.results()]
+        assert stt.closed and results == [], results
+        print("✅ 사용 중 연결 끊김: results() 종료")
+
+        # 서버가 끊은 연결 (대기 중): 끊긴 연결은 버리고 maintain 이 다시 채움
+        await _wait_for(lambda: _open_idle(pool) == 1, what="refill after drop")
+        hits, misses = pool.hits, pool.misses
+        stt = await pool.acquire(OPTIONS)
+        assert not stt.closed and pool.hits == hits + 1 and pool.misses == misses, pool.metrics()
+        for _ in range(12):
+            await stt.send(CHUNK)
+        assert (await _next_result(stt)).type == "Results"
+        await stt.close()
+        print(f"✅ 대기 연결 끊김 후 다시 채움: {pool.metrics()}")
+
+        # 끊긴 직후 (다시 채우기 전) acquire: 끊긴 대기 연결은 건너뛰고 새로 연결 (miss)
+        await _wait_for(lambda: _open_idle(pool) == 1, what="refill")
+        await server.drop_connections()
+        await _wait_for(lambda: _open_idle(pool) == 0, what="drop")
+        misses = pool.misses
+        stt = await pool.acquire(OPTIONS)
+        assert not stt.closed and pool.misses == misses + 1
+        await stt.keep_alive()
+        await stt.close()
+        print(f"✅ 끊긴 대기 연결 건너뜀: {pool.metrics()}")
+    finally:
+        await pool.close()
+        await server.stop()
+    print(f"✅ STT 연결 풀 점검 완료 (서버 {server.metrics()})")
+
+
+if __name__ == "__main__":
+    asyncio.run(check_pool())
@@ -0,0 +1,170 @@
+"""
+재생 백엔드(ReplayBackend)로 세션 파이프라인 점검 (네트워크/API 키/모델 불필요)
+    python stt_replay_check.py
+- 합성 오디오(발화 구간에만 음성 대역 톤) → 음성 게이트 → SttStream(ReplayBackend)
+  → 자막 파이프라인(CaptionPipeline) → 공유 세션(AnalysisSession) → 시청자 송신 대기열
+- 확인: 발화마다 final 자막 1개, 텍스트 일치, 에셋 시각(start/end)이 전사와 TIME_TOLERANCE 이내,
+  순서 유지, 게이트가 건너뛴 구간이 있어도 시각이 밀리지 않음, 파일 끝 Finalize 로 마지막 발화 확정,
+  seek 하면 건너뛴 구간의 자막은 나오지 않음
+"""
+import asyncio
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from analysis_hub import AnalysisSession, Subscriber
+from caption_pipeline import CaptionPipeline
+from stt_backend import REPLAY_LATENCY, ReplayBackend, SttBackendConnection, _utterance_words
+from stt_stream import SttStream
+from voice_gate import VoiceActivityGate
+
+SAMPLE_RATE = 16000
+CHUNK_FRAMES = 512
+# 실시간보다 이만큼 빠르게 오디오 전송 (재생 백엔드 지연도 같은 비율로 줄임)
+PLAYBACK_SPEED = 10.0
+# 자막 시각 허용 오차 (초)
+TIME_TOLERANCE = 0.02
+# 녹화된 전사 (마지막 발화는 오디오 끝을 넘어감 → Finalize 로 오디오 안의 단어만 확정)
+UTTERANCES = [
+    {"text": "안녕하세요 반갑습니다", "start": 0.5, "end": 1.7, "speaker": 0},
+    {"text": "오늘 날씨가 정말 좋네요", "start": 3.0, "end": 4.4, "speaker": 1},
+    {"text": "네 그래요", "start": 6.2, "end": 7.0, "speaker": 0},
+    {"text": "마지막 문장입니다 끝", "start": 8.6, "end": 10.2, "speaker": 1},
+]
+DURATION = 9.8
+
+
+def _synth_audio(utterances: List[Dict], duration: float) -> bytes:
+    """발화 구간에만 음성 대역 톤, 나머지는 아주 작은 잡음"""
+    rng = np.random.default_rng(0)
+    t = np.arange(int(duration * SAMPLE_RATE)) / SAMPLE_RATE
+    x = rng.normal(0.0, 1e-4, t.size)
+    for u in utterances:
+        mask = (t >= u["start"]) & (t < u["end"])
+        x[mask] += 0.1 * np.sin(2 * np.pi * 440.0 * t[mask]) + 0.05 * np.sin(2 * np.pi * 1200.0 * t[mask])
+    return (np.clip(x, -1.0, 1.0) * 32767).astype(np.int16).tobytes()
+
+
+class _CollectingSender:
+    """시청자 송신 대기열 대신 받은 메시지를 모음"""
+    closed = False
+    max_queue = 200
+    depth = 0
+
+    def __init__(self):
+        self.messages: List[Dict] = []
+
+    def send(self, message: Dict) -> bool:
+        self.messages.append(message)
+        return True
+
+
+async def _neutral_emotion(text: str) -> Optional[Dict]:
+    return {"emotion": "중립", "emotion_icon": "😐", "color": "#FFFFFF"}
+
+
+async def run_replay(seek: Optional[tuple] = None) -> List[Dict]:
+    """합성 오디오를 재생 백엔드로 흘려 시청자가 받은 final 자막 목록을 돌려줌
+
+    seek=(t_from, t_to): 에셋 시각 t_from 까지 보낸 뒤 t_to 로 이동
+    """
+    backend = ReplayBackend(UTTERANCES, latency=REPLAY_LATENCY / PLAYBACK_SPEED)
+    session = AnalysisSession(("replay_check", "test"))
+    sender = _CollectingSender()
+    await session.subscribe(Subscriber(sender))
+    gate = VoiceActivityGate()
+
+    async def send_caption(item: Dict, styling: Optional[Dict]):
+        session.publish({"type": "final", "caption_id": item["caption_id"], "text": item["text"],
+                         "start": item["start"], "end": item["end"], **(styling or {})})
+
+    async def send_patch(item: Dict, styling: Dict):
+        session.publish({"type": "patch", "caption_id": item["caption_id"], **styling})
+
+    async def send_raw(message: Dict):
+        session.publish(message)
+
+    pipeline = CaptionPipeline(_neutral_emotion, send_caption, send_patch, send_raw)
+    pipeline.start()
+    finalized = asyncio.Event()
+    caption_id = 0
+
+    def on_message(message):
+        nonlocal caption_id
+        words = message.channel.alternatives[0].words
+        if words and stream.is_before_seek(float(words[-1].end)):
+            return
+        words = stream.fresh_words(words)
+        if words:
+            start, end = stream.to_asset_time(float(words[0].start)), stream.to_asset_time(float(words[-1].end))
+            stream.mark_final(end)
+            caption_id += 1
+            pipeline.submit({"caption_id": caption_id, "text": " ".join(w.word for w in words),
+                             "start": start, "end": end})
+        if getattr(message, "from_finalize", False):
+            finalized.set()
+
+    stream = SttStream(backend, on_message)
+    async with stream:
+        assert isinstance(stream.connection, SttBackendConnection)
+        audio = _synth_audio(UTTERANCES, DURATION)
+        step = CHUNK_FRAMES * 2
+        pos = 0
+        loop = asyncio.get_event_loop()
+        started, streamed = loop.time(), 0.0  # 페이싱 기준 (벽시계 시작 시각, 보낸 오디오 길이)
+        while pos < len(audio):
+            t = pos / 2 / SAMPLE_RATE
+            if seek is not None and t >= seek[0]:
+                pos = int(seek[1] * SAMPLE_RATE) * 2
+                stream.mark_seek()
+                gate.reset()
+                seek = None
+                continue
+            for send_t, chunk in gate.process(audio[pos:pos + step], t):
+                await stream.send_media(chunk, send_t)
+            pos += step
+            streamed += CHUNK_FRAMES / SAMPLE_RATE
+            await asyncio.sleep(max(0.0, started + streamed / PLAYBACK_SPEED - loop.time()))
+        await stream.finalize()
+        await asyncio.wait_for(finalized.wait(), timeout=5.0)
+        await pipeline.close(timeout=5.0)
+
+    assert gate.saved_fraction > 0.1, gate.metrics()  # 발화 사이 무음 일부는 보내지 않음 (hangover / pre-roll 제외)
+    return [m for m in sender.messages if m.get("type") == "final"]
+
+
+def _expected(utterances: List[Dict], sent_end: float) -> List[Dict]:
+    """전사 → 기대 자막 (ReplayBackend 와 같은 규칙으로 단어 시각을 나누고, 보낸 오디오 안의 단어만)"""
+    out = []
+    for u in utterances:
+        words = [w for w in _utterance_words(u) if w["end"] <= sent_end + 1e-6]
+        if words:
+            out.append({"text": " ".join(w["word"] for w in words), "start": words[0]["start"], "end": words[-1]["end"]})
+    return out
+
+
+def _check(captions: List[Dict], expected: List[Dict]):
+    assert len(captions) == len(expected), (captions, expected)
+    for got, want in zip(captions, expected):
+        assert got["text"] == want["text"], (got, want)
+        assert abs(got["start"] - want["start"]) <= TIME_TOLERANCE, (got, want)
+        assert abs(got["end"] - want["end"]) <= TIME_TOLERANCE, (got, want)
+        assert got["emotion"] == "중립"
+    assert [c["caption_id"] for c in captions] == sorted(c["caption_id"] for c in captions)
+
+
+async def main():
+    captions = await run_replay()
+    _check(captions, _expected(UTTERANCES, DURATION))
+    for c in captions:
+        print(f"  [{c['start']:5.2f} ~ {c['end']:5.2f}] {c['text']}")
+    print(f"✅ 재생 백엔드 파이프라인: 자막 {len(captions)}개, 시각 오차 {TIME_TOLERANCE}초 이내")
+
+    # 2.5초까지 보낸 뒤 6.0초로 seek → 두 번째 발화는 건너뜀
+    captions = await run_replay(seek=(2.5, 6.0))
+    _check(captions, _expected([UTTERANCES[0], *UTTERANCES[2:]], DURATION))
+    print(f"✅ seek 후 자막 {len(captions)}개 (건너뛴 구간 자막 없음)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
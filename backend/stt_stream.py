@@ -0,0 +1,172 @@
+"""
+세션 1개의 실시간 STT 스트림 (연결 끊김 시 자동 재연결 + 최근 오디오 재전송)
+- STT 백엔드(stt_backend)의 연결을 열고, 결과 메시지를 on_message 콜백으로 전달
+- Deepgram 타임스탬프는 "이 연결로 보낸 오디오 누적 시간" 기준
+  → 보낸 청크의 에셋 시각으로 (스트림 시각, 에셋 시각) 매핑 구간을 관리 (seek / 음성 게이트로 건너뛴 구간 포함)
+- 최근 STT_REPLAY_SECONDS 초 동안 보낸 오디오를 보관
+- 연결이 끊기면 새 연결을 열고, 마지막으로 확정(final)된 시각 이후의 오디오부터 다시 보냄
+  → 다시 보낸 구간에서 나온 중복 단어는 확정 시각 기준으로 걸러냄 (fresh_words)
+"""
+import logging
+import asyncio
+from collections import deque
+from typing import Callable, Deque, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 재전송용으로 보관하는 최근 오디오 길이 (초)
+STT_REPLAY_SECONDS = 10.0
+# 재연결 시도 횟수 / 시도 간격 (초, 시도마다 늘어남)
+STT_RECONNECT_ATTEMPTS = 3
+STT_RECONNECT_DELAY = 1.0
+# 중복 판단 여유 (초) - 확정 시각보다 이만큼 늦게 끝나야 새 단어로 봄
+DEDUP_TOLERANCE = 0.01
+SAMPLE_RATE = 16000
+
+
+class SttStream:
+    """재연결 가능한 STT 스트림 (backend.open() 으로 연결, 끊기면 다시 open())"""
+
+    def __init__(
+        self,
+        backend,
+        on_message: Callable,
+        start_time: float = 0.0,
+        replay_seconds: float = STT_REPLAY_SECONDS,
+    ):
+        self.backend = backend
+        self._on_message = on_message
+        self.replay_seconds = replay_seconds
+        self.connection = None
+        self._pump: Optional[asyncio.Task] = None
+        self.final_time: Optional[float] = None  # 자막으로 확정한 마지막 시각 (에셋 시간)
+        self.reconnects = 0
+
+        self._segments: List[Tuple[float, float]] = [(0.0, start_time)]  # [(스트림 시각, 에셋 시각)]
+        self._sent_seconds = 0.0       # 이 연결로 보낸 오디오 길이
+        self._next_time: Optional[float] = start_time  # 이어서 보낼 오디오의 에셋 시각
+        self._seek_stream_time = 0.0   # 마지막 seek 시점의 스트림 시각
+        self._replay: Deque[Tuple[float, bytes]] = deque()  # [(에셋 시각, 청크)]
+        self._replay_seconds_held = 0.0
+
+    async def open(self):
+        self.connection = await self.backend.open()
+        self._pump = asyncio.ensure_future(self._pump_results(self.connection))
+
+    async def _pump_results(self, connection):
+        async for message in connection.results():
+            self._on_message(message)
+
+    async def close(self):
+        if self._pump is not None:
+            self._pump.cancel()
+            self._pump = None
+        if self.connection is not None:
+            await self.connection.close()
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    # ---- 타임스탬프 매핑 ----
+
+    def to_asset_time(self, stream_time: float) -> float:
+        """Deepgram 타임스탬프 → 에셋 재생 시각"""
+        for seg_stream, seg_asset in reversed(self._segments):
+            if stream_time >= seg_stream:
+                return seg_asset + (stream_time - seg_stream)
+        return self._segments[0][1] + stream_time if self._segments else stream_time
+
+    def is_before_seek(self, stream_end: float) -> bool:
+        """seek 이전 위치의 오디오에 대한 결과인지 (이미 다른 구간으로 이동함)"""
+        return stream_end <= self._seek_stream_time
+
+    def mark_seek(self):
+        self._seek_stream_time = self._sent_seconds
+        self.final_time = None
+        self._replay.clear()
+        self._replay_seconds_held = 0.0
+
+    def mark_final(self, end: float):
+        self.final_time = end if self.final_time is None else max(self.final_time, end)
+
+    def fresh_words(self, words: list) -> list:
+        """확정 시각 이전에 끝나는 단어(재연결 후 다시 보낸 구간의 중복) 제거"""
+        if self.final_time is None:
+            return list(words)
+        return [
+            w for w in words
+            if self.to_asset_time(float(getattr(w, "end", 0.0))) > self.final_time + DEDUP_TOLERANCE
+        ]
+
+    # ---- 전송 ----
+
+    async def _send(self, chunk: bytes, t: float):
+        if self._next_time is None or abs(t - self._next_time) > 1e-3:
+            # 건너뛴 구간(음성 게이트 / seek / 재연결) 이후 → 매핑 구간 추가
+            self._segments.append((self._sent_seconds, t))
+        await self.connection.send(chunk, t)
+        duration = len(chunk) / 2 / SAMPLE_RATE
+        self._sent_seconds += duration
+        self._next_time = t + duration
+
+    async def send_media(self, chunk: bytes, t: float):
+        """에셋 시각 t 의 청크 전송 (연결이 끊겼으면 재연결 후 최근 오디오부터 다시 보냄)"""
+        self._replay.append((t, chunk))
+        self._replay_seconds_held += len(chunk) / 2 / SAMPLE_RATE
+        while self._replay and self._replay_seconds_held > self.replay_seconds:
+            _, old = self._replay.popleft()
+            self._replay_seconds_held -= len(old) / 2 / SAMPLE_RATE
+        try:
+            await self._send(chunk, t)
+        except Exception as e:
+            await self._reconnect(e)
+
+    async def finalize(self):
+        """지금까지 보낸 오디오의 결과 확정 요청 (끊겼으면 재연결 후 다시 요청)"""
+        try:
+            await self.connection.finalize()
+        except Exception as e:
+            await self._reconnect(e)
+            await self.connection.finalize()
+
+    async def keep_alive(self):
+        try:
+            await self.connection.keep_alive()
+        except Exception as e:
+            await self._reconnect(e)
+
+    async def _reconnect(self, error: Exception):
+        logger.warning(f"🔌 STT 연결 끊김: {type(error).__name__}: {error} → 재연결")
+        await self.close()
+        for attempt in range(1, STT_RECONNECT_ATTEMPTS + 1):
+            try:
+                await self.open()
+                break
+            except Exception as e:
+                logger.warning(f"⚠️ 재연결 실패 ({attempt}/{STT_RECONNECT_ATTEMPTS}): {e}")
+                if attempt == STT_RECONNECT_ATTEMPTS:
+                    raise ConnectionError("STT 재연결 실패") from e
+                await asyncio.sleep(STT_RECONNECT_DELAY * attempt)
+        self.reconnects += 1
+
+        # 새 연결의 타임스탬프는 0 부터 다시 시작
+        self._segments = []
+        self._sent_seconds = 0.0
+        self._seek_stream_time = 0.0
+        self._next_time = None
+
+        # 마지막 확정 시각 이후 오디오부터 다시 보냄 (그 전 구간은 이미 자막이 나감)
+        replay = [
+            (t, chunk) for t, chunk in self._replay
+            if self.final_time is None or t + len(chunk) / 2 / SAMPLE_RATE > self.final_time
+        ]
+        for t, chunk in replay:
+            await self._send(chunk, t)
+        if replay:
+            logger.info(f"🔁 재연결 완료: {replay[0][0]:.2f}초부터 {len(replay)}개 청크 재전송")
+        else:
+            logger.info("🔁 재연결 완료")
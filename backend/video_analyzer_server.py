@@ -3,103 +3,149 @@
 """
 import os
 import asyncio
+import logging
+import itertools
+import sys
+import subprocess
 import numpy as np
 from pathlib import Path
-from typing import Dict, List, Optional
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from typing import Callable, Dict, List, Optional
+from types import SimpleNamespace
+from fastapi import FastAPI, Query, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, Response
 from pydantic import BaseModel
 import uvicorn
 from dotenv import load_dotenv
 
-from speaker_diarization import get_major_speaker, stabilize_speaker, reset_speaker_map
-
-# PANNs BGM/SFX 분석 모듈 import
-try:
-    import sys
-    ai_engine_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'ai_engine')
-    if os.path.exists(ai_engine_path):
-        sys.path.insert(0, os.path.dirname(ai_engine_path))
-        from ai_engine.panns_bgm_analyzer import analyze_bgm_chunk
-        import ai_engine.panns_bgm_analyzer as panns_module
-        USE_PANNS_BGM = True
-        print("[Video Analyzer] ✅ PANNs BGM/SFX 분석 모듈 로드 성공")
-    else:
-        USE_PANNS_BGM = False
-        print("[Video Analyzer] ⚠️ ai_engine 경로를 찾을 수 없습니다. PANNs BGM/SFX 분석 비활성화")
-except ImportError as e:
-    USE_PANNS_BGM = False
-    print(f"[Video Analyzer] ⚠️ PANNs BGM/SFX 분석 모듈 로드 실패: {e}. BGM/SFX 분석 비활성화")
-
-# DX_Project_2 방식: ai_engine 감정 분석 사용
-try:
-    import sys
-    import os
-    # ai_engine 경로 추가
-    ai_engine_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'ai_engine')
-    if os.path.exists(ai_engine_path):
-        sys.path.insert(0, os.path.dirname(ai_engine_path))
-        from ai_engine.emotion_wrapper import analyze_emotion
-        from ai_engine.kluebert_emotion import EMOTION_ICON
-        print("[Video Analyzer] ✅ ai_engine 감정 분석 모듈 로드 성공")
-        USE_AI_ENGINE_EMOTION = True
-    else:
-        print("[Video Analyzer] ⚠️ ai_engine 경로를 찾을 수 없습니다. 기본 감정 분석 사용")
-        USE_AI_ENGINE_EMOTION = False
-        EMOTION_ICON = {}
-        # ai_engine 경로를 추가한 후 import
-        ai_engine_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'ai_engine')
-        sys.path.insert(0, os.path.dirname(ai_engine_path))
-        from ai_engine.emotion_analyzer import EmotionAnalyzer
-except ImportError as e:
-    print(f"[Video Analyzer] ⚠️ ai_engine 모듈 로드 실패: {e}. 기본 감정 분석 사용")
-    USE_AI_ENGINE_EMOTION = False
-    EMOTION_ICON = {}
-    # ai_engine 경로를 추가한 후 import
-    ai_engine_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'ai_engine')
-    sys.path.insert(0, os.path.dirname(ai_engine_path))
-    from ai_engine.emotion_analyzer import EmotionAnalyzer
-from deepgram import AsyncDeepgramClient
-from deepgram.core.events import EventType
+from speaker_diarization import SpeakerTracker
+from speaker_embedding import MIN_EMBED_SECONDS, load_asset_speakers
+from caption_timeline import StateTimeline
+from loudness_envelope import load_or_build_envelope
+from caption_pipeline import CaptionDeduper, CaptionPipeline
+from client_sender import ClientSender
+from caption_codec import negotiate_codec
+from analysis_hub import AnalysisHub, AnalysisSession, Subscriber
+from caption_track import load_index, load_track, save_track, TrackPlayer
+from offline_analyzer import transcript_sidecar_path
+from job_queue import DEFAULT_DB_PATH, JobQueue
+from loudness_envelope import file_content_hash
+from voice_gate import VoiceActivityGate, asset_metrics as gate_asset_metrics
+from stt_pool import SttConnectionPool
+from stt_backend import CpuBackend, DeepgramBackend, ReplayBackend
+from local_stt import is_available as local_stt_available
+import analysis_models as models
+from stt_stream import SttStream
+from log_config import setup_logging
 
+# 로깅 (포맷/출력은 별도 스레드, LOG_LEVEL / LOG_LEVELS / LOG_FORMAT / LOG_RATE_LIMIT 환경 변수로 설정)
 load_dotenv()
-DEEPGRAM_API_KEY = os.getenv("DEEPGRAM_API_KEY")
+setup_logging()
+logger = logging.getLogger("video_analyzer")
 
 from contextlib import asynccontextmanager
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    init_models()
+    global job_queue, stt_pool
+    models.init_models()
+    
+    # 실시간 STT 연결 풀 (세션 시작/seek 시 핸드셰이크 대기 없이 바로 사용)
+    if models.deepgram_client and STT_BACKEND in ("auto", "deepgram"):
+        stt_pool = SttConnectionPool(models.deepgram_client.listen.v1.connect)
+        stt_pool.start()
+        stt_pool.warm(STT_OPTIONS)
+    
+    # 오프라인 분석 작업 큐 + 워커 프로세스 (워커마다 모델을 따로 로드해 둠)
+    # 워커는 job_worker.py 를 별도 인터프리터로 실행 → 서버 모듈(FastAPI 앱)을 다시 import 하지 않고,
+    # daemon 프로세스가 아니므로 워커 안에서 프로세스 풀도 사용할 수 있음 (종료는 아래에서 직접)
+    job_queue = JobQueue(ANALYSIS_DB_PATH)
+    # 서버 시작 시에는 임대가 만료된 작업만 되돌림 (단독 실행 워커 / 다른 서버 프로세스의 작업은 그대로)
+    recovered = await asyncio.to_thread(job_queue.recover_stale)
+    if recovered:
+        logger.info(f"🔁 중단된 분석 작업 {recovered}개 다시 대기열로")
+    worker_script = str(Path(__file__).parent / "job_worker.py")
+    workers = [
+        subprocess.Popen([sys.executable, worker_script, f"worker-{i + 1}", ANALYSIS_DB_PATH])
+        for i in range(ANALYSIS_WORKERS)
+    ]
+    if workers:
+        logger.info(f"✅ 분석 워커 {len(workers)}개 시작")
+    
     yield
+    
+    for proc in workers:
+        proc.terminate()
+    for proc in workers:
+        try:
+            await asyncio.to_thread(proc.wait, ANALYSIS_WORKER_STOP_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+    if stt_pool is not None:
+        await stt_pool.close()
+    if models.local_stt_pool is not None:
+        models.local_stt_pool.close()
 
 app = FastAPI(title="Video Analyzer Server", lifespan=lifespan)
 app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
+app.add_middleware(GZipMiddleware, minimum_size=1000)  # 자막 구간 조회 응답 등 큰 JSON 압축
 
 # 전역 변수
 connected_clients: set[WebSocket] = set()
+client_senders: Dict[WebSocket, ClientSender] = {}  # 클라이언트별 송신 대기열 (메트릭 조회용)
+analysis_hub = AnalysisHub()  # (에셋, 모드) 별 공유 분석 세션
 video_streams: Dict[str, Dict] = {}  # {video_name: {websocket, connection, audio_data, ...}}
-analyzing: set[str] = set()
+job_queue: Optional[JobQueue] = None  # 오프라인 분석 작업 큐 (lifespan 에서 생성)
+stt_pool: Optional[SttConnectionPool] = None  # 실시간 STT 연결 풀 (lifespan 에서 생성)
 
-emotion_analyzer = None
-deepgram_client = None
-# DX_Project_2 방식: 팔레트 레벨 (기본값 2)
-palette_level = 2
+# 오프라인 분석 작업 큐 DB 경로 / 워커 프로세스 수
+ANALYSIS_DB_PATH = os.getenv("ANALYSIS_DB_PATH", DEFAULT_DB_PATH)
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", "1"))
+# 서버 종료 시 워커 프로세스가 끝나기를 기다리는 시간 (초, 넘기면 강제 종료)
+ANALYSIS_WORKER_STOP_TIMEOUT = 10.0
+# 자막 전송 전 감정 분석을 기다리는 최대 시간 (초) - 넘기면 중립으로 먼저 보내고 패치
+EMOTION_WAIT_TIME = float(os.getenv("CAPTION_EMOTION_WAIT_MS", "150")) / 1000.0
+# 실시간 STT 백엔드: auto (Deepgram → 녹화된 전사 재생 → 로컬 CPU 모델 순으로 사용 가능한 것) / deepgram / replay / cpu
+STT_BACKEND = os.getenv("STT_BACKEND", "auto").lower()
+# 발화 종료 대기 시간 (ms) - 짧은 끊김 방지 (음성 게이트가 닫힌 뒤 Finalize 시점 판단에도 사용)
+STT_ENDPOINTING_MS = 300
+# 실시간 STT 연결 옵션 (연결 풀도 같은 옵션으로 미리 연결)
+STT_OPTIONS = dict(
+    model="nova-2",
+    language="ko-KR",
+    encoding="linear16",
+    sample_rate="16000",
+    smart_format="true",
+    punctuate=True,  # 문장 부호 추가 (정확도 향상)
+    endpointing=STT_ENDPOINTING_MS,
+    diarize=True,  # 화자 구분 활성화
+    vad_events=True,  # Voice Activity Detection 활성화 (작은 소리도 감지)
+    interim_results="true",  # utterance_end_ms 사용에 필요 (interim 결과는 버퍼에 넣지 않음)
+    utterance_end_ms="1000",  # 단어 사이 1초 공백 시 UtteranceEnd 이벤트 수신
+)
+# 오디오를 보내지 않는 동안 Deepgram 연결 유지 메시지 간격 (초, Deepgram 은 10초간 오디오가 없으면 연결 종료)
+STT_KEEPALIVE_INTERVAL = 5.0
+# STT 앞단 음성 구간 게이트 (무음/음악만 나오는 구간은 Deepgram 으로 보내지 않음, "0" 이면 비활성화)
+USE_STT_VAD = os.getenv("STT_VAD", "1") != "0"
+# 파일 끝에서 Finalize 를 보낸 뒤 마지막 final 결과를 기다리는 최대 시간 (초)
+STT_FINALIZE_TIMEOUT = 5.0
+# 클라이언트가 요청할 수 있는 재생 속도 범위
+MIN_PLAYBACK_RATE = 0.25
+MAX_PLAYBACK_RATE = 4.0
 
-def _ansi_to_hex(ansi_color: str) -> str:
-    """ANSI 색상 코드를 HEX 색상으로 변환"""
-    color_map = {
-        "\033[93m": "#FFFF00",  # 노란색
-        "\033[92m": "#00FF00",  # 초록색
-        "\033[94m": "#0000FF",  # 파란색
-        "\033[95m": "#FF00FF",  # 자홍색
-        "\033[91m": "#FF0000",  # 빨간색
-        "\033[97m": "#FFFFFF",  # 흰색
+def _wire_labels() -> Dict[str, List[str]]:
+    """바이너리 전송 포맷 사전에 미리 넣어둘 감정/BGM/SFX 문구 목록"""
+    labels = {
+        "emotion": list(models.EMOTION_KO_MAP.values()),
+        "emotion_icon": list(models.EMOTION_ICON.values()),
+        "bgm": [],
+        "sfx": [],
     }
-    return color_map.get(ansi_color, "#FFFFFF")
-
-def _correct_common_errors(text: str) -> str:
-    """자주 잘못 인식되는 단어 교정: 지혁 → 지옥"""
-    return text.replace("지혁", "지옥")
+    if models.USE_PANNS_BGM:
+        labels["bgm"] = list(dict.fromkeys(models.panns_module.BGM_LABEL_TEXT.values()))
+        labels["sfx"] = list(dict.fromkeys(models.panns_module.SFX_LABEL_TEXT.values()))
+    return labels
 
 def _is_sentence_complete(text: str) -> bool:
     """문장이 완성되었는지 확인 (문장 부호로 끝나는지)"""
@@ -124,8 +170,14 @@ def _is_sentence_complete(text: str) -> bool:
     return False
 
 class SentenceBuffer:
-    """문장 버퍼링을 위한 클래스"""
-    def __init__(self, max_wait_time: float = 2.0, min_length: int = 3):
+    """문장 버퍼링을 위한 클래스
+    
+    세그먼트가 들어올 때마다 loop.call_at 으로 max_wait_time 마감 타이머를 다시 걸고,
+    마감 시각이 되면 on_deadline 콜백을 호출한다 (주기적 폴링 없음).
+    Deepgram 발화 종료 신호(speech_final / UtteranceEnd)를 한 번이라도 받으면
+    문장 부호/어미 휴리스틱 대신 그 신호로 문장을 끊는다.
+    """
+    def __init__(self, max_wait_time: float = 2.0, min_length: int = 3, on_deadline: Optional[Callable[[], None]] = None):
         self.text = ""
         self.speaker_label = None
         self.start_time = None
@@ -135,6 +187,50 @@ class SentenceBuffer:
         self.max_wait_time = max_wait_time  # 최대 대기 시간 (초)
         self.min_length = min_length  # 최소 문장 길이
         self.is_flushing = False  # 플러시 중인지 여부
+        self.on_deadline = on_deadline  # 마감 시각 도달 시 호출할 콜백
+        self.deadline_reached = False  # 마감 타이머가 만료되었는지 여부
+        self._deadline_handle: Optional[asyncio.TimerHandle] = None
+        self.use_endpoint_signals = False  # Deepgram 발화 종료 신호 수신 여부 (세션 단위 유지)
+        self.endpoint_reached = False  # 현재 버퍼가 발화 종료 신호를 받았는지 여부
+        self._caption_ids = itertools.count(1)  # 세션 내 자막 ID 발급기
+        self.caption_id: Optional[int] = None  # 현재 버퍼 문장의 자막 ID (interim ~ final 동안 유지)
+        self.revision = 0  # 현재 자막 ID로 전송한 임시(provisional) 자막 수
+    
+    def _arm_deadline(self, current_time: float):
+        """마감 타이머 재설정 (기존 타이머 취소 후 새로 예약)"""
+        self._cancel_deadline()
+        if self.on_deadline is not None:
+            self._deadline_handle = asyncio.get_event_loop().call_at(
+                current_time + self.max_wait_time, self._on_deadline
+            )
+    
+    def _cancel_deadline(self):
+        if self._deadline_handle is not None:
+            self._deadline_handle.cancel()
+            self._deadline_handle = None
+    
+    def _on_deadline(self):
+        self._deadline_handle = None
+        self.deadline_reached = True
+        if self.on_deadline is not None:
+            self.on_deadline()
+    
+    def ensure_caption_id(self) -> int:
+        """현재 버퍼 문장의 자막 ID (없으면 새로 발급)"""
+        if self.caption_id is None:
+            self.caption_id = next(self._caption_ids)
+        return self.caption_id
+    
+    def next_revision(self) -> int:
+        """임시 자막 전송용 revision 번호 증가"""
+        self.ensure_caption_id()
+        self.revision += 1
+        return self.revision
+    
+    def mark_endpoint(self):
+        """Deepgram 발화 종료 신호 수신 (speech_final / UtteranceEnd)"""
+        self.use_endpoint_signals = True
+        self.endpoint_reached = True
     
     def add_segment(self, transcript: str, speaker_label: str, start: float, end: float):
         """새 세그먼트를 버퍼에 추가"""
@@ -148,6 +244,7 @@ class SentenceBuffer:
         if self.start_time is None:
             self.start_time = start
             self.speaker_label = speaker_label
+        self.ensure_caption_id()
         
         # 텍스트 누적
         if self.text:
@@ -158,6 +255,9 @@ class SentenceBuffer:
         # 시간 업데이트
         self.end_time = end
         self.last_update_time = current_time
+        self.deadline_reached = False
+        self.endpoint_reached = False
+        self._arm_deadline(current_time)
         
         # 세그먼트 정보 저장
         self.segments.append({
@@ -176,12 +276,18 @@ class SentenceBuffer:
         if self.is_flushing:
             return True
         
-        # 문장이 완성되었으면 플러시
-        if _is_sentence_complete(self.text):
+        # 발화 종료 신호를 받았으면 즉시 플러시 (너무 짧으면 다음 발화와 합침)
+        if self.endpoint_reached and len(self.text.strip()) >= self.min_length:
+            return True
+        
+        # 발화 종료 신호가 없는 경우에만 문장 완성 휴리스틱 사용
+        if not self.use_endpoint_signals and _is_sentence_complete(self.text):
             return True
         
         # 최소 길이를 넘고 타임아웃되었으면 플러시
         if len(self.text.strip()) >= self.min_length and self.last_update_time:
+            if self.deadline_reached:
+                return True
             current_time = asyncio.get_event_loop().time()
             if current_time - self.last_update_time >= self.max_wait_time:
                 return True
@@ -199,7 +305,9 @@ class SentenceBuffer:
             'speaker_label': self.speaker_label,
             'start': self.start_time,
             'end': self.end_time,
-            'segments': self.segments.copy()
+            'segments': self.segments.copy(),
+            'caption_id': self.caption_id,
+            'revision': self.revision + 1,  # final 은 마지막 임시 자막보다 한 단계 높은 revision
         }
         
         self.reset()
@@ -214,400 +322,578 @@ class SentenceBuffer:
         self.last_update_time = None
         self.segments = []
         self.is_flushing = False
+        self.deadline_reached = False
+        self.endpoint_reached = False
+        self.caption_id = None
+        self.revision = 0
+        self._cancel_deadline()
+
+class VideoAnalysisRequest(BaseModel):
+    video_path: str
+    video_name: str
+    stt: str = "auto"  # auto / deepgram / local (사이드카 전사 파일) / cpu (로컬 CPU 모델)
+    priority: int = 0  # 높을수록 먼저 처리
+    scheduled_at: Optional[float] = None  # 방송 예정 시각 (epoch 초) - 빠를수록 먼저 처리
+    force: bool = False  # 이미 분석된 에셋도 다시 분석
+
 
-async def update_emotion_styling(
-    transcript: str, 
-    display_text: str, 
-    intensity: float, 
-    bgm_text: str, 
-    sfx_text: str, 
-    start: float, 
-    end: float, 
-    websocket: WebSocket
+def _resolve_asset(audio_name: str):
+    """에셋 이름 → (WAV 이름, 경로) (MP4 파일명이 들어오면 같은 이름의 WAV 사용 - 오디오는 WAV 파일만 사용)"""
+    audio_name = os.path.basename(audio_name)
+    if audio_name.lower().endswith('.mp4'):
+        audio_name = audio_name.rsplit('.', 1)[0] + '.wav'
+        logger.info(f"🔄 MP4 파일명 감지, {audio_name} 사용")
+    project_root = Path(__file__).parent.parent
+    return audio_name, str(project_root / f"frontend/deaftv_lgdxschool_projects/assets/{audio_name}")
+
+
+def _stt_backend_kind(audio_path: str) -> Optional[str]:
+    """이 에셋에 사용할 실시간 STT 백엔드 (사용할 수 없으면 None, 재생 백엔드는 <wav>.transcript.json 필요)"""
+    available = {
+        "deepgram": lambda: models.deepgram_client is not None,
+        "replay": lambda: os.path.exists(transcript_sidecar_path(audio_path)),
+        "cpu": lambda: local_stt_available(models.LOCAL_STT_ENGINE, models.LOCAL_STT_MODEL),
+    }
+    kinds = ["deepgram", "replay", "cpu"] if STT_BACKEND == "auto" else [STT_BACKEND]
+    return next((kind for kind in kinds if kind in available and available[kind]()), None)
+
+
+def _make_stt_backend(audio_path: str):
+    kind = _stt_backend_kind(audio_path)
+    if kind == "replay":
+        return ReplayBackend.from_sidecar(audio_path)
+    if kind == "cpu":
+        return CpuBackend(models.get_local_stt_pool())
+    return DeepgramBackend(models.deepgram_client.listen.v1.connect, STT_OPTIONS, pool=stt_pool)
+
+
+async def start_realtime_analysis(
+    audio_path: str,
+    audio_name: str,
+    websocket: WebSocket,
+    audio_start_time: float = 0.0,
+    interim_captions: bool = False,
+    emotion_wait_time: Optional[float] = None,
+    wire_format: str = "json"
 ):
-    """감정 분석 및 스타일링 업데이트 (DX_Project_2 방식: ai_engine 사용)"""
-    global palette_level
+    """시청자 1명의 자막 구독
+    
+    분석이 끝난 에셋이면 디스크의 자막 트랙을 재생 속도에 맞춰 전송하고 (STT/모델 추론 없음),
+    아니면 같은 에셋/모드의 분석 세션에 합류한다 (없으면 새로 시작).
     
+    interim_captions=True 이면 Deepgram interim 결과를 임시 자막(type="provisional")으로 먼저 보내고,
+    문장이 확정되면 같은 caption_id 의 final 자막(감정 스타일 포함)으로 교체하게 한다.
+    
+    emotion_wait_time(초) 동안 감정 분석을 기다렸다가 감정 포함 자막을 한 번만 보내고,
+    그 안에 끝나지 않으면 중립으로 먼저 보낸 뒤 type="patch" 메시지로 감정만 갱신한다.
+    (세션을 공유하면 세션을 시작한 시청자의 값을 따른다)
+    
+    wire_format="msgpack" 이면 (msgpack 설치 시) 바이너리 포맷으로 전송한다 (caption_codec 참고).
+    
+    연결 중 클라이언트는 제어 메시지로 재연결 없이 재생 상태를 바꿀 수 있다:
+        {"action": "seek", "time": 초} / {"action": "pause"} / {"action": "resume"} / {"action": "rate", "rate": 배속}
+    처리 결과는 {"type": "control", ...} 메시지로 알린다.
+    """
+    mode = models.content_mode(audio_name)
+    
+    # 캐시된 자막 트랙 확인 (에셋 해시 계산이 오래 걸릴 수 있으므로 executor 에서)
+    track = None
+    if audio_path.lower().endswith('.wav'):
+        track = await asyncio.get_event_loop().run_in_executor(None, load_track, audio_path, mode)
+    
+    if track is None and _stt_backend_kind(audio_path) is None:
+        await websocket.send_json({"error": "STT 백엔드를 사용할 수 없습니다. (Deepgram 클라이언트, 전사 파일, 로컬 STT 모델 모두 없음)"})
+        return
+    
+    if emotion_wait_time is None:
+        emotion_wait_time = EMOTION_WAIT_TIME
+    
+    # 전송 포맷 협상 결과를 JSON 으로 먼저 알림 (msgpack 불가 시 json 으로 fallback)
+    codec = negotiate_codec(wire_format, _wire_labels())
+    await websocket.send_json({"type": "hello", "wire_format": codec.name})
+    
+    # 클라이언트 송신 대기열 (느린 클라이언트가 분석 경로를 막지 않도록 writer 태스크가 전송)
+    sender = ClientSender(websocket, codec=codec)
+    sender.start()
+    client_senders[websocket] = sender
+    
+    subscriber = Subscriber(sender, offset=audio_start_time, interim_captions=interim_captions)
+    session = None
+    player = None
+    key = (audio_name, mode)
+    produce = lambda s: run_analysis_session(s, audio_path, audio_name, emotion_wait_time)
+    client_gone = asyncio.Event()
+    
+    async def apply_control(msg: Dict):
+        """재생 제어 메시지 처리 (seek / pause / resume / rate)"""
+        nonlocal session
+        action = msg.get("action")
+        if action == "seek":
+            position = max(0.0, float(msg.get("time", 0.0)))
+            if player is not None:
+                player.seek(position)
+            elif session.covers(position):
+                # 이미 분석했거나 곧 분석할 구간 → 로그에서 다시 backfill
+                await session.reseat(subscriber, position)
+            elif session.subscribers == {subscriber} and not session.stopped and not session.finished.is_set():
+                # 혼자 보는 세션 → STT 연결을 유지한 채 producer 를 새 위치로 이동
+                session.request_seek(position)
+                await session.reseat(subscriber, position)
+            else:
+                # 다른 시청자와 공유 중 → 이 시청자만 새 위치의 세션으로 옮김
+                session.unsubscribe(subscriber)
+                subscriber.reset(position)
+                session = await analysis_hub.join(key, subscriber, produce)
+            logger.info(f"⏩ seek: {audio_name} → {position:.2f}초")
+            reply = {"time": position}
+        elif action in ("pause", "resume"):
+            paused = action == "pause"
+            if player is not None:
+                player.pause() if paused else player.resume()
+            else:
+                subscriber.paused = paused
+            reply = {}
+        elif action == "rate":
+            rate = min(max(float(msg.get("rate", 1.0)), MIN_PLAYBACK_RATE), MAX_PLAYBACK_RATE)
+            if player is not None:
+                player.set_rate(rate)
+            else:
+                subscriber.rate = rate
+            reply = {"rate": rate}
+        else:
+            return
+        sender.send({"type": "control", "action": action, **reply})
+    
+    async def read_controls():
+        """클라이언트 제어 메시지 수신 (연결이 끊기면 client_gone 설정)"""
+        try:
+            while True:
+                msg = await websocket.receive_json()
+                try:
+                    await apply_control(msg)
+                except (TypeError, ValueError) as e:
+                    sender.send({"type": "control", "action": msg.get("action"), "error": str(e)})
+        except Exception:
+            # WebSocketDisconnect 등
+            client_gone.set()
+    
+    control_task = None
     try:
-        loop = asyncio.get_event_loop()
-        
-        if USE_AI_ENGINE_EMOTION:
-            # DX_Project_2 방식: ai_engine.emotion_wrapper 사용
-            emotion, conf, color_hex = await loop.run_in_executor(
-                None,
-                analyze_emotion,
-                transcript,
-                palette_level
-            )
-            # 감정 이름을 한글로 변환
-            emotion_ko_map = {
-                "joy": "기쁨",
-                "sadness": "슬픔",
-                "anger": "분노",
-                "fear": "공포",
-                "surprise": "놀람",
-                "disgust": "혐오",
-                "neutral": "중립"
-            }
-            emotion_val = emotion_ko_map.get(emotion, "중립")
-            color_val = color_hex
+        if track is not None:
+            logger.info(f"💾 캐시된 자막 트랙 재생: {audio_name} ({len(track)}개, 시작 {audio_start_time:.2f}초)")
+            player = TrackPlayer(track, sender.send, audio_start_time)
+            player.start()
         else:
-            # 기본 방식: EmotionAnalyzer 사용
-            global emotion_analyzer
-            if not emotion_analyzer:
-                return
-            emotion_result = await loop.run_in_executor(
-                None, 
-                emotion_analyzer.predict, 
-                transcript
-            )
-            emotion_val = emotion_result.get("emotion_ko", "중립")
-            ansi_color = emotion_result.get("color", "\033[97m")
-            color_val = _ansi_to_hex(ansi_color)
+            session = await analysis_hub.join(key, subscriber, produce)
+        control_task = asyncio.ensure_future(read_controls())
         
-        # 결과를 WebSocket으로 전송 (업데이트)
+        # 클라이언트 연결이 끊기거나 송신이 끝날 때까지 유지 (분석/재생이 끝난 뒤에도 seek 으로 되돌아갈 수 있음)
+        waiters = [asyncio.ensure_future(client_gone.wait()), asyncio.ensure_future(sender.wait_closed())]
         try:
-            # 감정 이모지 가져오기 (USE_AI_ENGINE_EMOTION일 때만)
-            emotion_icon = ""
-            if USE_AI_ENGINE_EMOTION:
-                # emotion_val이 한글이므로 영어 감정명으로 역변환 필요
-                emotion_en_map = {
-                    "기쁨": "joy",
-                    "슬픔": "sadness",
-                    "분노": "anger",
-                    "공포": "fear",
-                    "놀람": "surprise",
-                    "혐오": "disgust",
-                    "중립": "neutral"
-                }
-                emotion_en = emotion_en_map.get(emotion_val, "neutral")
-                emotion_icon = EMOTION_ICON.get(emotion_en, "")
-            
-            update_response = {
-                "text": display_text,
-                "emotion": emotion_val,
-                "emotion_icon": emotion_icon,  # 이모지 추가
-                "color": color_val,
-                "intensity": float(intensity),
-                "pitch": 0.5,
-                "bgm": bgm_text,
-                "sfx": sfx_text,
-                "start": float(start),
-                "end": float(end),
-            }
-            await websocket.send_json(update_response)
-            print(f"[Video Analyzer] 🎨 감정 분석 완료: {emotion_val} {emotion_icon} ({color_val})")
-        except (RuntimeError, Exception) as send_error:
-            # WebSocket이 닫혔거나 연결이 끊어진 경우 무시
-            if "close" in str(send_error).lower() or "disconnect" in str(send_error).lower():
-                return
-            raise  # 다른 예외는 다시 발생시킴
-    except Exception as e:
-        # WebSocket 연결 오류는 무시 (연결이 끊어진 경우)
-        if "close" in str(e).lower() or "disconnect" in str(e).lower():
-            return
-        print(f"[Video Analyzer] 감정 분석 오류: {e}")
-        import traceback
-        traceback.print_exc()
-
-# 변환 로직 제거 - WAV 파일은 이미 16kHz mono 16-bit로 준비되어 있어야 함
-
-def init_models():
-    global emotion_analyzer, deepgram_client
-    try:
-        # DX_Project_2 방식: ai_engine을 사용하면 EmotionAnalyzer 초기화 불필요
-        if not USE_AI_ENGINE_EMOTION:
-            emotion_analyzer = EmotionAnalyzer(r"C:\Users\155\Downloads\My_Emotion_Model")
-        if DEEPGRAM_API_KEY:
-            deepgram_client = AsyncDeepgramClient(api_key=DEEPGRAM_API_KEY)
-        print("[Video Analyzer] ✅ 모델 초기화 완료")
-    except Exception as e:
-        print(f"[Video Analyzer] ❌ 모델 초기화 실패: {e}")
-
-class VideoAnalysisRequest(BaseModel):
-    video_path: str
-    video_name: str
+            await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for waiter in waiters:
+                waiter.cancel()
+    finally:
+        if control_task is not None:
+            control_task.cancel()
+        if player is not None:
+            player.stop()
+        if session is not None:
+            session.unsubscribe(subscriber)
+        await sender.close(timeout=5.0)
+        client_senders.pop(websocket, None)
+        if audio_name in video_streams:
+            del video_streams[audio_name]
 
 
-async def start_realtime_analysis(audio_path: str, audio_name: str, websocket: WebSocket, audio_start_time: float = 0.0):
-    """오디오 파일을 실시간으로 스트리밍하여 분석 (librosa 직접 읽기)"""
-    global deepgram_client, emotion_analyzer
+async def run_analysis_session(
+    session: AnalysisSession,
+    audio_path: str,
+    audio_name: str,
+    emotion_wait_time: float,
+):
+    """오디오 파일을 실시간으로 스트리밍하여 분석 (librosa 직접 읽기)
     
-    if not deepgram_client:
-        await websocket.send_json({"error": "Deepgram 클라이언트가 초기화되지 않았습니다."})
-        return
+    결과 자막은 session.publish() 로 공유 로그에 기록되어 세션의 모든 시청자에게 전달된다.
+    시청자가 모두 나가면 (session.stopped) 남은 문장을 정리하고 종료한다.
+    
+    seek 요청(session.pending_seek)은 Deepgram 연결을 유지한 채 WAV 읽기 위치만 옮기고,
+    시청자가 모두 일시정지하면 오디오 대신 KeepAlive 만 보낸다.
+    파일 끝에서는 무음을 보내지 않고 Finalize 로 남은 결과를 받은 뒤 (최대 STT_FINALIZE_TIMEOUT 초)
+    CloseStream 으로 연결을 닫는다. (STT 는 _make_stt_backend() 로 선택, Deepgram 연결은 stt_pool 에서 가져옴)
+    """
+    # 화자 → 인물번호 매핑 (세션마다 따로 유지, 다른 시청자의 새 세션이 번호를 초기화하지 않음)
+    speakers = SpeakerTracker()
+    session.speakers = speakers
+    # 화자 임베딩 군집 (에셋 단위로 공유/캐시 → seek / STT 재연결 / 다른 세션에서도 같은 인물 번호)
+    asset_speakers = None
+    if models.USE_SPEAKER_EMBEDDING and audio_path.lower().endswith('.wav'):
+        asset_speakers = await asyncio.get_event_loop().run_in_executor(None, load_asset_speakers, audio_path)
+    speaker_request_seq = 0      # 화자 임베딩 요청 순번
+    speaker_request_applied = 0  # 반영한 가장 최근 요청 (늦게 끝난 이전 요청이 최신 결과를 덮지 않도록)
     
-    reset_speaker_map()
+    def deepgram_speaker_key(raw_id):
+        """화자 임베딩을 쓸 때 Deepgram 화자 id 의 tracker 키 (임베딩 인물 번호 키 1,2,… 와 겹치지 않게)"""
+        return None if raw_id is None else f"deepgram:{raw_id}"
+    
+    def request_speaker_label(start: float, end: float, deepgram_key):
+        """캐시에 없는 발화의 인물 번호를 executor 에서 계산 (WAV 읽기 + 임베딩이 이벤트 루프를 막지 않도록)
+        
+        계산하는 동안 이 발화는 Deepgram 화자로 표시하고, 결과가 나오면 그 Deepgram 화자를 결과 인물 번호로 고정
+        → 같은 화자의 이후 발화는 (임베딩을 기다리는 동안에도) 같은 인물 번호
+        (결과는 에셋 캐시에도 저장되므로 다시 볼 때는 cached_label 로 바로 조회됨)
+        """
+        nonlocal speaker_request_seq
+        speaker_request_seq += 1
+        seq = speaker_request_seq
+        future = asyncio.get_event_loop().run_in_executor(None, asset_speakers.label_for, start, end)
+        
+        def apply(done):
+            nonlocal speaker_request_applied
+            if done.cancelled() or done.exception() is not None or seq < speaker_request_applied:
+                return
+            label = done.result()
+            if label is None:
+                return
+            speaker_request_applied = seq
+            speakers.pin(label, label)
+            if deepgram_key is not None:
+                speakers.pin(deepgram_key, label)
+        
+        future.add_done_callback(apply)
     
-    connection_opened = asyncio.Event()
     stream_start_time = None
-    audio_playback_start_time = audio_start_time  # 오디오 재생 시작 시간 (초)
+    audio_playback_start_time = session.start_offset  # 오디오 재생 시작 시간 (초)
     last_message_time = None  # 마지막 메시지 수신 시간 (외부 스코프에서 업데이트)
+    wait_start = None  # 전체 타임아웃 기준 시각 (seek 하면 다시 시작)
+    audio_eof = asyncio.Event()   # WAV 끝까지 보내고 Finalize 요청함
+    finalized = asyncio.Event()   # Finalize 에 대한 마지막 final 결과 수신
     
-    # 중복 전송 방지: (start, end, transcript) 조합을 추적
-    sent_captions = set()
+    # 음성 구간 게이트 (건너뛴 구간은 stt_stream 이 타임스탬프 매핑 구간을 추가해 맞춤)
+    audio_gate = VoiceActivityGate(asset=session.key[0]) if USE_STT_VAD else None
+    session.audio_gate = audio_gate
+    stt_stream = None  # 재연결 가능한 STT 스트림 (Deepgram 타임스탬프 ↔ 에셋 시간 매핑 포함)
+    
+    # 중복 전송 방지: 전송 워터마크 + 최근 구간의 (start, end, transcript) 만 보관 (세션이 길어져도 메모리 일정)
+    sent_captions = CaptionDeduper()
     
     # 문장 버퍼링: 완전한 문장을 만들기 위한 버퍼
     sentence_buffer = SentenceBuffer(max_wait_time=2.0, min_length=5)
-    buffer_flush_task = None  # 버퍼 플러시 태스크
+    caption_pipeline = None  # 자막 전송 파이프라인 (순서 보장 + 감정 분석 동시 실행)
     
-    # 오디오 강도 추적 (시간대별 RMS 저장)
+    # 오디오 강도 추적 (시간대별 RMS 저장) - 엔벨로프 캐시가 준비되기 전 fallback
     audio_intensity_buffer = {}  # {timestamp: rms_value}
     
-    # BGM/SFX 버퍼 (시간대별 BGM/SFX 정보 저장)
-    bgm_sfx_buffer = {}  # {timestamp: {'bgm': bgm_text, 'sfx': sfx_text}}
+    # WAV 전체 음량 엔벨로프 (캐시가 있으면 즉시 로드, 없으면 백그라운드에서 계산)
+    envelope_future = None
+    if audio_path.lower().endswith('.wav'):
+        envelope_future = asyncio.get_event_loop().run_in_executor(None, load_or_build_envelope, audio_path)
+    
+    # BGM/SFX 타임라인 (상태가 바뀔 때만 구간 추가)
+    bgm_timeline = StateTimeline()
+    sfx_timeline = StateTimeline()
+    # PANNs 분석 상태 (세션마다 따로 → 다른 세션의 seek / 오프라인 작업이 안정화 상태를 초기화하지 않음)
+    # 비디오 파일명에 따라 정한 세션 키의 모드로 PANNs 분석
+    bgm_analyzer = models.panns_module.BgmAnalyzer(session.key[1]) if models.USE_PANNS_BGM else None
+    if bgm_analyzer is not None:
+        logger.info(f"🎬 PANNs 모드: {bgm_analyzer.mode}")
     
-    # 연결 상태 플래그 (연결이 끊어졌는지 추적)
+    # 연결 상태 플래그 (세션이 중단되었는지 추적 - 시청자가 모두 나감)
     connection_closed = False
     
-    # 비디오 파일명에 따라 PANNs 모드 설정
-    if USE_PANNS_BGM:
-        video_basename = os.path.basename(audio_name).lower()
-        if '환승연애' in video_basename or '예능' in video_basename or 'enter_web' in video_basename:
-            os.environ['CAPTION_CONTENT_MODE'] = 'ENTERTAINMENT'
-            print("[Video Analyzer] 🎬 PANNs 모드: ENTERTAINMENT (예능)")
-        elif '친애하는' in video_basename or '드라마' in video_basename or '영화' in video_basename or 'drama' in video_basename:
-            os.environ['CAPTION_CONTENT_MODE'] = 'DRAMA'
-            print("[Video Analyzer] 🎬 PANNs 모드: DRAMA (드라마/영화)")
-        elif '펭귄' in video_basename or '다큐' in video_basename or 'dacu' in video_basename:
-            os.environ['CAPTION_CONTENT_MODE'] = 'DOCUMENTARY'
-            print("[Video Analyzer] 🎬 PANNs 모드: DOCUMENTARY (다큐멘터리)")
-        else:
-            os.environ['CAPTION_CONTENT_MODE'] = 'DOCUMENTARY'  # 기본값
-            print("[Video Analyzer] 🎬 PANNs 모드: DOCUMENTARY (기본값)")
+    def flush_buffer_if_ready(force: bool = False):
+        """버퍼가 준비되었으면(force=True면 무조건) 플러시하고 전송 파이프라인에 추가"""
+        if not force and not sentence_buffer.should_flush():
+            return
+        caption_id, revision = sentence_buffer.caption_id, sentence_buffer.revision
+        buffer_data = sentence_buffer.flush()
+        if buffer_data:
+            # 중복 체크 (감정 분석 시작 전에 거름)
+            if sent_captions.seen(buffer_data['start'], buffer_data['end'], buffer_data['text']):
+                return
+            caption_pipeline.submit(buffer_data)
+        elif revision > 0:
+            # 임시 자막만 보내고 문장이 버려진 경우 클라이언트에서 지우도록 알림
+            caption_pipeline.submit({'type': 'retract', 'caption_id': caption_id})
+    
+    def push_provisional(interim_text: str, start: float, end: float):
+        """interim 결과로 임시 자막 전송 (감정 분석 없이 텍스트만)"""
+        revision = sentence_buffer.next_revision()
+        text = f"{sentence_buffer.text} {interim_text}".strip()
+        speaker_label = sentence_buffer.speaker_label
+        caption_pipeline.submit({
+            'type': 'provisional',
+            'caption_id': sentence_buffer.caption_id,
+            'revision': revision,
+            'text': f"[인물{speaker_label}] {text}" if speaker_label else text,
+            'start': sentence_buffer.start_time if sentence_buffer.start_time is not None else start,
+            'end': end,
+        })
+    
+    # 최대 대기 시간(max_wait_time) 경과 시 SentenceBuffer 타이머가 호출
+    sentence_buffer.on_deadline = flush_buffer_if_ready
+    
+    def mark_connection_closed():
+        nonlocal connection_closed
+        connection_closed = True
+        if caption_pipeline is not None:
+            caption_pipeline.closed = True
     
-    async def flush_buffer_if_ready():
-        """버퍼가 준비되었으면 플러시하고 전송"""
-        nonlocal sentence_buffer, sent_captions, audio_intensity_buffer, bgm_sfx_buffer, connection_closed
+    async def send_sentence(buffer_data: Dict, styling: Optional[Dict]):
+        """플러시된 문장에 강도/BGM/SFX/감정을 붙여 전송 (styling=None 이면 중립으로 전송)"""
         
-        # 연결이 끊어진 경우 즉시 반환
-        if connection_closed:
+        # 세션이 중단된 경우 즉시 반환 (시청자가 모두 나감)
+        if connection_closed or session.stopped:
+            mark_connection_closed()
             return
         
-        # WebSocket 연결 상태 확인
+        transcript = buffer_data['text']
+        speaker_label = buffer_data['speaker_label']
+        start = buffer_data['start']
+        end = buffer_data['end']
+        
+        # 화자 정보 포함
+        if speaker_label:
+            display_text = f"[인물{speaker_label}] {transcript}"
+        else:
+            display_text = transcript
+        
+        # 기본값 설정 (감정 분석이 마감 시간 안에 끝나지 않았을 때 사용)
+        if not styling:
+            styling = {"emotion": "중립", "emotion_icon": "", "color": "#FFFFFF"}
+        bgm_text = None
+        sfx_text = None
+        
+        # 실제 오디오 강도 계산 (사전 계산된 엔벨로프 우선, 없으면 시간대별 RMS 사용)
+        # 자막 시간 범위의 평균 강도 계산
+        envelope = None
+        if envelope_future is not None and envelope_future.done():
+            envelope = envelope_future.result()
+        
+        intensity_samples = []
+        if envelope is None:
+            for t in np.arange(start, end, 0.1):  # 0.1초 간격으로 샘플링
+                t_rounded = round(t, 2)
+                if t_rounded in audio_intensity_buffer:
+                    intensity_samples.append(audio_intensity_buffer[t_rounded])
+        
+        if envelope is not None:
+            intensity = envelope.intensity(start, end)
+        elif intensity_samples:
+            # 평균 강도 계산
+            intensity = float(np.mean(intensity_samples))
+        else:
+            # 강도 데이터가 없으면 기본값 (0.5)
+            intensity = 0.5
+        
+        # BGM/SFX 정보 가져오기 (자막 시간 범위와 가장 오래 겹친 값 사용)
+        if models.USE_PANNS_BGM:
+            bgm_text = bgm_timeline.dominant(start, end)
+            sfx_text = sfx_timeline.dominant(start, end)
+            
+            # 디버깅 로그
+            if bgm_text or sfx_text:
+                logger.debug(
+                    "🎵 자막에 BGM/SFX 포함: [%.1f-%.1fs] BGM=%s, SFX=%s", start, end, bgm_text, sfx_text,
+                    extra={"category": "caption"},
+                )
+        
+        # 즉시 전송 (예외 처리 추가)
         try:
-            # WebSocket이 닫혔는지 확인
-            if hasattr(websocket, 'client_state'):
-                if websocket.client_state.name != "CONNECTED":
-                    connection_closed = True
-                    return
-        except (AttributeError, RuntimeError, Exception):
-            # 연결이 끊어진 경우
-            connection_closed = True
+            # 연결 상태 재확인
+            if connection_closed:
+                return
+            
+            caption_response = {
+                "type": "final",
+                "caption_id": buffer_data.get('caption_id'),
+                "revision": buffer_data.get('revision', 0),
+                "text": display_text,
+                "emotion": styling["emotion"],
+                "emotion_icon": styling["emotion_icon"],
+                "color": styling["color"],
+                "intensity": float(intensity),
+                "pitch": 0.5,
+                "bgm": bgm_text,
+                "sfx": sfx_text,
+                "start": float(start),
+                "end": float(end),
+            }
+            if not session.publish(caption_response):
+                mark_connection_closed()
+                return
+            logger.debug(
+                "📤 [%.1fs] %.80s... (완성된 문장 전송, 감정=%s)", start, display_text, styling["emotion"],
+                extra={"category": "caption"},
+            )
+        except (RuntimeError, Exception) as e:
+            # WebSocket이 닫혔거나 연결이 끊어진 경우
+            error_str = str(e).lower()
+            error_type = type(e).__name__
+            if any(keyword in error_str for keyword in ["close", "disconnect", "1006", "1000", "connection"]):
+                mark_connection_closed()
+                logger.warning(f"🔌 연결 끊김 감지: {error_type}")
+                return
+            # 다른 예외는 로그만 출력
+            logger.warning(f"⚠️ 자막 전송 실패: {error_type}: {e}")
             return
-        
-        if sentence_buffer.should_flush():
-            buffer_data = sentence_buffer.flush()
-            if buffer_data:
-                transcript = buffer_data['text']
-                speaker_label = buffer_data['speaker_label']
-                start = buffer_data['start']
-                end = buffer_data['end']
-                
-                # 중복 체크
-                caption_key = (round(start, 2), round(end, 2), transcript)
-                if caption_key in sent_captions:
-                    return
-                
-                sent_captions.add(caption_key)
-                
-                # 화자 정보 포함
-                if speaker_label:
-                    display_text = f"[인물{speaker_label}] {transcript}"
-                else:
-                    display_text = transcript
-                
-                # 기본값 설정
-                emotion = "중립"
-                color = "#FFFFFF"
-                bgm_text = None
-                sfx_text = None
-                
-                # 실제 오디오 강도 계산 (시간대별 RMS 사용)
-                # 자막 시간 범위의 평균 강도 계산
-                intensity_samples = []
-                for t in np.arange(start, end, 0.1):  # 0.1초 간격으로 샘플링
-                    t_rounded = round(t, 2)
-                    if t_rounded in audio_intensity_buffer:
-                        intensity_samples.append(audio_intensity_buffer[t_rounded])
-                
-                if intensity_samples:
-                    # 평균 강도 계산
-                    intensity = float(np.mean(intensity_samples))
-                else:
-                    # 강도 데이터가 없으면 기본값 (0.5)
-                    intensity = 0.5
-                
-                # BGM/SFX 정보 가져오기 (자막 시간 범위의 평균값 사용)
-                if USE_PANNS_BGM and bgm_sfx_buffer:
-                    bgm_samples = []
-                    sfx_samples = []
-                    for t in np.arange(start, end, 0.1):  # 0.1초 간격으로 샘플링
-                        t_rounded = round(t, 2)
-                        if t_rounded in bgm_sfx_buffer:
-                            bgm_data = bgm_sfx_buffer[t_rounded]
-                            if bgm_data.get('bgm'):
-                                bgm_samples.append(bgm_data['bgm'])
-                            if bgm_data.get('sfx'):
-                                sfx_samples.append(bgm_data['sfx'])
-                    
-                    # 가장 많이 나타난 BGM/SFX 선택 (또는 가장 최근 값)
-                    if bgm_samples:
-                        bgm_text = max(set(bgm_samples), key=bgm_samples.count) if bgm_samples else None
-                    if sfx_samples:
-                        sfx_text = max(set(sfx_samples), key=sfx_samples.count) if sfx_samples else None
-                    
-                    # 디버깅 로그
-                    if bgm_text or sfx_text:
-                        print(f"[Video Analyzer] 🎵 자막에 BGM/SFX 포함: [{start:.1f}-{end:.1f}s] BGM={bgm_text}, SFX={sfx_text}")
-                
-                # 즉시 전송 (예외 처리 추가)
-                try:
-                    # 연결 상태 재확인
-                    if connection_closed:
-                        return
-                    
-                    # 초기 응답에도 이모지 포함 (기본값으로 빈 문자열)
-                    initial_response = {
-                        "text": display_text,
-                        "emotion": emotion,
-                        "emotion_icon": "",  # 초기에는 이모지 없음 (감정 분석 후 업데이트됨)
-                        "color": color,
-                        "intensity": float(intensity),
-                        "pitch": 0.5,
-                        "bgm": bgm_text,
-                        "sfx": sfx_text,
-                        "start": float(start),
-                        "end": float(end),
-                    }
-                    await websocket.send_json(initial_response)
-                    print(f"[Video Analyzer] 📤 [{start:.1f}s] {display_text[:80]}... (완성된 문장 전송)")
-                    
-                    # 감정 분석 후 업데이트
-                    await update_emotion_styling(
-                        transcript, display_text, intensity, bgm_text, sfx_text, start, end, websocket
-                    )
-                except (RuntimeError, Exception) as e:
-                    # WebSocket이 닫혔거나 연결이 끊어진 경우
-                    error_str = str(e).lower()
-                    error_type = type(e).__name__
-                    if any(keyword in error_str for keyword in ["close", "disconnect", "1006", "1000", "connection"]):
-                        connection_closed = True
-                        print(f"[Video Analyzer] 🔌 연결 끊김 감지: {error_type}")
-                        return
-                    # 다른 예외는 로그만 출력
-                    print(f"[Video Analyzer] ⚠️ 자막 전송 실패: {error_type}: {e}")
-                    return
     
-    async def buffer_timeout_monitor():
-        """버퍼 타임아웃 모니터링 (주기적으로 버퍼 체크 및 플러시)"""
-        nonlocal connection_closed
-        try:
-            while not connection_closed:
-                await asyncio.sleep(0.5)  # 0.5초마다 체크
-                try:
-                    await flush_buffer_if_ready()
-                except (RuntimeError, Exception) as e:
-                    # WebSocket 연결이 끊어진 경우 루프 종료
-                    error_str = str(e).lower()
-                    if any(keyword in error_str for keyword in ["close", "disconnect", "1006", "1000", "connection"]):
-                        connection_closed = True
-                        print(f"[Video Analyzer] 🔌 버퍼 모니터 종료 (연결 끊김)")
-                        break
-                    # 다른 예외는 무시하고 계속
-        except asyncio.CancelledError:
-            # 태스크 취소 시 남은 버퍼 플러시 (연결 상태 확인 후)
-            try:
-                if not connection_closed:
-                    await flush_buffer_if_ready()
-            except:
-                pass  # 연결이 끊어진 경우 무시
-            raise
+    async def send_emotion_patch(buffer_data: Dict, styling: Dict):
+        """감정 분석이 마감 시간을 넘긴 자막에 감정 필드만 패치로 전송"""
+        if connection_closed:
+            return
+        if not session.publish({
+            "type": "patch",
+            "caption_id": buffer_data.get('caption_id'),
+            "start": float(buffer_data['start']),
+            "end": float(buffer_data['end']),
+            **styling,
+        }):
+            mark_connection_closed()
     
-    def on_open(event):
-        connection_opened.set()
-        print(f"[Video Analyzer] ✅ Deepgram 연결 완료: {audio_name}")
+    async def send_raw_message(message: Dict):
+        """임시 자막 / 철회 메시지는 가공 없이 그대로 전송"""
+        if connection_closed:
+            return
+        if not session.publish(message):
+            mark_connection_closed()
+    
+    caption_pipeline = CaptionPipeline(
+        infer_emotion=models.analyze_emotion_styling,
+        send_caption=send_sentence,
+        send_patch=send_emotion_patch,
+        send_raw=send_raw_message,
+        emotion_wait_time=emotion_wait_time,
+    )
     
     def on_message(message):
         nonlocal stream_start_time, last_message_time, sentence_buffer
         
         last_message_time = asyncio.get_event_loop().time()
         try:
+            # Finalize 요청으로 나온 마지막 결과 (처리 후 종료 대기 해제)
+            if getattr(message, "from_finalize", False) and audio_eof.is_set():
+                finalized.set()
+            
+            # 발화 종료 이벤트 (utterance_end_ms) → 버퍼 즉시 플러시
+            if getattr(message, "type", None) == "UtteranceEnd":
+                sentence_buffer.mark_endpoint()
+                flush_buffer_if_ready()
+                return
+            
+            # interim 결과는 문장 버퍼에 넣지 않음 (is_final 결과만 누적)
+            is_interim = getattr(message, "is_final", None) is False
+            if is_interim and not session.wants_interim():
+                return
+            
             if hasattr(message, "channel") and message.channel:
                 channel = message.channel[0] if isinstance(message.channel, list) else message.channel
                 if hasattr(channel, "alternatives") and channel.alternatives:
                     alt = channel.alternatives[0]
                     transcript = getattr(alt, "transcript", "")
                     # 후처리: 지혁 → 지옥 교정
-                    transcript = _correct_common_errors(transcript)
+                    transcript = models.correct_common_errors(transcript)
                     
                     if not transcript or not transcript.strip():
                         return
                     
-                    # 화자 구분 (실시간)
-                    speaker_id = get_major_speaker(alt)
-                    speaker_label = stabilize_speaker(speaker_id, transcript)
+                    # interim 결과: 임시 자막만 전송 (화자/버퍼 상태는 건드리지 않음)
+                    if is_interim:
+                        words = getattr(alt, "words", None) or []
+                        interim_start = float(getattr(words[0], "start", 0.0)) if words else 0.0
+                        interim_end = float(getattr(words[-1], "end", interim_start + 1.0)) if words else interim_start + 1.0
+                        if stt_stream.is_before_seek(interim_end):
+                            return  # seek 이전 위치의 결과
+                        push_provisional(transcript, stt_stream.to_asset_time(interim_start), stt_stream.to_asset_time(interim_end))
+                        return
+                    
+                    # STT 재연결 후 다시 보낸 구간의 중복 단어 제거 (이미 자막으로 확정한 시각까지)
+                    words = list(getattr(alt, "words", None) or [])
+                    if words:
+                        fresh = stt_stream.fresh_words(words)
+                        if not fresh:
+                            return
+                        if len(fresh) < len(words):
+                            words = fresh
+                            alt = SimpleNamespace(words=fresh)
+                            transcript = models.correct_common_errors(
+                                " ".join(getattr(w, "punctuated_word", None) or getattr(w, "word", "") for w in fresh)
+                            )
                     
                     # 시간 정보 추출 (스트리밍 시작 시간 기준 상대 시간)
-                    if hasattr(alt, "words") and alt.words:
-                        deepgram_start = float(alt.words[0].start if hasattr(alt.words[0], "start") else 0.0)
-                        deepgram_end = float(alt.words[-1].end if hasattr(alt.words[-1], "end") else deepgram_start + 1.0)
+                    if words:
+                        deepgram_start = float(words[0].start if hasattr(words[0], "start") else 0.0)
+                        deepgram_end = float(words[-1].end if hasattr(words[-1], "end") else deepgram_start + 1.0)
                     else:
                         deepgram_start = 0.0
                         deepgram_end = deepgram_start + 1.0
                     
-                    # 오디오 재생 시간으로 변환 (Deepgram 타임스탬프 + 오디오 재생 시작 시간)
-                    start = deepgram_start + audio_playback_start_time
-                    end = deepgram_end + audio_playback_start_time
+                    # seek 이전 위치의 오디오에 대한 결과는 버림 (이미 다른 구간으로 이동함)
+                    if stt_stream.is_before_seek(deepgram_end):
+                        return
+                    
+                    # 오디오 재생 시간으로 변환 (Deepgram 타임스탬프 → 구간별 에셋 시간)
+                    start = stt_stream.to_asset_time(deepgram_start)
+                    end = stt_stream.to_asset_time(deepgram_end)
+                    stt_stream.mark_final(end)
+                    
+                    # 화자 구분 (실시간, 화자 임베딩을 쓰면 Deepgram 화자 id 대신 에셋 단위 인물 번호)
+                    if asset_speakers is not None:
+                        # 캐시 조회만 여기서 (없으면 executor 에서 계산, 그동안은 Deepgram 화자로 표시)
+                        speaker_id = asset_speakers.cached_label(start, end)
+                        deepgram_key = deepgram_speaker_key(speakers.get_major_speaker(alt))
+                        if speaker_id is not None:
+                            speakers.pin(speaker_id, speaker_id)
+                            if deepgram_key is not None:
+                                speakers.pin(deepgram_key, speaker_id)
+                        else:
+                            if end - start >= MIN_EMBED_SECONDS:
+                                request_speaker_label(start, end, deepgram_key)
+                            speaker_id = deepgram_key
+                    else:
+                        speaker_id = speakers.get_major_speaker(alt)
+                    speaker_label = speakers.stabilize_speaker(speaker_id, transcript)
                     
-                    # 버퍼에 세그먼트 추가 (화자 변경 시 기존 버퍼 플러시)
+                    # 버퍼에 세그먼트 추가 (화자 변경 시 기존 버퍼 먼저 플러시)
                     if sentence_buffer.speaker_label is not None and sentence_buffer.speaker_label != speaker_label:
-                        # 화자가 바뀌면 기존 버퍼 플러시
-                        asyncio.create_task(flush_buffer_if_ready())
+                        # 화자가 바뀌면 기존 버퍼 플러시 (새 화자 텍스트와 섞이지 않도록 추가 전에)
+                        flush_buffer_if_ready(force=True)
                     
                     sentence_buffer.add_segment(transcript, speaker_label, start, end)
                     
+                    # 발화가 끝났다는 Deepgram 신호 (endpointing)
+                    if getattr(message, "speech_final", False):
+                        sentence_buffer.mark_endpoint()
+                    
                     # 문장이 완성되었는지 확인
-                    if sentence_buffer.should_flush():
-                        asyncio.create_task(flush_buffer_if_ready())
+                    flush_buffer_if_ready()
                         
         except Exception as e:
-            print(f"[Video Analyzer] 메시지 처리 오류: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("메시지 처리 오류: %s", e, extra={"category": "stt"})
     
     try:
-        async with deepgram_client.listen.v1.connect(
-            model="nova-2",
-            language="ko-KR",
-            encoding="linear16",
-            sample_rate="16000",
-            smart_format="true",
-            punctuate=True,  # 문장 부호 추가 (정확도 향상)
-            endpointing=300,  # 발화 종료 대기 시간 (ms) - 짧은 끊김 방지
-            diarize=True,  # 화자 구분 활성화
-            vad_events=True,  # Voice Activity Detection 활성화 (작은 소리도 감지)
-        ) as connection:
-            connection.on(EventType.OPEN, on_open)
-            connection.on(EventType.MESSAGE, on_message)
-            
-            listen_task = asyncio.create_task(connection.start_listening())
-            await asyncio.wait_for(connection_opened.wait(), timeout=15.0)
+        # Deepgram 은 연결 풀에서 미리 열어 둔 연결 사용, 재생 백엔드는 녹화된 전사 결과, 로컬 CPU 는 워커 풀 사용
+        # 블록이 끝나면 연결을 닫음 (도중에 끊기면 재연결 + 최근 오디오 재전송)
+        stt_backend = _make_stt_backend(audio_path)
+        stt_stream = SttStream(stt_backend, on_message, start_time=audio_playback_start_time)
+        async with stt_stream as connection:
+            logger.info(f"✅ STT 연결 완료 ({stt_backend.name}): {audio_name}")
             
-            # 버퍼 타임아웃 모니터링 시작
-            buffer_flush_task = asyncio.create_task(buffer_timeout_monitor())
+            # 자막 전송 파이프라인 시작
+            caption_pipeline.start()
             
             # 오디오 파일을 librosa로 직접 읽어서 Deepgram으로 전송
-            print(f"[Video Analyzer] ✅ 오디오 스트리밍 시작: {audio_path}")
+            logger.info(f"✅ 오디오 스트리밍 시작: {audio_path}")
             
             async def send_audio_stream():
-                nonlocal stream_start_time, audio_path
+                nonlocal stream_start_time, audio_path, last_message_time, wait_start
                 try:
                     stream_start_time = asyncio.get_event_loop().time()
                     
                     # 오디오 파일 확장자 확인
                     file_ext = os.path.splitext(audio_path)[1].lower()
-                    print(f"[Video Analyzer] 🎵 오디오 파일 스트리밍: {file_ext}")
+                    logger.info(f"🎵 오디오 파일 스트리밍: {file_ext}")
                     
                     # MP4는 비디오 파일이므로 오디오 파일(WAV 등)을 사용해야 함
                     if file_ext in ['.mp4', '.mov', '.avi', '.mkv', '.flv', '.webm']:
@@ -618,14 +904,14 @@ async def start_realtime_analysis(audio_path: str, audio_name: str, websocket: W
                         if not os.path.exists(wav_path):
                             # WAV 파일이 없으면 오류
                             error_msg = f"비디오 파일({file_ext})은 지원하지 않습니다. 오디오 파일(.wav)을 사용하세요. WAV 파일을 찾을 수 없습니다: {wav_path}"
-                            print(f"[Video Analyzer] ❌ {error_msg}")
-                            await websocket.send_json({"error": error_msg})
+                            logger.error(f"❌ {error_msg}")
+                            session.publish({"error": error_msg})
                             return
                         
                         # WAV 파일 사용
                         audio_path = wav_path
                         file_ext = '.wav'
-                        print(f"[Video Analyzer] 🔄 WAV 파일로 변경: {wav_path}")
+                        logger.info(f"🔄 WAV 파일로 변경: {wav_path}")
                     
                     # PyAudio처럼: WAV 파일을 직접 읽어서 Deepgram으로 전송 (변환 없이)
                     # WAV 파일은 이미 16kHz mono 16-bit로 준비되어 있어야 함
@@ -638,13 +924,13 @@ async def start_realtime_analysis(audio_path: str, audio_name: str, websocket: W
                         sample_width = wav_file.getsampwidth()
                         frames = wav_file.getnframes()
                         
-                        print(f"[Video Analyzer] 🎵 WAV 파일 정보: {sample_rate}Hz, {channels}ch, {sample_width*8}-bit, {frames} frames")
+                        logger.info(f"🎵 WAV 파일 정보: {sample_rate}Hz, {channels}ch, {sample_width*8}-bit, {frames} frames")
                         
                         # 형식 확인 (16kHz mono 16-bit)
                         if sample_rate != 16000 or channels != 1 or sample_width != 2:
                             error_msg = f"WAV 파일 형식이 맞지 않습니다. 16kHz mono 16-bit가 필요합니다. (현재: {sample_rate}Hz, {channels}ch, {sample_width*8}-bit)"
-                            print(f"[Video Analyzer] ❌ {error_msg}")
-                            await websocket.send_json({"error": error_msg})
+                            logger.error(f"❌ {error_msg}")
+                            session.publish({"error": error_msg})
                             return
                         
                         # DX_Project_2 PyAudio와 동일한 설정
@@ -657,35 +943,91 @@ async def start_realtime_analysis(audio_path: str, audio_name: str, websocket: W
                         if audio_playback_start_time > 0:
                             skip_frames = int(audio_playback_start_time * 16000)
                             wav_file.setpos(skip_frames)
-                            print(f"[Video Analyzer] ⏩ {skip_frames} frames 건너뛰기 ({audio_playback_start_time:.2f}초)")
+                            logger.info(f"⏩ {skip_frames} frames 건너뛰기 ({audio_playback_start_time:.2f}초)")
                         else:
-                            print(f"[Video Analyzer] 🎵 오디오 스트리밍 처음부터 시작 (audio_start_time=0.0)")
+                            logger.info(f"🎵 오디오 스트리밍 처음부터 시작 (audio_start_time=0.0)")
                         
-                        print(f"[Video Analyzer] 🎵 WAV 파일 직접 스트리밍 시작 (DX_Project_2와 동일)")
-                        print(f"[Video Analyzer] 📡 즉시 오디오 스트리밍 시작 → Deepgram 자막 생성 중...")
+                        logger.info(f"🎵 WAV 파일 직접 스트리밍 시작 (DX_Project_2와 동일)")
+                        logger.info(f"📡 즉시 오디오 스트리밍 시작 → Deepgram 자막 생성 중...")
                         
                         # DX_Project_2 PyAudio와 동일한 방식: 1024 bytes 읽기 → 즉시 전송 → 0.01초 딜레이
                         file_ended = False
                         
                         # 오디오 강도 추적용 변수
-                        nonlocal audio_intensity_buffer, bgm_sfx_buffer
+                        nonlocal audio_intensity_buffer
                         chunk_index = 0  # 청크 인덱스 (시간 계산용)
+                        chunk_base_time = audio_playback_start_time  # chunk_index 0 의 에셋 시간 (seek 하면 변경)
+                        last_keepalive = 0.0
+                        gate_finalize_pending = False  # 음성 게이트가 닫힘 → 무음이 endpointing 보다 길어지면 Finalize
+                        
+                        async def keep_alive(now: float):
+                            """오디오를 보내지 않는 동안 주기적으로 KeepAlive 전송"""
+                            nonlocal last_keepalive
+                            if now - last_keepalive >= STT_KEEPALIVE_INTERVAL:
+                                await connection.keep_alive()
+                                last_keepalive = now
                         
                         try:
                             while True:
+                                loop_now = asyncio.get_event_loop().time()
+                                
+                                # seek: Deepgram 연결은 그대로 두고 읽기 위치만 이동
+                                if session.pending_seek is not None:
+                                    target = session.pending_seek
+                                    session.pending_seek = None
+                                    # 이전 위치의 문장은 확정 (타임스탬프는 이전 구간 기준으로 이미 변환됨)
+                                    flush_buffer_if_ready(force=True)
+                                    wav_file.setpos(min(int(target * 16000), frames))
+                                    connection.mark_seek()
+                                    sent_captions.reset()
+                                    if audio_gate is not None:
+                                        audio_gate.reset()
+                                    chunk_base_time = target
+                                    chunk_index = 0
+                                    file_ended = False
+                                    audio_eof.clear()
+                                    finalized.clear()
+                                    gate_finalize_pending = False
+                                    wait_start = loop_now
+                                    if bgm_analyzer is not None:
+                                        bgm_analyzer.reset()
+                                    bgm_timeline.seek(target)
+                                    sfx_timeline.seek(target)
+                                    logger.info(f"⏩ 스트리밍 위치 이동: {target:.2f}초 (Deepgram 연결 유지)")
+                                
+                                # 일시정지: 오디오(무음 포함)를 보내지 않고 KeepAlive 로 연결만 유지
+                                if session.paused:
+                                    await keep_alive(loop_now)
+                                    last_message_time = loop_now
+                                    if wait_start is not None:
+                                        wait_start += 0.1
+                                    await asyncio.sleep(0.1)
+                                    continue
+                                
                                 # 청크 읽기 (1024 bytes = 512 frames, DX_Project_2와 동일)
                                 chunk_bytes = wav_file.readframes(chunk_frames)
                                 
                                 if len(chunk_bytes) == 0:
-                                    # 파일 끝 - 무음을 보내서 연결 유지 (비디오가 끝날 때까지)
+                                    # 파일 끝 - 무음 대신 Finalize 로 남은 결과를 요청하고 종료(또는 seek)를 기다림
                                     if not file_ended:
-                                        print("[Video Analyzer] ✅ WAV 파일 스트리밍 완료 (연결 유지 중)")
+                                        logger.info("✅ WAV 파일 스트리밍 완료 → Finalize 요청")
+                                        if audio_gate is not None:
+                                            logger.info(
+                                                f"🔇 음성 게이트: 세션 {audio_gate.metrics()} / "
+                                                f"에셋 누적 {gate_asset_metrics(session.key[0])}"
+                                            )
                                         file_ended = True
-                                    # 무음 청크 생성 (1024 bytes = 512 frames of silence)
-                                    chunk_bytes = b'\x00' * chunk_bytes_size
+                                        session.mark_complete()
+                                        await connection.finalize()
+                                        last_keepalive = loop_now
+                                        audio_eof.set()
+                                    await keep_alive(loop_now)
+                                    await asyncio.sleep(0.1)
+                                    continue
                                 
                                 # 현재 시간 계산 (강도 추적용)
-                                current_time = chunk_index * (chunk_frames / 16000.0) + audio_playback_start_time
+                                current_time = chunk_index * (chunk_frames / 16000.0) + chunk_base_time
+                                session.position = current_time
                                 
                                 # 오디오 강도 계산 (자막에 사용)
                                 if len(chunk_bytes) > 0:
@@ -701,29 +1043,28 @@ async def start_realtime_analysis(audio_path: str, audio_name: str, websocket: W
                                         audio_intensity_buffer[round(current_time, 2)] = intensity_value
                                         
                                         # PANNs BGM/SFX 분석 (비동기로 실행하여 블로킹 방지)
-                                        if USE_PANNS_BGM:
+                                        if bgm_analyzer is not None:
                                             try:
-                                                # analyze_bgm_chunk 호출 (내부 상태 업데이트)
-                                                analyze_bgm_chunk(chunk_bytes, in_sr=16000)
+                                                # 세션의 분석기 상태 업데이트
+                                                bgm_analyzer.analyze_chunk(chunk_bytes, in_sr=16000)
                                                 
-                                                # 전역 변수에서 현재 BGM/SFX 값 읽기 (변경이 없어도 최신 값 유지)
-                                                current_bgm = getattr(panns_module, 'current_bgm_text', '')
-                                                current_sfx = getattr(panns_module, 'current_sfx_text', '')
+                                                # 현재 BGM/SFX 값 읽기 (변경이 없어도 최신 값 유지)
+                                                current_bgm = bgm_analyzer.current_bgm_text
+                                                current_sfx = bgm_analyzer.current_sfx_text
                                                 
-                                                # BGM/SFX가 있으면 버퍼에 저장 (항상 최신 값 유지)
+                                                # 타임라인에 기록 (값이 바뀔 때만 새 구간이 생김)
+                                                chunk_end_time = current_time + chunk_frames / 16000.0
+                                                bgm_timeline.update(current_time, chunk_end_time, current_bgm)
+                                                sfx_timeline.update(current_time, chunk_end_time, current_sfx)
                                                 if current_bgm or current_sfx:
-                                                    bgm_sfx_buffer[round(current_time, 2)] = {
-                                                        'bgm': current_bgm if current_bgm else None,
-                                                        'sfx': current_sfx if current_sfx else None
-                                                    }
-                                                    # 디버깅 로그 (주기적으로만 출력)
-                                                    if chunk_index % 100 == 0:  # 100번째 청크마다 로그
-                                                        print(f"[Video Analyzer] 🎵 BGM/SFX 분석: 시간={round(current_time, 2)}s, BGM={current_bgm}, SFX={current_sfx}")
+                                                    # 디버깅 로그 (청크마다 호출, 카테고리별 초당 개수 제한)
+                                                    logger.debug(
+                                                        "🎵 BGM/SFX 분석: 시간=%.2fs, BGM=%s, SFX=%s", current_time, current_bgm, current_sfx,
+                                                        extra={"category": "bgm"},
+                                                    )
                                             except Exception as bgm_error:
-                                                # BGM 분석 실패 시 로그 출력
-                                                if chunk_index % 100 == 0:  # 에러도 주기적으로만 출력
-                                                    print(f"[Video Analyzer] ⚠️ BGM 분석 실패: {bgm_error}")
-                                                pass
+                                                # BGM 분석 실패 시 로그 출력 (청크마다 실패할 수 있으므로 초당 개수 제한)
+                                                logger.warning("⚠️ BGM 분석 실패: %s", bgm_error, extra={"category": "bgm"})
                                     except Exception:
                                         # 오류 발생 시 기본값 사용
                                         audio_intensity_buffer[round(current_time, 2)] = 0.5
@@ -737,40 +1078,47 @@ async def start_realtime_analysis(audio_path: str, audio_name: str, websocket: W
                                     for key in sorted_keys[:500]:
                                         del audio_intensity_buffer[key]
                                 
-                                # 오래된 BGM/SFX 데이터 정리 (메모리 절약)
-                                if len(bgm_sfx_buffer) > 1000:
-                                    # 가장 오래된 500개 제거
-                                    sorted_keys = sorted(bgm_sfx_buffer.keys())
-                                    for key in sorted_keys[:500]:
-                                        del bgm_sfx_buffer[key]
-                                
-                                # DX_Project_2와 동일: Deepgram으로 즉시 전송
-                                if len(chunk_bytes) > 0:
-                                    try:
-                                        await connection.send_media(chunk_bytes)
-                                    except Exception as send_error:
-                                        # 연결이 닫혔으면 정상 종료
-                                        if "1000" in str(send_error) or "ConnectionClosed" in str(type(send_error).__name__):
-                                            print("[Video Analyzer] ✅ Deepgram 연결 정상 종료")
-                                            break
-                                        raise
+                                # DX_Project_2와 동일: Deepgram으로 즉시 전송 (음성 게이트가 닫힌 구간은 건너뜀)
+                                if audio_gate is not None:
+                                    gate_was_active = audio_gate.active
+                                    to_send = audio_gate.process(chunk_bytes, current_time)
+                                else:
+                                    gate_was_active = False
+                                    to_send = [(current_time, chunk_bytes)]
+                                try:
+                                    for send_time, send_bytes in to_send:
+                                        await connection.send_media(send_bytes, send_time)
+                                        last_keepalive = loop_now
+                                    if to_send:
+                                        gate_finalize_pending = False
+                                    else:
+                                        last_message_time = loop_now  # 보낸 오디오가 없으니 결과가 없는 게 정상
+                                        if gate_was_active:
+                                            gate_finalize_pending = True
+                                        if (gate_finalize_pending and audio_gate.silence_seconds
+                                                >= audio_gate.hangover + STT_ENDPOINTING_MS / 1000.0):
+                                            # hangover 이후에도 endpointing 보다 긴 무음 → 발화가 끝남, 남은 결과를 바로 받음
+                                            # (짧은 멈춤마다 Finalize 하면 문장이 중간에 잘림)
+                                            gate_finalize_pending = False
+                                            await connection.finalize()
+                                        await keep_alive(loop_now)
+                                except ConnectionError as send_error:
+                                    # 끊긴 연결은 stt_stream 이 재연결하므로 여기까지 오면 복구 실패
+                                    logger.error(f"❌ Deepgram 연결 복구 실패: {send_error}")
+                                    break
                                 
-                                # DX_Project_2 PyAudio와 동일한 딜레이 (0.01초)
-                                await asyncio.sleep(0.01)
+                                # DX_Project_2 PyAudio와 동일한 딜레이 (0.01초, 시청자 배속만큼 줄임)
+                                await asyncio.sleep(0.01 / session.rate)
                         except Exception as stream_error:
                             # 연결 종료는 정상적인 경우이므로 무시
                             if "1000" in str(stream_error) or "ConnectionClosed" in str(type(stream_error).__name__):
-                                print("[Video Analyzer] ✅ 오디오 스트리밍 정상 종료")
+                                logger.info("✅ 오디오 스트리밍 정상 종료")
                             else:
-                                print(f"[Video Analyzer] ❌ 스트리밍 오류: {stream_error}")
-                                import traceback
-                                traceback.print_exc()
+                                logger.exception(f"❌ 스트리밍 오류: {stream_error}")
                                 raise
                     
                 except Exception as e:
-                    print(f"[Video Analyzer] 오디오 스트리밍 오류: {e}")
-                    import traceback
-                    traceback.print_exc()
+                    logger.exception(f"오디오 스트리밍 오류: {e}")
             
             # 오디오 스트리밍을 백그라운드 태스크로 실행 (블로킹 방지, 즉시 시작)
             stream_task = asyncio.create_task(send_audio_stream())
@@ -781,90 +1129,194 @@ async def start_realtime_analysis(audio_path: str, audio_name: str, websocket: W
             try:
                 with wave.open(audio_path, 'rb') as wav_check:
                     wav_duration = wav_check.getnframes() / wav_check.getframerate()
-                    print(f"[Video Analyzer] ⏱️ WAV 파일 길이: {wav_duration:.2f}초")
+                    logger.info(f"⏱️ WAV 파일 길이: {wav_duration:.2f}초")
             except:
                 wav_duration = 300.0  # 기본값 5분
             
             wait_start = asyncio.get_event_loop().time()
-            file_ended_time = None
+            eof_time = None  # Finalize 요청 시각 (seek 으로 다시 스트리밍하면 초기화)
             
             while True:
                 await asyncio.sleep(0.1)
+                now = asyncio.get_event_loop().time()
+                
+                # 시청자가 모두 나간 경우 종료
+                if connection_closed or session.stopped:
+                    logger.warning("🔌 시청자 없음 → 분석 중단")
+                    break
                 
-                # 스트리밍 태스크가 완료되었는지 확인
+                # 스트리밍 태스크가 파일 끝 전에 끝남 (Deepgram 연결 종료/오류)
                 if stream_task.done():
-                    if file_ended_time is None:
-                        file_ended_time = asyncio.get_event_loop().time()
-                        print(f"[Video Analyzer] ✅ WAV 파일 스트리밍 완료, 연결 유지 중...")
-                    
-                    # 파일이 끝난 후에도 최소 5초 더 대기 (비디오가 끝날 때까지)
-                    if asyncio.get_event_loop().time() - file_ended_time > 5.0:
-                        # 마지막 메시지가 3초 이상 전이면 종료
-                        if last_message_time:
-                            if asyncio.get_event_loop().time() - last_message_time > 3.0:
-                                print("[Video Analyzer] ✅ 메시지 수신 종료 (3초 이상 메시지 없음)")
-                                break
-                        # 파일이 끝난 후 10초 이상 지나면 종료
-                        if asyncio.get_event_loop().time() - file_ended_time > 10.0:
-                            print("[Video Analyzer] ✅ 타임아웃 종료 (파일 종료 후 10초)")
-                            break
-                else:
-                    # 스트리밍 중일 때는 메시지 타임아웃만 체크 (더 긴 타임아웃)
-                    if last_message_time:
-                        if asyncio.get_event_loop().time() - last_message_time > 10.0:
-                            print("[Video Analyzer] ⚠️ 메시지 수신 타임아웃 (10초 이상 메시지 없음)")
-                            break
+                    logger.warning("⚠️ 오디오 스트리밍 종료 → 분석 종료")
+                    break
+                
+                # 파일 끝: Finalize 결과(마지막 final)를 기다림 (최대 STT_FINALIZE_TIMEOUT 초)
+                if audio_eof.is_set():
+                    if eof_time is None:
+                        eof_time = now
+                    if finalized.is_set():
+                        logger.info("✅ 마지막 자막 수신 완료 (Finalize)")
+                        break
+                    if now - eof_time > STT_FINALIZE_TIMEOUT:
+                        logger.info(f"✅ Finalize 대기 타임아웃 ({STT_FINALIZE_TIMEOUT:.0f}초) → 종료")
+                        break
+                    continue
+                eof_time = None
+                
+                # 스트리밍 중에는 메시지 타임아웃 체크
+                if last_message_time and now - last_message_time > 10.0:
+                    logger.warning("⚠️ 메시지 수신 타임아웃 (10초 이상 메시지 없음)")
+                    break
                 
                 # 전체 타임아웃 (WAV 파일 길이 + 여유 시간 20초)
                 max_wait_time = wav_duration + 20.0
-                if asyncio.get_event_loop().time() - wait_start > max_wait_time:
-                    print(f"[Video Analyzer] ✅ 전체 타임아웃 종료 ({max_wait_time:.1f}초)")
+                if now - wait_start > max_wait_time:
+                    logger.info(f"✅ 전체 타임아웃 종료 ({max_wait_time:.1f}초)")
                     break
             
-            # 버퍼 플러시 태스크 종료
-            if buffer_flush_task and not buffer_flush_task.done():
-                buffer_flush_task.cancel()
-                try:
-                    await buffer_flush_task
-                except asyncio.CancelledError:
-                    pass
+            # 남은 버퍼 내용 전송 후 자막 전송 태스크 종료
+            flush_buffer_if_ready(force=True)
+            await caption_pipeline.close(timeout=10.0)
             
-            # 남은 버퍼 내용 전송
-            if sentence_buffer.text:
-                await flush_buffer_if_ready()
+            # 처음부터 끝까지 한 번에 분석했으면 자막 트랙 저장 (다음 시청자는 디스크에서 재생)
+            # seek 으로 producer 를 옮긴 세션은 로그가 [0, 끝] 을 이어서 덮지 않으므로 저장하지 않음
+            if (session.complete and not session.stopped and not session.seeked
+                    and session.start_offset == 0.0 and audio_path.lower().endswith('.wav')):
+                await asyncio.get_event_loop().run_in_executor(
+                    None, save_track, audio_path, session.key[1], list(session.log)
+                )
+            # 이후 늦게 온 시청자용으로는 최근 구간 로그만 보관 (앞부분은 디스크 트랙에서 재생)
+            session.release_log()
             
-            listen_task.cancel()
             if not stream_task.done():
                 stream_task.cancel()
             
     except Exception as e:
-        print(f"[Video Analyzer] STT 오류: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"STT 오류: {e}")
     finally:
-        if audio_name in video_streams:
-            del video_streams[audio_name]
+        sentence_buffer.reset()
+        caption_pipeline.cancel()
+        if asset_speakers is not None:
+            await asyncio.get_event_loop().run_in_executor(None, asset_speakers.save)
+
+@app.get("/api/metrics")
+async def metrics_endpoint():
+    """클라이언트별 송신 대기열 상태 (대기열 길이, drop 수 등) + 공유 분석 세션 상태 + STT 연결 풀 / 로컬 STT 처리량"""
+    return {
+        "clients": [
+            {"client": f"{ws.client.host}:{ws.client.port}" if ws.client else None, **s.metrics()}
+            for ws, s in client_senders.items()
+        ],
+        "sessions": analysis_hub.metrics(),
+        "audio_gate_assets": gate_asset_metrics(),
+        "stt_pool": stt_pool.metrics() if stt_pool is not None else None,
+        "local_stt": models.local_stt_pool.metrics() if models.local_stt_pool is not None else None,
+    }
 
 @app.post("/api/analyze-video")
 async def analyze_video_endpoint(request: VideoAnalysisRequest):
-    """비디오 분석 시작 (실시간 스트리밍)"""
+    """비디오 오프라인 분석 작업 등록 (워커가 실시간 페이싱 없이 에셋 전체 분석 → 자막 트랙 저장)
+    
+    같은 에셋(내용 해시)/모드의 작업이 이미 있으면 기존 job_id 를 돌려준다 (deduplicated=True).
+    완료된 작업은 지금 버전의 자막 트랙이 디스크에 남아 있을 때만 중복으로 본다.
+    진행 상황은 GET /api/analyze-video/{job_id} 로 조회한다.
+    (작업 큐는 SQLite 잠금을 기다릴 수 있으므로 이벤트 루프 밖에서 호출)
+    """
     video_path = request.video_path
     if not os.path.isabs(video_path):
         backend_dir = Path(__file__).parent
         project_root = backend_dir.parent
         video_path = str(project_root / video_path)
     
+    # MP4 가 들어오면 같은 이름의 WAV 사용 (WebSocket 과 동일)
+    if video_path.lower().endswith('.mp4'):
+        video_path = video_path.rsplit('.', 1)[0] + '.wav'
+    
     if not os.path.exists(video_path):
         return {"error": f"비디오 파일을 찾을 수 없습니다: {video_path}"}
     
-    analyzing.add(request.video_name)
+    mode = models.content_mode(request.video_name)
+    asset_hash = await asyncio.get_event_loop().run_in_executor(None, file_content_hash, video_path)
+    # 트랙 파일이 지워졌거나 PIPELINE_VERSION 이 바뀌었으면 완료된 작업이 있어도 다시 분석
+    force = request.force
+    if not force:
+        force = await asyncio.get_event_loop().run_in_executor(None, load_track, video_path, mode) is None
+    job_id, deduplicated = await asyncio.to_thread(
+        job_queue.enqueue,
+        request.video_name,
+        video_path,
+        asset_hash,
+        mode,
+        stt=request.stt,
+        priority=request.priority,
+        scheduled_at=request.scheduled_at,
+        force=force,
+    )
+    job = await asyncio.to_thread(job_queue.get, job_id)
     
     return {
-        "status": "started",
+        "status": job["status"],
+        "job_id": job_id,
+        "deduplicated": deduplicated,
         "video_name": request.video_name,
-        "message": "비디오 분석이 시작되었습니다. WebSocket으로 연결하세요."
+        "message": "비디오 분석 작업이 등록되었습니다. 진행 상황은 /api/analyze-video/{job_id} 로 확인하세요."
     }
 
+@app.get("/api/analyze-video/{job_id}")
+async def analyze_video_status_endpoint(job_id: str):
+    """오프라인 분석 작업 상태 / 진행률 / 단계별 소요 시간"""
+    job = await asyncio.to_thread(job_queue.get, job_id)
+    if job is None:
+        return {"error": f"분석 작업을 찾을 수 없습니다: {job_id}"}
+    return job
+
+@app.delete("/api/analyze-video/{job_id}")
+async def cancel_analyze_video_endpoint(job_id: str):
+    """오프라인 분석 작업 취소 (실행 중이면 다음 단계 경계에서 중단)"""
+    status = await asyncio.to_thread(job_queue.cancel, job_id)
+    if status is None:
+        return {"error": f"분석 작업을 찾을 수 없습니다: {job_id}"}
+    return {"job_id": job_id, "status": status}
+
+@app.get("/api/captions/{asset}")
+async def captions_range_endpoint(
+    asset: str,
+    request: Request,
+    t0: float = Query(0.0, alias="from"),
+    t1: Optional[float] = Query(None, alias="to"),
+):
+    """분석이 끝난 에셋의 자막 구간 조회 [from, to] (초) - 캐시된 자막 트랙에서 바로 응답
+    
+    ETag / If-None-Match 지원 (트랙이 바뀌지 않았으면 304), 큰 응답은 gzip 압축.
+    """
+    audio_name, audio_path = _resolve_asset(asset)
+    if not os.path.exists(audio_path):
+        return JSONResponse({"error": f"오디오 파일을 찾을 수 없습니다: {audio_name}"}, status_code=404)
+    
+    mode = models.content_mode(audio_name)
+    index = await asyncio.get_event_loop().run_in_executor(None, load_index, audio_path, mode)
+    if index is None:
+        return JSONResponse({"error": f"분석된 자막 트랙이 없습니다: {audio_name}"}, status_code=404)
+    
+    if t1 is None:
+        t1 = float("inf")
+    etag = f'"{index.etag}-{t0:g}-{t1:g}"'
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=60"}
+    if_none_match = [e.strip().removeprefix("W/") for e in request.headers.get("if-none-match", "").split(",")]
+    if etag in if_none_match or "*" in if_none_match:
+        return Response(status_code=304, headers=headers)
+    
+    return JSONResponse(
+        {
+            "asset": audio_name,
+            "mode": mode,
+            "from": t0,
+            "to": t1 if t1 != float("inf") else None,
+            "captions": index.window(t0, t1),
+        },
+        headers=headers,
+    )
+
 @app.websocket("/ws/video-captions")
 async def video_captions_ws(websocket: WebSocket):
     """비디오 자막 WebSocket (실시간 스트리밍)"""
@@ -881,7 +1333,7 @@ async def video_captions_ws(websocket: WebSocket):
             init_data = await asyncio.wait_for(websocket.receive_json(), timeout=5.0)
         except asyncio.TimeoutError:
             # 타임아웃 시 기본값 사용 (연결만으로도 시작 가능)
-            print("[Video Analyzer] ⚠️ 초기 메시지 타임아웃, 기본값 사용")
+            logger.warning("⚠️ 초기 메시지 타임아웃, 기본값 사용")
             init_data = {}
         
         audio_name = init_data.get("audio_name") or init_data.get("video_name")  # 하위 호환성
@@ -889,7 +1341,7 @@ async def video_captions_ws(websocket: WebSocket):
         
         if not audio_name:
             # audio_name이 없으면 연결만 유지 (나중에 메시지로 받을 수 있음)
-            print("[Video Analyzer] ⚠️ audio_name이 없습니다. 연결 유지 중...")
+            logger.warning("⚠️ audio_name이 없습니다. 연결 유지 중...")
             # 메시지 대기 루프
             while True:
                 try:
@@ -904,18 +1356,7 @@ async def video_captions_ws(websocket: WebSocket):
         
         if action == "start":
             # 오디오 파일 경로 찾기
-            backend_dir = Path(__file__).parent
-            project_root = backend_dir.parent
-            
-            # MP4 파일명이 들어오면 해당하는 WAV 파일 사용 (오디오는 WAV 파일만 사용)
-            if audio_name.endswith('.mp4') or audio_name.endswith('.MP4'):
-                # MP4 파일명에서 확장자 제거하고 .wav 추가
-                wav_name = audio_name.rsplit('.', 1)[0] + '.wav'
-                audio_path = str(project_root / f"frontend/deaftv_lgdxschool_projects/assets/{wav_name}")
-                audio_name = wav_name
-                print(f"[Video Analyzer] 🔄 MP4 파일명 감지, {wav_name} 사용")
-            else:
-                audio_path = str(project_root / f"frontend/deaftv_lgdxschool_projects/assets/{audio_name}")
+            audio_name, audio_path = _resolve_asset(audio_name)
             
             if not os.path.exists(audio_path):
                 await websocket.send_json({"error": f"오디오 파일을 찾을 수 없습니다: {audio_path}"})
@@ -923,837 +1364,33 @@ async def video_captions_ws(websocket: WebSocket):
             
             # 오디오 재생 시작 시간 받기 (초 단위, 기본값 0.0)
             audio_start_time = float(init_data.get("audio_start_time") or init_data.get("video_start_time", 0.0))
-            print(f"[Video Analyzer] 🚀 즉시 오디오 스트리밍 시작: {audio_name} (시작 시간: {audio_start_time:.2f}초)")
+            logger.info(f"🚀 즉시 오디오 스트리밍 시작: {audio_name} (시작 시간: {audio_start_time:.2f}초)")
+            
+            # 임시(interim) 자막 사용 여부 (opt-in)
+            interim_captions = bool(init_data.get("interim_captions", False))
+            # 감정 분석 대기 시간 (ms, 미지정 시 서버 기본값)
+            emotion_wait_ms = init_data.get("emotion_wait_ms")
+            emotion_wait_time = float(emotion_wait_ms) / 1000.0 if emotion_wait_ms is not None else None
+            # 전송 포맷 ("json" 기본, "msgpack" 요청 가능)
+            wire_format = str(init_data.get("wire_format", "json")).lower()
             
             # 실시간 분석 시작 (즉시 오디오 스트리밍 시작)
             video_streams[audio_name] = {"websocket": websocket}
-            await start_realtime_analysis(audio_path, audio_name, websocket, audio_start_time)
+            await start_realtime_analysis(
+                audio_path, audio_name, websocket, audio_start_time, interim_captions, emotion_wait_time,
+                wire_format
+            )
         
     except WebSocketDisconnect:
         connected_clients.discard(websocket)
         if audio_name and audio_name in video_streams:
             del video_streams[audio_name]
     except Exception as e:
-        print(f"[Video Analyzer] WebSocket 오류: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"WebSocket 오류: {e}")
         connected_clients.discard(websocket)
         if audio_name and audio_name in video_streams:
             del video_streams[audio_name]
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8002)
-
-# DX_Project_2 방식: ai_engine 감정 분석 사용
-try:
-    import sys
-    import os
-    # ai_engine 경로 추가
-    ai_engine_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'ai_engine')
-    if os.path.exists(ai_engine_path):
-        sys.path.insert(0, os.path.dirname(ai_engine_path))
-        from ai_engine.emotion_wrapper import analyze_emotion
-        from ai_engine.kluebert_emotion import EMOTION_ICON
-        print("[Video Analyzer] ✅ ai_engine 감정 분석 모듈 로드 성공")
-        USE_AI_ENGINE_EMOTION = True
-    else:
-        print("[Video Analyzer] ⚠️ ai_engine 경로를 찾을 수 없습니다. 기본 감정 분석 사용")
-        USE_AI_ENGINE_EMOTION = False
-        EMOTION_ICON = {}
-        # ai_engine 경로를 추가한 후 import
-        ai_engine_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'ai_engine')
-        sys.path.insert(0, os.path.dirname(ai_engine_path))
-        from ai_engine.emotion_analyzer import EmotionAnalyzer
-except ImportError as e:
-    print(f"[Video Analyzer] ⚠️ ai_engine 모듈 로드 실패: {e}. 기본 감정 분석 사용")
-    USE_AI_ENGINE_EMOTION = False
-    EMOTION_ICON = {}
-    # ai_engine 경로를 추가한 후 import
-    ai_engine_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'ai_engine')
-    sys.path.insert(0, os.path.dirname(ai_engine_path))
-    from ai_engine.emotion_analyzer import EmotionAnalyzer
-from deepgram import AsyncDeepgramClient
-from deepgram.core.events import EventType
-
-load_dotenv()
-DEEPGRAM_API_KEY = os.getenv("DEEPGRAM_API_KEY")
-
-from contextlib import asynccontextmanager
-
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    init_models()
-    yield
-
-app = FastAPI(title="Video Analyzer Server", lifespan=lifespan)
-app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
-
-# 전역 변수
-connected_clients: set[WebSocket] = set()
-video_streams: Dict[str, Dict] = {}  # {video_name: {websocket, connection, audio_data, ...}}
-analyzing: set[str] = set()
-
-emotion_analyzer = None
-deepgram_client = None
-# DX_Project_2 방식: 팔레트 레벨 (기본값 2)
-palette_level = 2
-
-def _ansi_to_hex(ansi_color: str) -> str:
-    """ANSI 색상 코드를 HEX 색상으로 변환"""
-    color_map = {
-        "\033[93m": "#FFFF00",  # 노란색
-        "\033[92m": "#00FF00",  # 초록색
-        "\033[94m": "#0000FF",  # 파란색
-        "\033[95m": "#FF00FF",  # 자홍색
-        "\033[91m": "#FF0000",  # 빨간색
-        "\033[97m": "#FFFFFF",  # 흰색
-    }
-    return color_map.get(ansi_color, "#FFFFFF")
-
-def _correct_common_errors(text: str) -> str:
-    """자주 잘못 인식되는 단어 교정: 지혁 → 지옥"""
-    return text.replace("지혁", "지옥")
-
-def _is_sentence_complete(text: str) -> bool:
-    """문장이 완성되었는지 확인 (문장 부호로 끝나는지)"""
-    if not text or len(text.strip()) < 3:  # 최소 3글자 이상
-        return False
-    
-    # 문장 종료 부호로 끝나는지 확인
-    sentence_endings = ['.', '!', '?', '…', '。', '！', '？']
-    text_stripped = text.strip()
-    
-    # 마지막 문자가 문장 종료 부호인지 확인
-    if text_stripped[-1] in sentence_endings:
-        return True
-    
-    # 한글 문장의 경우 "~다", "~요", "~네" 등으로 끝나는 경우도 완성으로 간주
-    korean_endings = ['다', '요', '네', '죠', '까', '래', '게', '야', '어', '아']
-    if len(text_stripped) >= 5:  # 충분히 긴 문장인 경우
-        if text_stripped[-1] in korean_endings:
-            # 문장 부호가 없어도 특정 어미로 끝나면 완성으로 간주
-            return True
-    
-    return False
-
-class SentenceBuffer:
-    """문장 버퍼링을 위한 클래스"""
-    def __init__(self, max_wait_time: float = 2.0, min_length: int = 3):
-        self.text = ""
-        self.speaker_label = None
-        self.start_time = None
-        self.end_time = None
-        self.last_update_time = None
-        self.segments = []  # 각 세그먼트 정보 저장
-        self.max_wait_time = max_wait_time  # 최대 대기 시간 (초)
-        self.min_length = min_length  # 최소 문장 길이
-        self.is_flushing = False  # 플러시 중인지 여부
-    
-    def add_segment(self, transcript: str, speaker_label: str, start: float, end: float):
-        """새 세그먼트를 버퍼에 추가"""
-        current_time = asyncio.get_event_loop().time()
-        
-        # 화자가 바뀌면 기존 버퍼 플러시 필요
-        if self.speaker_label is not None and self.speaker_label != speaker_label:
-            self.is_flushing = True
-        
-        # 버퍼가 비어있으면 시작 시간 설정
-        if self.start_time is None:
-            self.start_time = start
-            self.speaker_label = speaker_label
-        
-        # 텍스트 누적
-        if self.text:
-            self.text += " " + transcript
-        else:
-            self.text = transcript
-        
-        # 시간 업데이트
-        self.end_time = end
-        self.last_update_time = current_time
-        
-        # 세그먼트 정보 저장
-        self.segments.append({
-            'transcript': transcript,
-            'speaker_label': speaker_label,
-            'start': start,
-            'end': end
-        })
-    
-    def should_flush(self) -> bool:
-        """버퍼를 플러시해야 하는지 확인"""
-        if not self.text:
-            return False
-        
-        # 화자가 바뀌면 즉시 플러시
-        if self.is_flushing:
-            return True
-        
-        # 문장이 완성되었으면 플러시
-        if _is_sentence_complete(self.text):
-            return True
-        
-        # 최소 길이를 넘고 타임아웃되었으면 플러시
-        if len(self.text.strip()) >= self.min_length and self.last_update_time:
-            current_time = asyncio.get_event_loop().time()
-            if current_time - self.last_update_time >= self.max_wait_time:
-                return True
-        
-        return False
-    
-    def flush(self) -> Optional[Dict]:
-        """버퍼를 플러시하고 문장 데이터 반환"""
-        if not self.text or len(self.text.strip()) < self.min_length:
-            self.reset()
-            return None
-        
-        result = {
-            'text': self.text.strip(),
-            'speaker_label': self.speaker_label,
-            'start': self.start_time,
-            'end': self.end_time,
-            'segments': self.segments.copy()
-        }
-        
-        self.reset()
-        return result
-    
-    def reset(self):
-        """버퍼 초기화"""
-        self.text = ""
-        self.speaker_label = None
-        self.start_time = None
-        self.end_time = None
-        self.last_update_time = None
-        self.segments = []
-        self.is_flushing = False
-
-async def update_emotion_styling(
-    transcript: str, 
-    display_text: str, 
-    intensity: float, 
-    bgm_text: str, 
-    sfx_text: str, 
-    start: float, 
-    end: float, 
-    websocket: WebSocket
-):
-    """감정 분석 및 스타일링 업데이트 (DX_Project_2 방식: ai_engine 사용)"""
-    global palette_level
-    
-    try:
-        loop = asyncio.get_event_loop()
-        
-        if USE_AI_ENGINE_EMOTION:
-            # DX_Project_2 방식: ai_engine.emotion_wrapper 사용
-            emotion, conf, color_hex = await loop.run_in_executor(
-                None,
-                analyze_emotion,
-                transcript,
-                palette_level
-            )
-            # 감정 이름을 한글로 변환
-            emotion_ko_map = {
-                "joy": "기쁨",
-                "sadness": "슬픔",
-                "anger": "분노",
-                "fear": "공포",
-                "surprise": "놀람",
-                "disgust": "혐오",
-                "neutral": "중립"
-            }
-            emotion_val = emotion_ko_map.get(emotion, "중립")
-            color_val = color_hex
-        else:
-            # 기본 방식: EmotionAnalyzer 사용
-            global emotion_analyzer
-            if not emotion_analyzer:
-                return
-            emotion_result = await loop.run_in_executor(
-                None, 
-                emotion_analyzer.predict, 
-                transcript
-            )
-            emotion_val = emotion_result.get("emotion_ko", "중립")
-            ansi_color = emotion_result.get("color", "\033[97m")
-            color_val = _ansi_to_hex(ansi_color)
-        
-        # 결과를 WebSocket으로 전송 (업데이트)
-        try:
-            # 감정 이모지 가져오기 (USE_AI_ENGINE_EMOTION일 때만)
-            emotion_icon = ""
-            if USE_AI_ENGINE_EMOTION:
-                # emotion_val이 한글이므로 영어 감정명으로 역변환 필요
-                emotion_en_map = {
-                    "기쁨": "joy",
-                    "슬픔": "sadness",
-                    "분노": "anger",
-                    "공포": "fear",
-                    "놀람": "surprise",
-                    "혐오": "disgust",
-                    "중립": "neutral"
-                }
-                emotion_en = emotion_en_map.get(emotion_val, "neutral")
-                emotion_icon = EMOTION_ICON.get(emotion_en, "")
-            
-            update_response = {
-                "text": display_text,
-                "emotion": emotion_val,
-                "emotion_icon": emotion_icon,  # 이모지 추가
-                "color": color_val,
-                "intensity": float(intensity),
-                "pitch": 0.5,
-                "bgm": bgm_text,
-                "sfx": sfx_text,
-                "start": float(start),
-                "end": float(end),
-            }
-            await websocket.send_json(update_response)
-            print(f"[Video Analyzer] 🎨 감정 분석 완료: {emotion_val} {emotion_icon} ({color_val})")
-        except (RuntimeError, Exception) as send_error:
-            # WebSocket이 닫혔거나 연결이 끊어진 경우 무시
-            if "close" in str(send_error).lower() or "disconnect" in str(send_error).lower():
-                return
-            raise  # 다른 예외는 다시 발생시킴
-    except Exception as e:
-        # WebSocket 연결 오류는 무시 (연결이 끊어진 경우)
-        if "close" in str(e).lower() or "disconnect" in str(e).lower():
-            return
-        print(f"[Video Analyzer] 감정 분석 오류: {e}")
-        import traceback
-        traceback.print_exc()
-
-# 변환 로직 제거 - WAV 파일은 이미 16kHz mono 16-bit로 준비되어 있어야 함
-
-def init_models():
-    global emotion_analyzer, deepgram_client
-    try:
-        # DX_Project_2 방식: ai_engine을 사용하면 EmotionAnalyzer 초기화 불필요
-        if not USE_AI_ENGINE_EMOTION:
-            emotion_analyzer = EmotionAnalyzer(r"C:\Users\155\Downloads\My_Emotion_Model")
-        if DEEPGRAM_API_KEY:
-            deepgram_client = AsyncDeepgramClient(api_key=DEEPGRAM_API_KEY)
-        print("[Video Analyzer] ✅ 모델 초기화 완료")
-    except Exception as e:
-        print(f"[Video Analyzer] ❌ 모델 초기화 실패: {e}")
-
-class VideoAnalysisRequest(BaseModel):
-    video_path: str
-    video_name: str
-
-
-async def start_realtime_analysis(audio_path: str, audio_name: str, websocket: WebSocket, audio_start_time: float = 0.0):
-    """오디오 파일을 실시간으로 스트리밍하여 분석 (librosa 직접 읽기)"""
-    global deepgram_client, emotion_analyzer
-    
-    if not deepgram_client:
-        await websocket.send_json({"error": "Deepgram 클라이언트가 초기화되지 않았습니다."})
-        return
-    
-    reset_speaker_map()
-    
-    connection_opened = asyncio.Event()
-    stream_start_time = None
-    audio_playback_start_time = audio_start_time  # 오디오 재생 시작 시간 (초)
-    last_message_time = None  # 마지막 메시지 수신 시간 (외부 스코프에서 업데이트)
-    
-    # 중복 전송 방지: (start, end, transcript) 조합을 추적
-    sent_captions = set()
-    
-    # 문장 버퍼링: 완전한 문장을 만들기 위한 버퍼
-    sentence_buffer = SentenceBuffer(max_wait_time=2.0, min_length=5)
-    buffer_flush_task = None  # 버퍼 플러시 태스크
-    
-    # 오디오 강도 추적 (시간대별 RMS 저장)
-    audio_intensity_buffer = {}  # {timestamp: rms_value}
-    
-    # BGM/SFX 버퍼 (시간대별 BGM/SFX 정보 저장)
-    bgm_sfx_buffer = {}  # {timestamp: {'bgm': bgm_text, 'sfx': sfx_text}}
-    
-    # 연결 상태 플래그 (연결이 끊어졌는지 추적)
-    connection_closed = False
-    
-    # 비디오 파일명에 따라 PANNs 모드 설정
-    if USE_PANNS_BGM:
-        video_basename = os.path.basename(audio_name).lower()
-        if '환승연애' in video_basename or '예능' in video_basename or 'enter_web' in video_basename:
-            os.environ['CAPTION_CONTENT_MODE'] = 'ENTERTAINMENT'
-            print("[Video Analyzer] 🎬 PANNs 모드: ENTERTAINMENT (예능)")
-        elif '친애하는' in video_basename or '드라마' in video_basename or '영화' in video_basename or 'drama' in video_basename:
-            os.environ['CAPTION_CONTENT_MODE'] = 'DRAMA'
-            print("[Video Analyzer] 🎬 PANNs 모드: DRAMA (드라마/영화)")
-        elif '펭귄' in video_basename or '다큐' in video_basename or 'dacu' in video_basename:
-            os.environ['CAPTION_CONTENT_MODE'] = 'DOCUMENTARY'
-            print("[Video Analyzer] 🎬 PANNs 모드: DOCUMENTARY (다큐멘터리)")
-        else:
-            os.environ['CAPTION_CONTENT_MODE'] = 'DOCUMENTARY'  # 기본값
-            print("[Video Analyzer] 🎬 PANNs 모드: DOCUMENTARY (기본값)")
-    
-    async def flush_buffer_if_ready():
-        """버퍼가 준비되었으면 플러시하고 전송"""
-        nonlocal sentence_buffer, sent_captions, audio_intensity_buffer, bgm_sfx_buffer, connection_closed
-        
-        # 연결이 끊어진 경우 즉시 반환
-        if connection_closed:
-            return
-        
-        # WebSocket 연결 상태 확인
-        try:
-            # WebSocket이 닫혔는지 확인
-            if hasattr(websocket, 'client_state'):
-                if websocket.client_state.name != "CONNECTED":
-                    connection_closed = True
-                    return
-        except (AttributeError, RuntimeError, Exception):
-            # 연결이 끊어진 경우
-            connection_closed = True
-            return
-        
-        if sentence_buffer.should_flush():
-            buffer_data = sentence_buffer.flush()
-            if buffer_data:
-                transcript = buffer_data['text']
-                speaker_label = buffer_data['speaker_label']
-                start = buffer_data['start']
-                end = buffer_data['end']
-                
-                # 중복 체크
-                caption_key = (round(start, 2), round(end, 2), transcript)
-                if caption_key in sent_captions:
-                    return
-                
-                sent_captions.add(caption_key)
-                
-                # 화자 정보 포함
-                if speaker_label:
-                    display_text = f"[인물{speaker_label}] {transcript}"
-                else:
-                    display_text = transcript
-                
-                # 기본값 설정
-                emotion = "중립"
-                color = "#FFFFFF"
-                bgm_text = None
-                sfx_text = None
-                
-                # 실제 오디오 강도 계산 (시간대별 RMS 사용)
-                # 자막 시간 범위의 평균 강도 계산
-                intensity_samples = []
-                for t in np.arange(start, end, 0.1):  # 0.1초 간격으로 샘플링
-                    t_rounded = round(t, 2)
-                    if t_rounded in audio_intensity_buffer:
-                        intensity_samples.append(audio_intensity_buffer[t_rounded])
-                
-                if intensity_samples:
-                    # 평균 강도 계산
-                    intensity = float(np.mean(intensity_samples))
-                else:
-                    # 강도 데이터가 없으면 기본값 (0.5)
-                    intensity = 0.5
-                
-                # BGM/SFX 정보 가져오기 (자막 시간 범위의 평균값 사용)
-                if USE_PANNS_BGM and bgm_sfx_buffer:
-                    bgm_samples = []
-                    sfx_samples = []
-                    for t in np.arange(start, end, 0.1):  # 0.1초 간격으로 샘플링
-                        t_rounded = round(t, 2)
-                        if t_rounded in bgm_sfx_buffer:
-                            bgm_data = bgm_sfx_buffer[t_rounded]
-                            if bgm_data.get('bgm'):
-                                bgm_samples.append(bgm_data['bgm'])
-                            if bgm_data.get('sfx'):
-                                sfx_samples.append(bgm_data['sfx'])
-                    
-                    # 가장 많이 나타난 BGM/SFX 선택 (또는 가장 최근 값)
-                    if bgm_samples:
-                        bgm_text = max(set(bgm_samples), key=bgm_samples.count) if bgm_samples else None
-                    if sfx_samples:
-                        sfx_text = max(set(sfx_samples), key=sfx_samples.count) if sfx_samples else None
-                    
-                    # 디버깅 로그
-                    if bgm_text or sfx_text:
-                        print(f"[Video Analyzer] 🎵 자막에 BGM/SFX 포함: [{start:.1f}-{end:.1f}s] BGM={bgm_text}, SFX={sfx_text}")
-                
-                # 즉시 전송 (예외 처리 추가)
-                try:
-                    # 연결 상태 재확인
-                    if connection_closed:
-                        return
-                    
-                    # 초기 응답에도 이모지 포함 (기본값으로 빈 문자열)
-                    initial_response = {
-                        "text": display_text,
-                        "emotion": emotion,
-                        "emotion_icon": "",  # 초기에는 이모지 없음 (감정 분석 후 업데이트됨)
-                        "color": color,
-                        "intensity": float(intensity),
-                        "pitch": 0.5,
-                        "bgm": bgm_text,
-                        "sfx": sfx_text,
-                        "start": float(start),
-                        "end": float(end),
-                    }
-                    await websocket.send_json(initial_response)
-                    print(f"[Video Analyzer] 📤 [{start:.1f}s] {display_text[:80]}... (완성된 문장 전송)")
-                    
-                    # 감정 분석 후 업데이트
-                    await update_emotion_styling(
-                        transcript, display_text, intensity, bgm_text, sfx_text, start, end, websocket
-                    )
-                except (RuntimeError, Exception) as e:
-                    # WebSocket이 닫혔거나 연결이 끊어진 경우
-                    error_str = str(e).lower()
-                    error_type = type(e).__name__
-                    if any(keyword in error_str for keyword in ["close", "disconnect", "1006", "1000", "connection"]):
-                        connection_closed = True
-                        print(f"[Video Analyzer] 🔌 연결 끊김 감지: {error_type}")
-                        return
-                    # 다른 예외는 로그만 출력
-                    print(f"[Video Analyzer] ⚠️ 자막 전송 실패: {error_type}: {e}")
-                    return
-    
-    async def buffer_timeout_monitor():
-        """버퍼 타임아웃 모니터링 (주기적으로 버퍼 체크 및 플러시)"""
-        nonlocal connection_closed
-        try:
-            while not connection_closed:
-                await asyncio.sleep(0.5)  # 0.5초마다 체크
-                try:
-                    await flush_buffer_if_ready()
-                except (RuntimeError, Exception) as e:
-                    # WebSocket 연결이 끊어진 경우 루프 종료
-                    error_str = str(e).lower()
-                    if any(keyword in error_str for keyword in ["close", "disconnect", "1006", "1000", "connection"]):
-                        connection_closed = True
-                        print(f"[Video Analyzer] 🔌 버퍼 모니터 종료 (연결 끊김)")
-                        break
-                    # 다른 예외는 무시하고 계속
-        except asyncio.CancelledError:
-            # 태스크 취소 시 남은 버퍼 플러시 (연결 상태 확인 후)
-            try:
-                if not connection_closed:
-                    await flush_buffer_if_ready()
-            except:
-                pass  # 연결이 끊어진 경우 무시
-            raise
-    
-    def on_open(event):
-        connection_opened.set()
-        print(f"[Video Analyzer] ✅ Deepgram 연결 완료: {audio_name}")
-    
-    def on_message(message):
-        nonlocal stream_start_time, last_message_time, sentence_buffer
-        
-        last_message_time = asyncio.get_event_loop().time()
-        try:
-            if hasattr(message, "channel") and message.channel:
-                channel = message.channel[0] if isinstance(message.channel, list) else message.channel
-                if hasattr(channel, "alternatives") and channel.alternatives:
-                    alt = channel.alternatives[0]
-                    transcript = getattr(alt, "transcript", "")
-                    # 후처리: 지혁 → 지옥 교정
-                    transcript = _correct_common_errors(transcript)
-                    
-                    if not transcript or not transcript.strip():
-                        return
-                    
-                    # 화자 구분 (실시간)
-                    speaker_id = get_major_speaker(alt)
-                    speaker_label = stabilize_speaker(speaker_id, transcript)
-                    
-                    # 시간 정보 추출 (스트리밍 시작 시간 기준 상대 시간)
-                    if hasattr(alt, "words") and alt.words:
-                        deepgram_start = float(alt.words[0].start if hasattr(alt.words[0], "start") else 0.0)
-                        deepgram_end = float(alt.words[-1].end if hasattr(alt.words[-1], "end") else deepgram_start + 1.0)
-                    else:
-                        deepgram_start = 0.0
-                        deepgram_end = deepgram_start + 1.0
-                    
-                    # 오디오 재생 시간으로 변환 (Deepgram 타임스탬프 + 오디오 재생 시작 시간)
-                    start = deepgram_start + audio_playback_start_time
-                    end = deepgram_end + audio_playback_start_time
-                    
-                    # 버퍼에 세그먼트 추가 (화자 변경 시 기존 버퍼 플러시)
-                    if sentence_buffer.speaker_label is not None and sentence_buffer.speaker_label != speaker_label:
-                        # 화자가 바뀌면 기존 버퍼 플러시
-                        asyncio.create_task(flush_buffer_if_ready())
-                    
-                    sentence_buffer.add_segment(transcript, speaker_label, start, end)
-                    
-                    # 문장이 완성되었는지 확인
-                    if sentence_buffer.should_flush():
-                        asyncio.create_task(flush_buffer_if_ready())
-                        
-        except Exception as e:
-            print(f"[Video Analyzer] 메시지 처리 오류: {e}")
-            import traceback
-            traceback.print_exc()
-    
-    try:
-        async with deepgram_client.listen.v1.connect(
-            model="nova-2",
-            language="ko-KR",
-            encoding="linear16",
-            sample_rate="16000",
-            smart_format="true",
-            punctuate=True,  # 문장 부호 추가 (정확도 향상)
-            endpointing=300,  # 발화 종료 대기 시간 (ms) - 짧은 끊김 방지
-            diarize=True,  # 화자 구분 활성화
-            vad_events=True,  # Voice Activity Detection 활성화 (작은 소리도 감지)
-        ) as connection:
-            connection.on(EventType.OPEN, on_open)
-            connection.on(EventType.MESSAGE, on_message)
-            
-            listen_task = asyncio.create_task(connection.start_listening())
-            await asyncio.wait_for(connection_opened.wait(), timeout=15.0)
-            
-            # 버퍼 타임아웃 모니터링 시작
-            buffer_flush_task = asyncio.create_task(buffer_timeout_monitor())
-            
-            # 오디오 파일을 librosa로 직접 읽어서 Deepgram으로 전송
-            print(f"[Video Analyzer] ✅ 오디오 스트리밍 시작: {audio_path}")
-            
-            async def send_audio_stream():
-                nonlocal stream_start_time, audio_path
-                try:
-                    stream_start_time = asyncio.get_event_loop().time()
-                    
-                    # 오디오 파일 확장자 확인
-                    file_ext = os.path.splitext(audio_path)[1].lower()
-                    print(f"[Video Analyzer] 🎵 오디오 파일 스트리밍: {file_ext}")
-                    
-                    # MP4는 비디오 파일이므로 오디오 파일(WAV 등)을 사용해야 함
-                    if file_ext in ['.mp4', '.mov', '.avi', '.mkv', '.flv', '.webm']:
-                        # 비디오 파일이면 WAV 파일을 찾아서 사용
-                        video_name = os.path.splitext(os.path.basename(audio_path))[0]
-                        wav_path = os.path.join(os.path.dirname(audio_path), f"{video_name}.wav")
-                        
-                        if not os.path.exists(wav_path):
-                            # WAV 파일이 없으면 오류
-                            error_msg = f"비디오 파일({file_ext})은 지원하지 않습니다. 오디오 파일(.wav)을 사용하세요. WAV 파일을 찾을 수 없습니다: {wav_path}"
-                            print(f"[Video Analyzer] ❌ {error_msg}")
-                            await websocket.send_json({"error": error_msg})
-                            return
-                        
-                        # WAV 파일 사용
-                        audio_path = wav_path
-                        file_ext = '.wav'
-                        print(f"[Video Analyzer] 🔄 WAV 파일로 변경: {wav_path}")
-                    
-                    # PyAudio처럼: WAV 파일을 직접 읽어서 Deepgram으로 전송 (변환 없이)
-                    # WAV 파일은 이미 16kHz mono 16-bit로 준비되어 있어야 함
-                    import wave
-                    
-                    with wave.open(audio_path, 'rb') as wav_file:
-                        # WAV 파일 정보 확인
-                        sample_rate = wav_file.getframerate()
-                        channels = wav_file.getnchannels()
-                        sample_width = wav_file.getsampwidth()
-                        frames = wav_file.getnframes()
-                        
-                        print(f"[Video Analyzer] 🎵 WAV 파일 정보: {sample_rate}Hz, {channels}ch, {sample_width*8}-bit, {frames} frames")
-                        
-                        # 형식 확인 (16kHz mono 16-bit)
-                        if sample_rate != 16000 or channels != 1 or sample_width != 2:
-                            error_msg = f"WAV 파일 형식이 맞지 않습니다. 16kHz mono 16-bit가 필요합니다. (현재: {sample_rate}Hz, {channels}ch, {sample_width*8}-bit)"
-                            print(f"[Video Analyzer] ❌ {error_msg}")
-                            await websocket.send_json({"error": error_msg})
-                            return
-                        
-                        # DX_Project_2 PyAudio와 동일한 설정
-                        # PyAudio: frames_per_buffer=1024 (bytes)
-                        # 1024 bytes = 512 samples (16-bit = 2 bytes per sample)
-                        chunk_bytes_size = 1024  # DX_Project_2와 동일
-                        chunk_frames = chunk_bytes_size // 2  # 512 frames
-                        
-                        # 오디오 재생 시작 시간에 맞춰서 건너뛰기
-                        if audio_playback_start_time > 0:
-                            skip_frames = int(audio_playback_start_time * 16000)
-                            wav_file.setpos(skip_frames)
-                            print(f"[Video Analyzer] ⏩ {skip_frames} frames 건너뛰기 ({audio_playback_start_time:.2f}초)")
-                        else:
-                            print(f"[Video Analyzer] 🎵 오디오 스트리밍 처음부터 시작 (audio_start_time=0.0)")
-                        
-                        print(f"[Video Analyzer] 🎵 WAV 파일 직접 스트리밍 시작 (DX_Project_2와 동일)")
-                        print(f"[Video Analyzer] 📡 즉시 오디오 스트리밍 시작 → Deepgram 자막 생성 중...")
-                        
-                        # DX_Project_2 PyAudio와 동일한 방식: 1024 bytes 읽기 → 즉시 전송 → 0.01초 딜레이
-                        file_ended = False
-                        
-                        # 오디오 강도 추적용 변수
-                        nonlocal audio_intensity_buffer, bgm_sfx_buffer
-                        chunk_index = 0  # 청크 인덱스 (시간 계산용)
-                        
-                        try:
-                            while True:
-                                # 청크 읽기 (1024 bytes = 512 frames, DX_Project_2와 동일)
-                                chunk_bytes = wav_file.readframes(chunk_frames)
-                                
-                                if len(chunk_bytes) == 0:
-                                    # 파일 끝 - 무음을 보내서 연결 유지 (비디오가 끝날 때까지)
-                                    if not file_ended:
-                                        print("[Video Analyzer] ✅ WAV 파일 스트리밍 완료 (연결 유지 중)")
-                                        file_ended = True
-                                    # 무음 청크 생성 (1024 bytes = 512 frames of silence)
-                                    chunk_bytes = b'\x00' * chunk_bytes_size
-                                
-                                # 현재 시간 계산 (강도 추적용)
-                                current_time = chunk_index * (chunk_frames / 16000.0) + audio_playback_start_time
-                                
-                                # 오디오 강도 계산 (자막에 사용)
-                                if len(chunk_bytes) > 0:
-                                    try:
-                                        # 16-bit PCM 데이터를 numpy 배열로 변환
-                                        audio_array = np.frombuffer(chunk_bytes, dtype=np.int16).astype(np.float32)
-                                        # 정규화 (-1.0 ~ 1.0 범위)
-                                        audio_normalized = audio_array / 32768.0
-                                        # RMS 계산
-                                        current_rms = np.sqrt(np.mean(audio_normalized ** 2))
-                                        # RMS를 0.0~1.0 범위로 정규화하여 intensity로 사용
-                                        intensity_value = min(1.0, current_rms * 2.0)  # 0.0~1.0 범위
-                                        audio_intensity_buffer[round(current_time, 2)] = intensity_value
-                                        
-                                        # PANNs BGM/SFX 분석 (비동기로 실행하여 블로킹 방지)
-                                        if USE_PANNS_BGM:
-                                            try:
-                                                # analyze_bgm_chunk 호출 (내부 상태 업데이트)
-                                                analyze_bgm_chunk(chunk_bytes, in_sr=16000)
-                                                
-                                                # 전역 변수에서 현재 BGM/SFX 값 읽기 (변경이 없어도 최신 값 유지)
-                                                current_bgm = getattr(panns_module, 'current_bgm_text', '')
-                                                current_sfx = getattr(panns_module, 'current_sfx_text', '')
-                                                
-                                                # BGM/SFX가 있으면 버퍼에 저장 (항상 최신 값 유지)
-                                                if current_bgm or current_sfx:
-                                                    bgm_sfx_buffer[round(current_time, 2)] = {
-                                                        'bgm': current_bgm if current_bgm else None,
-                                                        'sfx': current_sfx if current_sfx else None
-                                                    }
-                                                    # 디버깅 로그 (주기적으로만 출력)
-                                                    if chunk_index % 100 == 0:  # 100번째 청크마다 로그
-                                                        print(f"[Video Analyzer] 🎵 BGM/SFX 분석: 시간={round(current_time, 2)}s, BGM={current_bgm}, SFX={current_sfx}")
-                                            except Exception as bgm_error:
-                                                # BGM 분석 실패 시 로그 출력
-                                                if chunk_index % 100 == 0:  # 에러도 주기적으로만 출력
-                                                    print(f"[Video Analyzer] ⚠️ BGM 분석 실패: {bgm_error}")
-                                                pass
-                                    except Exception:
-                                        # 오류 발생 시 기본값 사용
-                                        audio_intensity_buffer[round(current_time, 2)] = 0.5
-                                
-                                chunk_index += 1
-                                
-                                # 오래된 강도 데이터 정리 (메모리 절약)
-                                if len(audio_intensity_buffer) > 1000:
-                                    # 가장 오래된 500개 제거
-                                    sorted_keys = sorted(audio_intensity_buffer.keys())
-                                    for key in sorted_keys[:500]:
-                                        del audio_intensity_buffer[key]
-                                
-                                # 오래된 BGM/SFX 데이터 정리 (메모리 절약)
-                                if len(bgm_sfx_buffer) > 1000:
-                                    # 가장 오래된 500개 제거
-                                    sorted_keys = sorted(bgm_sfx_buffer.keys())
-                                    for key in sorted_keys[:500]:
-                                        del bgm_sfx_buffer[key]
-                                
-                                # DX_Project_2와 동일: Deepgram으로 즉시 전송
-                                if len(chunk_bytes) > 0:
-                                    try:
-                                        await connection.send_media(chunk_bytes)
-                                    except Exception as send_error:
-                                        # 연결이 닫혔으면 정상 종료
-                                        if "1000" in str(send_error) or "ConnectionClosed" in str(type(send_error).__name__):
-                                            print("[Video Analyzer] ✅ Deepgram 연결 정상 종료")
-                                            break
-                                        raise
-                                
-                                # DX_Project_2 PyAudio와 동일한 딜레이 (0.01초)
-                                await asyncio.sleep(0.01)
-                        except Exception as stream_error:
-                            # 연결 종료는 정상적인 경우이므로 무시
-                            if "1000" in str(stream_error) or "ConnectionClosed" in str(type(stream_error).__name__):
-                                print("[Video Analyzer] ✅ 오디오 스트리밍 정상 종료")
-                            else:
-                                print(f"[Video Analyzer] ❌ 스트리밍 오류: {stream_error}")
-                                import traceback
-                                traceback.print_exc()
-                                raise
-                    
-                except Exception as e:
-                    print(f"[Video Analyzer] 오디오 스트리밍 오류: {e}")
-                    import traceback
-                    traceback.print_exc()
-            
-            # 오디오 스트리밍을 백그라운드 태스크로 실행 (블로킹 방지, 즉시 시작)
-            stream_task = asyncio.create_task(send_audio_stream())
-            
-            # 메시지 수신 대기 (오디오 스트리밍과 병렬로 실행)
-            # WAV 파일 길이 계산 (초 단위)
-            import wave
-            try:
-                with wave.open(audio_path, 'rb') as wav_check:
-                    wav_duration = wav_check.getnframes() / wav_check.getframerate()
-                    print(f"[Video Analyzer] ⏱️ WAV 파일 길이: {wav_duration:.2f}초")
-            except:
-                wav_duration = 300.0  # 기본값 5분
-            
-            wait_start = asyncio.get_event_loop().time()
-            file_ended_time = None
-            
-            while True:
-                await asyncio.sleep(0.1)
-                
-                # 스트리밍 태스크가 완료되었는지 확인
-                if stream_task.done():
-                    if file_ended_time is None:
-                        file_ended_time = asyncio.get_event_loop().time()
-                        print(f"[Video Analyzer] ✅ WAV 파일 스트리밍 완료, 연결 유지 중...")
-                    
-                    # 파일이 끝난 후에도 최소 5초 더 대기 (비디오가 끝날 때까지)
-                    if asyncio.get_event_loop().time() - file_ended_time > 5.0:
-                        # 마지막 메시지가 3초 이상 전이면 종료
-                        if last_message_time:
-                            if asyncio.get_event_loop().time() - last_message_time > 3.0:
-                                print("[Video Analyzer] ✅ 메시지 수신 종료 (3초 이상 메시지 없음)")
-                                break
-                        # 파일이 끝난 후 10초 이상 지나면 종료
-                        if asyncio.get_event_loop().time() - file_ended_time > 10.0:
-                            print("[Video Analyzer] ✅ 타임아웃 종료 (파일 종료 후 10초)")
-                            break
-                else:
-                    # 스트리밍 중일 때는 메시지 타임아웃만 체크 (더 긴 타임아웃)
-                    if last_message_time:
-                        if asyncio.get_event_loop().time() - last_message_time > 10.0:
-                            print("[Video Analyzer] ⚠️ 메시지 수신 타임아웃 (10초 이상 메시지 없음)")
-                            break
-                
-                # 전체 타임아웃 (WAV 파일 길이 + 여유 시간 20초)
-                max_wait_time = wav_duration + 20.0
-                if asyncio.get_event_loop().time() - wait_start > max_wait_time:
-                    print(f"[Video Analyzer] ✅ 전체 타임아웃 종료 ({max_wait_time:.1f}초)")
-                    break
-            
-            # 버퍼 플러시 태스크 종료
-            if buffer_flush_task and not buffer_flush_task.done():
-                buffer_flush_task.cancel()
-                try:
-                    await buffer_flush_task
-                except asyncio.CancelledError:
-                    pass
-            
-            # 남은 버퍼 내용 전송
-            if sentence_buffer.text:
-                await flush_buffer_if_ready()
-            
-            listen_task.cancel()
-            if not stream_task.done():
-                stream_task.cancel()
-            
-    except Exception as e:
-        print(f"[Video Analyzer] STT 오류: {e}")
-        import traceback
-        traceback.print_exc()
-    finally:
-        if audio_name in video_streams:
-            del video_streams[audio_name]
+    # uvicorn 로그도 같은 큐 기반 로깅으로 출력 (log_config=None → 루트 로거로 전달)
+    uvicorn.run(app, host="0.0.0.0", port=8002, log_config=None)
@@ -0,0 +1,164 @@
+"""
+STT 앞단 음성 구간 게이트 (VAD, CPU 경량)
+- 32ms 청크마다 에너지(적응형 잡음 바닥 대비 dB) + 음성 대역(250~4000Hz) 에너지 비율로 음성 여부 판단
+- 음성이 아닌 구간(무음, 음악만 나오는 구간 등)은 Deepgram 으로 보내지 않음 → 전송량/STT 비용 절감
+    • pre-roll : 음성 시작 직전 오디오를 조금 붙여 보냄 (첫 음절 잘림 방지)
+    • hangover : 음성이 끝난 뒤에도 잠시 더 보냄 (endpointing 이 발화 끝을 인식하도록)
+- 청크마다 에셋 시간을 함께 돌려주므로 호출 측은 건너뛴 구간만큼 타임스탬프 매핑을 이어 붙이면 된다
+- 잡음 바닥은 음성이 아닌 청크에서만 천천히 올라가고, 최근 음성 에너지보다 MARGIN_DB 이상 낮게 유지
+  (긴 대사 중에 바닥이 음성 레벨까지 올라가 게이트가 닫히는 것 방지)
+- 절약 비율(STT 로 보내지 않은 오디오)은 세션별 + 에셋별 누적으로 보고
+"""
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+PRE_ROLL_SECONDS = 0.3
+HANGOVER_SECONDS = 0.8
+# 잡음 바닥보다 이만큼 커야 음성 후보 (dB)
+MARGIN_DB = 9.0
+# 이보다 작은 소리는 항상 무음 (dBFS)
+ABSOLUTE_FLOOR_DB = -55.0
+# 음성 대역 에너지 비율이 이 이상이어야 음성 (배경 음악/저역 잡음 제외)
+MIN_SPEECH_BAND_RATIO = 0.3
+# 잡음 바닥이 올라가는 속도 (dB/청크, 음성이 아닌 청크에서만 / 내려갈 때는 즉시 따라감)
+FLOOR_RISE_DB = 0.02
+# 최근 음성 레벨 추적 속도 (청크당 반영 비율)
+SPEECH_LEVEL_ALPHA = 0.05
+SPEECH_BAND_HZ = (250.0, 4000.0)
+
+# 에셋별 누적 [전체 오디오 초, STT 로 보낸 초] (여러 세션 / seek 을 합쳐 에셋 단위로 절약 비율 보고)
+_asset_totals: Dict[str, List[float]] = {}
+
+
+def asset_metrics(asset: Optional[str] = None) -> Dict:
+    """에셋별 음성 게이트 절약 비율 (asset 지정 시 그 에셋만)"""
+    def _one(total: float, sent: float) -> Dict:
+        return {
+            "audio_seconds": round(total, 1),
+            "sent_seconds": round(sent, 1),
+            "saved_fraction": round(max(0.0, 1.0 - sent / total), 3) if total > 0.0 else 0.0,
+        }
+
+    if asset is not None:
+        return _one(*_asset_totals.get(asset, [0.0, 0.0]))
+    return {name: _one(total, sent) for name, (total, sent) in _asset_totals.items()}
+
+
+class VoiceActivityGate:
+    """청크 단위 음성 게이트 (세션마다 1개, 상태 유지)"""
+
+    def __init__(
+        self,
+        sample_rate: int = SAMPLE_RATE,
+        pre_roll: float = PRE_ROLL_SECONDS,
+        hangover: float = HANGOVER_SECONDS,
+        asset: Optional[str] = None,
+    ):
+        self.sample_rate = sample_rate
+        self.pre_roll = pre_roll
+        self.hangover = hangover
+        self.active = False  # 지금 STT 로 오디오를 보내는 중
+        self.silence_seconds = 0.0  # 마지막 음성 청크 이후 경과한 오디오 시간
+        self._floor_db = ABSOLUTE_FLOOR_DB
+        self._speech_db: Optional[float] = None  # 최근 음성 청크 레벨 (dB, 지수 평균)
+        self._totals = _asset_totals.setdefault(asset, [0.0, 0.0]) if asset is not None else None
+        self._hangover_left = 0.0
+        self._pending: Deque[Tuple[float, bytes]] = deque()  # pre-roll 후보 [(에셋 시각, 청크)]
+        self._band = None  # (청크 길이, 음성 대역 FFT bin 마스크)
+
+        # 메트릭 (초)
+        self.total_seconds = 0.0
+        self.sent_seconds = 0.0
+
+    def _speech_band(self, n: int) -> np.ndarray:
+        if self._band is None or self._band[0] != n:
+            freqs = np.fft.rfftfreq(n, 1.0 / self.sample_rate)
+            self._band = (n, (freqs >= SPEECH_BAND_HZ[0]) & (freqs <= SPEECH_BAND_HZ[1]))
+        return self._band[1]
+
+    def is_speech(self, samples: np.ndarray) -> bool:
+        """int16 청크 1개의 음성 여부 (잡음 바닥도 함께 갱신)"""
+        x = samples.astype(np.float32) / 32768.0
+        energy = float(np.mean(x ** 2)) if x.size else 0.0
+        level_db = 10.0 * np.log10(energy + 1e-12)
+
+        if level_db < self._floor_db:
+            self._floor_db = max(level_db, ABSOLUTE_FLOOR_DB - 20.0)
+
+        speech = self._classify(x, level_db)
+        if speech:
+            if self._speech_db is None:
+                self._speech_db = level_db
+            else:
+                self._speech_db += SPEECH_LEVEL_ALPHA * (level_db - self._speech_db)
+        elif level_db > self._floor_db:
+            # 음성이 아닌 청크에서만 바닥을 올림 (최근 음성보다 MARGIN_DB 아래까지만)
+            ceiling = self._speech_db - MARGIN_DB if self._speech_db is not None else level_db
+            self._floor_db = min(self._floor_db + FLOOR_RISE_DB, max(self._floor_db, ceiling))
+        return speech
+
+    def _classify(self, x: np.ndarray, level_db: float) -> bool:
+        if level_db < ABSOLUTE_FLOOR_DB or level_db < self._floor_db + MARGIN_DB:
+            return False
+        power = np.abs(np.fft.rfft(x)) ** 2
+        total = float(power.sum())
+        if total <= 0.0:
+            return False
+        return float(power[self._speech_band(x.size)].sum()) / total >= MIN_SPEECH_BAND_RATIO
+
+    def process(self, chunk: bytes, t: float) -> List[Tuple[float, bytes]]:
+        """청크 1개 입력 → 지금 STT 로 보낼 [(에셋 시각, 청크)] (음성 시작 시 pre-roll 포함)"""
+        duration = len(chunk) / 2 / self.sample_rate
+        self.total_seconds += duration
+        if self._totals is not None:
+            self._totals[0] += duration
+
+        if self.is_speech(np.frombuffer(chunk, dtype=np.int16)):
+            self._hangover_left = self.hangover
+            self.silence_seconds = 0.0
+            self.active = True
+        else:
+            self.silence_seconds += duration
+            if self.active:
+                self._hangover_left -= duration
+                if self._hangover_left <= 0.0:
+                    self.active = False
+
+        if not self.active:
+            self._pending.append((t, chunk))
+            while sum(len(c) for _, c in self._pending) / 2 / self.sample_rate > self.pre_roll:
+                self._pending.popleft()
+            return []
+
+        out = list(self._pending)
+        out.append((t, chunk))
+        self._pending.clear()
+        sent = sum(len(c) for _, c in out) / 2 / self.sample_rate
+        self.sent_seconds += sent
+        if self._totals is not None:
+            self._totals[1] += sent
+        return out
+
+    def reset(self):
+        """seek 등으로 오디오가 끊길 때 (잡음 바닥은 유지)"""
+        self.active = False
+        self._hangover_left = 0.0
+        self.silence_seconds = 0.0
+        self._pending.clear()
+
+    @property
+    def saved_fraction(self) -> float:
+        """STT 로 보내지 않은 오디오 비율 (0~1)"""
+        if self.total_seconds <= 0.0:
+            return 0.0
+        return max(0.0, 1.0 - self.sent_seconds / self.total_seconds)
+
+    def metrics(self) -> Dict:
+        return {
+            "audio_seconds": round(self.total_seconds, 1),
+            "sent_seconds": round(self.sent_seconds, 1),
+            "saved_fraction": round(self.saved_fraction, 3),
+        }
@@ -113,6 +113,9 @@ class _HomePageState extends State<HomePage> {
   // 채널별 자막 큐 캐시 (채널 전환 시 재사용)
   Map<String, List<Map<String, dynamic>>> _channelCaptionCache = {};
 
+  // 서버 연결(분석 세션) 번호 - caption_id 는 세션마다 새로 매겨지므로 같은 세션 안에서만 비교
+  int _captionSession = 0;
+
   // 리모컨 앱 연결 (Firestore)
   StreamSubscription<DocumentSnapshot<Map<String, dynamic>>>?
       _tvStateSubscription;
@@ -1348,6 +1351,7 @@ class _HomePageState extends State<HomePage> {
           try {
             // 비디오는 아직 재생하지 않으므로 시작 시간은 0
             // 백엔드가 즉시 오디오 스트리밍을 시작하도록 함
+            _captionSession++;
             _captionChannel!.sink.add(convert.jsonEncode({
               'video_name': _videoName,
               'action': 'start',
@@ -1391,6 +1395,19 @@ class _HomePageState extends State<HomePage> {
     connect();
   }
 
+  // 같은 자막의 큐 위치 (caption_id 가 있으면 같은 세션의 caption_id 로,
+  // 없으면 타임스탬프가 거의 같은(0.1초 이내) 자막으로 찾음, 없으면 -1)
+  int _findCaptionIndex(dynamic captionId, double start, double end) {
+    if (captionId != null) {
+      return _captionQueue.indexWhere((caption) =>
+          caption['caption_id'] == captionId &&
+          caption['caption_session'] == _captionSession);
+    }
+    return _captionQueue.indexWhere((caption) =>
+        ((caption['start'] as double) - start).abs() < 0.1 &&
+        ((caption['end'] as double) - end).abs() < 0.1);
+  }
+
   // WebSocket 리스너 설정
   void _setupWebSocketListener() {
     if (_captionChannel == null) {
@@ -1414,6 +1431,42 @@ class _HomePageState extends State<HomePage> {
               return;
             }
 
+            final captionId = data['caption_id'];
+            final revision = (data['revision'] as num?)?.toInt() ?? 0;
+
+            // 철회 메시지 (임시 자막을 보냈던 문장이 최종적으로 버려짐): 해당 자막 제거
+            if (data['type'] == 'retract') {
+              setState(() {
+                _captionQueue.removeWhere((caption) =>
+                    captionId != null &&
+                    caption['caption_id'] == captionId &&
+                    caption['caption_session'] == _captionSession);
+                _channelCaptionCache[_currentChannel] = List.from(_captionQueue);
+              });
+              return;
+            }
+
+            // 감정 패치 메시지 (감정 분석이 늦게 끝난 경우): 기존 자막의 감정/색상만 갱신
+            if (data['type'] == 'patch') {
+              final patchStart = (data['start'] as num?)?.toDouble() ?? 0.0;
+              final patchEnd = (data['end'] as num?)?.toDouble() ?? patchStart;
+              setState(() {
+                final i = _findCaptionIndex(captionId, patchStart, patchEnd);
+                if (i >= 0) {
+                  final caption = _captionQueue[i];
+                  _captionQueue[i] = {
+                    ...caption,
+                    'color': data['color'] as String? ?? caption['color'],
+                    'emotion': data['emotion'] as String? ?? caption['emotion'],
+                    'emotion_icon':
+                        data['emotion_icon'] as String? ?? caption['emotion_icon'],
+                  };
+                }
+                _channelCaptionCache[_currentChannel] = List.from(_captionQueue);
+              });
+              return;
+            }
+
             // 원본 데이터를 그대로 저장 (디자인은 표시 시에만 적용)
             String text = data['text'] as String? ?? '';
             if (text.isEmpty) return; // 빈 자막은 무시
@@ -1465,20 +1518,15 @@ class _HomePageState extends State<HomePage> {
             }
 
             // 자막을 큐에 추가 (타임스탬프 기준, fontSize 포함)
-            // 같은 타임스탬프의 자막이 이미 있으면 업데이트 (감정 분석 결과 반영)
+            // 같은 자막이 이미 있으면 업데이트 (임시 자막 → 최종 자막, 감정 분석 결과 반영)
             setState(() {
-              // 같은 start/end 시간을 가진 자막이 있는지 확인
-              int existingIndex = -1;
-              for (int i = 0; i < _captionQueue.length; i++) {
-                final caption = _captionQueue[i];
-                final captionStart = caption['start'] as double;
-                final captionEnd = caption['end'] as double;
-                // 타임스탬프가 거의 같으면 (0.1초 이내) 같은 자막으로 간주
-                if ((captionStart - start).abs() < 0.1 &&
-                    (captionEnd - end).abs() < 0.1) {
-                  existingIndex = i;
-                  break;
-                }
+              final existingIndex = _findCaptionIndex(captionId, start, end);
+
+              // 이미 더 새로운 revision 을 받은 자막이면 무시
+              if (existingIndex >= 0 &&
+                  ((_captionQueue[existingIndex]['revision'] as int?) ?? 0) >
+                      revision) {
+                return;
               }
 
               if (existingIndex >= 0) {
@@ -1494,6 +1542,9 @@ class _HomePageState extends State<HomePage> {
                   'fontSize': fontSize, // fontSize 저장
                   'bgm': bgm,
                   'sfx': sfx,
+                  'caption_id': captionId,
+                  'caption_session': _captionSession,
+                  'revision': revision,
                 };
               } else {
                 // 새로운 자막 추가
@@ -1508,6 +1559,9 @@ class _HomePageState extends State<HomePage> {
                   'fontSize': fontSize, // fontSize 저장
                   'bgm': bgm,
                   'sfx': sfx,
+                  'caption_id': captionId,
+                  'caption_session': _captionSession,
+                  'revision': revision,
                 });
               }
 